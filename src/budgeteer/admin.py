@@ -1,5 +1,8 @@
 from django.contrib import admin
-from budgeteer.models import Account, Category, Sheet, SheetEntry, Transaction
+from budgeteer.locking import (lock_sheet_entries, lock_transactions, unlock_sheet_entries,
+                               unlock_transactions)
+from budgeteer.models import (Account, Budget, BudgetTarget, Category, RecurringTransaction,
+                              Sheet, SheetEntry, Transaction)
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
@@ -15,8 +18,52 @@ class SheetAdmin(admin.ModelAdmin):
 
 @admin.register(SheetEntry)
 class SheetEntryAdmin(admin.ModelAdmin):
-    pass
+    list_display = ['sheet', 'category', 'value', 'locked']
+    list_filter = ['locked', 'sheet']
+    actions = ['lock', 'unlock']
+
+    def lock(self, request, queryset):
+        count = lock_sheet_entries(queryset)
+        self.message_user(request, f"Locked {count} sheet entries.")
+    lock.short_description = "Lock selected sheet entries"
+
+    def unlock(self, request, queryset):
+        count = unlock_sheet_entries(queryset)
+        self.message_user(request, f"Unlocked {count} sheet entries.")
+    unlock.short_description = "Unlock selected sheet entries"
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    pass
+    list_display = ['date', 'account', 'partner', 'category', 'budget', 'value', 'locked']
+    list_select_related = ['account', 'category', 'budget']
+    list_filter = ['locked', 'account', 'date']
+    date_hierarchy = 'date'
+    actions = ['lock', 'unlock']
+
+    def lock(self, request, queryset):
+        count = lock_transactions(queryset)
+        self.message_user(request, f"Locked {count} transactions.")
+    lock.short_description = "Lock selected transactions"
+
+    def unlock(self, request, queryset):
+        count = unlock_transactions(queryset)
+        self.message_user(request, f"Unlocked {count} transactions.")
+    unlock.short_description = "Unlock selected transactions"
+
+@admin.register(RecurringTransaction)
+class RecurringTransactionAdmin(admin.ModelAdmin):
+    list_display = ['partner', 'account', 'category', 'value', 'frequency', 'interval', 'start',
+                    'until']
+    list_filter = ['account', 'frequency']
+
+@admin.register(BudgetTarget)
+class BudgetTargetAdmin(admin.ModelAdmin):
+    list_display = ['category', 'kind', 'amount', 'date', 'progress']
+    list_filter = ['kind']
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ['name', 'kind', 'parent', 'category', 'amount', 'total', 'remaining']
+    list_select_related = ['parent', 'category']
+    list_filter = ['kind', 'category']
+    ordering = ['path']
@@ -0,0 +1,223 @@
+"""
+Read-only JSON API for accounts, transactions and sheets.
+
+Every resource can be reduced to a subset of its fields with the fields[<resource>] parameter,
+e.g. ?fields[account]=id,total. Expensive fields like totals and available amounts are only
+calculated if they are requested.
+
+Responses carry an ETag derived from the update markers and row counts of all rows they depend on.
+Conditional requests are answered with 304 before any aggregate is calculated. There is no
+Last-Modified header, because deleting a row changes the responses without a newer update marker.
+"""
+import datetime
+import hashlib
+from decimal import Decimal
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import models
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+from django.views.generic.base import View
+
+from budgeteer.identity import lookup
+from budgeteer.models import Account, BudgetTarget, Sheet, SheetEntry, Transaction
+from budgeteer.pagination import keyset_page
+
+ACCOUNT_FIELDS = {
+    'id': lambda account: account.pk,
+    'name': lambda account: account.name,
+    'balance': lambda account: _money(account.balance),
+    'total': lambda account: _money(account.total),
+}
+
+TRANSACTION_FIELDS = {
+    'id': lambda transaction: transaction.pk,
+    'date': lambda transaction: transaction.date,
+    'partner': lambda transaction: transaction.partner,
+    'value': lambda transaction: _money(transaction.value),
+    'category': lambda transaction: transaction.category_id,
+    'account': lambda transaction: transaction.account_id,
+    'budget': lambda transaction: transaction.budget_id,
+    'locked': lambda transaction: transaction.locked,
+}
+
+SHEET_FIELDS = {
+    'id': lambda sheet: sheet.pk,
+    'year': lambda sheet: sheet.year,
+    'month': lambda sheet: sheet.month,
+    'carryover': lambda sheet: _money(sheet.carryover),
+    'inflow': lambda sheet: _money(sheet.inflow),
+    'outflow': lambda sheet: _money(sheet.outflow),
+    'available': lambda sheet: _money(sheet.available),
+}
+
+ENTRY_FIELDS = {
+    'id': lambda entry: entry.pk,
+    'category': lambda entry: entry.category_id,
+    'value': lambda entry: _money(entry.value),
+    'activity': lambda entry: _money(entry.activity),
+    'available': lambda entry: _money(entry.available),
+    'underfunded': lambda entry: _money(entry.underfunded),
+    'locked': lambda entry: entry.locked,
+}
+
+def select_fields(request, resource, available):
+    """
+    Returns the fields of the resource requested with the fields[<resource>] parameter.
+
+    All available fields are returned if the parameter is missing. Unknown fields are a ValueError.
+    """
+    requested = request.GET.get(f'fields[{resource}]')
+    if requested is None:
+        return list(available)
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields of {resource}: {', '.join(unknown)}")
+    return fields
+
+def serialize(instance, fields, available):
+    """
+    Returns a dictionary with the given fields of the instance.
+    """
+    return {field: available[field](instance) for field in fields}
+
+def change_marker(request, querysets):
+    """
+    Returns a tag identifying the state of the given query sets.
+
+    The tag changes whenever a row is added, updated or removed. It is calculated once per request
+    with a single aggregate per query set.
+    """
+    marker = getattr(request, 'budgeteer_change_marker', None)
+    if marker is None:
+        states = [queryset.order_by().aggregate(updated=models.Max('updated'),
+                                                count=models.Count('pk'))
+                  for queryset in querysets]
+        tag = hashlib.sha256(
+            "|".join([request.get_full_path()]
+                     + [f"{state['updated']}:{state['count']}" for state in states])
+            .encode()
+        ).hexdigest()
+        marker = f'"{tag}"'
+        request.budgeteer_change_marker = marker
+    return marker
+
+def _account_list_querysets(kwargs):
+    #pylint: disable=unused-argument
+    return [Account.objects.all(), Transaction.objects.all()]
+
+def _account_transactions_querysets(kwargs):
+    return [Transaction.objects.filter(account_id=kwargs['id']),
+            Account.objects.filter(pk=kwargs['id'])]
+
+def _sheet_querysets(kwargs):
+    until_sheet = (models.Q(year__lt=kwargs['year'])
+                   | models.Q(year=kwargs['year'], month__lte=kwargs['month']))
+    if kwargs['month'] == 12:
+        next_month = datetime.date(kwargs['year'] + 1, 1, 1)
+    else:
+        next_month = datetime.date(kwargs['year'], kwargs['month'] + 1, 1)
+    return [Sheet.objects.filter(until_sheet),
+            SheetEntry.objects.filter(sheet__in=Sheet.objects.filter(until_sheet)),
+            Transaction.objects.filter(date__lt=next_month),
+            BudgetTarget.objects.all()]
+
+def _conditional(querysets):
+    """
+    Decorates a view method with gzip compression and conditional responses based on the change
+    marker of the query sets returned by the given function for the view arguments.
+    """
+    def etag(request, *args, **kwargs):
+        return change_marker(request, querysets(kwargs))
+
+    def decorator(view):
+        return method_decorator(gzip_page)(method_decorator(condition(etag_func=etag))(view))
+    return decorator
+
+class ApiView(LoginRequiredMixin, View):
+    """
+    Base class of the API views answering unauthenticated requests with 403 instead of a redirect.
+    """
+    raise_exception = True
+
+    @staticmethod
+    def error(message, status):
+        """
+        Returns a JSON response with the given error message and status code.
+        """
+        return JsonResponse({'error': message}, status=status)
+
+class AccountListApi(ApiView):
+    """
+    Returns all accounts.
+    """
+
+    @_conditional(_account_list_querysets)
+    def get(self, request, *args, **kwargs):
+        #pylint: disable=unused-argument
+        try:
+            fields = select_fields(request, 'account', ACCOUNT_FIELDS)
+        except ValueError as error:
+            return self.error(str(error), 400)
+
+        accounts = Account.objects.order_by('pk')
+        if 'total' in fields:
+            accounts = accounts.with_totals()
+        return JsonResponse({
+            'accounts': [serialize(account, fields, ACCOUNT_FIELDS) for account in accounts]
+        })
+
+class AccountTransactionsApi(ApiView):
+    """
+    Returns the transactions of an account, newest first, in pages selected by the "after" cursor.
+    """
+
+    @_conditional(_account_transactions_querysets)
+    def get(self, request, *args, **kwargs):
+        #pylint: disable=unused-argument
+        account = lookup(Account, pk=kwargs['id'])
+        if account is None:
+            return self.error("Unknown account", 404)
+        try:
+            fields = select_fields(request, 'transaction', TRANSACTION_FIELDS)
+            page, next_cursor = keyset_page(Transaction.objects.filter(account=account),
+                                            request.GET.get('after'))
+        except ValueError as error:
+            return self.error(str(error), 400)
+
+        return JsonResponse({
+            'transactions': [serialize(transaction, fields, TRANSACTION_FIELDS)
+                             for transaction in page],
+            'next': next_cursor,
+        })
+
+class SheetApi(ApiView):
+    """
+    Returns a sheet including its entries.
+    """
+
+    @_conditional(_sheet_querysets)
+    def get(self, request, *args, **kwargs):
+        #pylint: disable=unused-argument
+        try:
+            fields = select_fields(request, 'sheet', SHEET_FIELDS)
+            entry_fields = select_fields(request, 'entry', ENTRY_FIELDS)
+        except ValueError as error:
+            return self.error(str(error), 400)
+        try:
+            sheet = Sheet.objects.load_overview(kwargs['year'], kwargs['month'])
+        except Sheet.DoesNotExist:
+            return self.error("Unknown sheet", 404)
+
+        result = serialize(sheet, fields, SHEET_FIELDS)
+        result['entries'] = [serialize(entry, entry_fields, ENTRY_FIELDS)
+                             for entry in sheet.entries]
+        return JsonResponse(result)
+
+def _money(value):
+    if value is None:
+        return None
+    return Decimal(value).quantize(Decimal('.01'))
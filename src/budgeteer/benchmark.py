@@ -0,0 +1,177 @@
+"""
+Benchmarks for the expensive model properties and views.
+
+The benchmarks run against synthetic data created by generate_data and measure the number of
+queries, the wall time and the peak memory of every benchmarked code path. The throughput
+benchmark compares sequential and concurrent views under load from several clients at once.
+
+Aggregated values are cached in a separate cache while benchmarking, so the configured cache,
+which may be shared with sessions or other applications, is neither filled nor cleared.
+"""
+import datetime
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from budgeteer.caching import get_cache
+from budgeteer.models import (Account, AccountBalanceSnapshot, Category, CategoryMonthActivity,
+                              Sheet, Transaction)
+from budgeteer.profiling import QueryCounter
+
+BENCHMARK_USER = 'benchmark'
+
+BENCHMARK_CACHE = 'budgeteer-benchmark'
+
+def generate_data(accounts, categories, years, transactions_per_month, seed=0):
+    """
+    Creates accounts, categories, a sheet for every month and transactions for the given years.
+
+    The years end with the current one. The same seed always produces the same data.
+    """
+    rng = random.Random(seed)
+
+    Category.objects.bulk_create(Category(name=f"Category {i}") for i in range(categories))
+    Account.objects.bulk_create(Account(name=f"Account {i}", balance=Decimal(1000))
+                                for i in range(accounts))
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    account_ids = list(Account.objects.values_list('pk', flat=True))
+
+    last_year = datetime.date.today().year
+    months = [(month, year) for year in range(last_year - years + 1, last_year + 1)
+              for month in range(1, 13)]
+    Sheet.objects.create_with_entries(months)
+
+    Transaction.objects.bulk_create(
+        (Transaction(partner=f"Partner {rng.randrange(100)}",
+                     date=datetime.date(year, month, rng.randint(1, 28)),
+                     value=Decimal(rng.randint(-50000, 50000)) / 100,
+                     category_id=rng.choice(category_ids),
+                     account_id=rng.choice(account_ids))
+         for month, year in months for _ in range(transactions_per_month))
+    )
+    AccountBalanceSnapshot.objects.rebuild()
+    CategoryMonthActivity.objects.rebuild()
+
+def run_benchmarks(repeat=5):
+    """
+    Runs all benchmarks against the data in the database and returns the results.
+
+    Every benchmark is run the given number of times with an empty cache, so the results compare
+    the calculations and not cache hits. The results contain the number of queries and the peak
+    memory of the last run and the minimum and median wall time in seconds.
+    """
+    user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+    client = Client()
+    client.force_login(user)
+
+    latest_sheet = Sheet.objects.order_by('-year', '-month').first()
+    account = Account.objects.order_by('pk').first()
+
+    benchmarks = {
+        'sheet_available': lambda: Sheet.objects.get(pk=latest_sheet.pk).available,
+        'account_total': lambda: Account.objects.get(pk=account.pk).total,
+        'account_list': lambda: client.get(reverse('account-list')),
+        'account_overview': lambda: client.get(reverse('account-view', args=[account.pk])),
+    }
+    return {name: measure(benchmark, repeat, cold=True) for name, benchmark in benchmarks.items()}
+
+def isolated_cache():
+    """
+    Returns a context in which aggregated values are cached in the separate benchmark cache.
+    """
+    return override_settings(
+        CACHES={**settings.CACHES, BENCHMARK_CACHE: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': BENCHMARK_CACHE,
+        }},
+        BUDGETEER_CACHE=BENCHMARK_CACHE,
+    )
+
+def measure(function, repeat=5, cold=False):
+    """
+    Measures query count, wall time and peak memory of the given function.
+
+    With cold set the cache of aggregated values is cleared before every run.
+    """
+    times = []
+    with isolated_cache():
+        for _ in range(repeat):
+            if cold:
+                get_cache().clear()
+            tracemalloc.start()
+            with QueryCounter() as queries:
+                start = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - start)
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        'queries': queries.count,
+        'time_min': min(times),
+        'time_median': statistics.median(times),
+        'peak_memory': peak_memory,
+    }
+
+def run_throughput(clients=8, requests=20):
+    """
+    Compares the throughput of the sequential and the concurrent account overview.
+
+    Every view is requested by the given number of clients in parallel, each sending the given
+    number of requests one after another.
+    """
+    user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+    account = Account.objects.order_by('pk').first()
+
+    with isolated_cache():
+        return {
+            name: measure_throughput(user, reverse(name, args=[account.pk]), clients, requests)
+            for name in ('account-view', 'account-view-concurrent')
+        }
+
+def measure_throughput(user, path, clients=8, requests=20):
+    """
+    Measures the requests per second to the given path with parallel clients of the given user.
+
+    Every client runs in its own thread with its own database connection. Data created in a
+    database transaction that is not committed is not visible to the clients.
+    """
+    sessions = []
+    for _ in range(clients):
+        client = Client()
+        client.force_login(user)
+        sessions.append(client)
+    failures = []
+
+    def run(client):
+        try:
+            for _ in range(requests):
+                response = client.get(path)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=[client]) for client in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    return {
+        'clients': clients,
+        'requests': clients * requests,
+        'failures': len(failures),
+        'requests_per_second': clients * requests / duration,
+    }
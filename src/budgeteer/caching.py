@@ -0,0 +1,77 @@
+"""
+Caching of aggregated values of accounts and sheets.
+
+Values are stored in the cache configured by BUDGETEER_CACHE, which is the local memory cache of
+the process by default and can be any shared backend configured in CACHES. Every account and sheet
+has its own version which is part of the keys of all its cached values. Invalidating an object
+only replaces its version, so its old values are never read again and simply expire.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_TIMEOUT = 3600
+
+_MISSING = object()
+
+def get_cache():
+    """
+    Returns the cache used for aggregated values.
+    """
+    return caches[getattr(settings, 'BUDGETEER_CACHE', 'default')]
+
+def cached(scope, pk, name, calculate):
+    """
+    Returns the named value of the object with the given scope and primary key from the cache.
+
+    If the value is not cached it is calculated with the given function and stored. Objects
+    without primary key are never cached.
+    """
+    if pk is None:
+        return calculate()
+
+    cache = get_cache()
+    key = f"budgeteer:{scope}:{pk}:{_version(cache, scope, pk)}:{name}"
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = calculate()
+        cache.set(key, value, getattr(settings, 'BUDGETEER_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return value
+
+def cached_for_version(name, version, calculate):
+    """
+    Returns the named value calculated for the given data version from the cache.
+
+    For values that depend on too many objects to be invalidated one by one. The caller derives
+    the version from the data, so a new version simply leaves the old value to expire.
+    """
+    cache = get_cache()
+    key = f"budgeteer:{name}:{version}"
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = calculate()
+        cache.set(key, value, getattr(settings, 'BUDGETEER_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return value
+
+def invalidate(scope, pks):
+    """
+    Invalidates all cached values of the objects with the given scope and primary keys.
+    """
+    cache = get_cache()
+    version = _new_version()
+    cache.set_many({_version_key(scope, pk): version for pk in pks if pk is not None}, None)
+
+def _version(cache, scope, pk):
+    key = _version_key(scope, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+def _version_key(scope, pk):
+    return f"budgeteer:{scope}:{pk}:version"
+
+def _new_version():
+    return time.time_ns()
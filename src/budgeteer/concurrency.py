@@ -0,0 +1,58 @@
+"""
+Concurrent execution of independent database calls in a bounded thread pool.
+
+Every worker thread uses its own database connection, so the number of workers also limits the
+number of additional connections. Calls made inside a database transaction are run one after
+another in the calling thread, because other connections can't see the uncommitted changes.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+DEFAULT_WORKERS = 4
+
+_EXECUTOR = None
+
+_EXECUTOR_LOCK = threading.Lock()
+
+def get_executor():
+    """
+    Returns the thread pool shared by all concurrent calls of the process.
+
+    The number of threads is taken from BUDGETEER_CONCURRENT_WORKERS.
+    """
+    global _EXECUTOR #pylint: disable=global-statement
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BUDGETEER_CONCURRENT_WORKERS',
+                                        DEFAULT_WORKERS),
+                    thread_name_prefix='budgeteer'
+                )
+    return _EXECUTOR
+
+def run_concurrently(*functions):
+    """
+    Calls all given functions concurrently and returns their results in the given order.
+
+    The functions run with the context of the caller, e.g. its identity map. If one of them raises
+    an exception it is raised here after all functions have finished.
+    """
+    if connection.in_atomic_block or len(functions) < 2:
+        return [function() for function in functions]
+
+    futures = [get_executor().submit(contextvars.copy_context().run, _in_worker, function)
+               for function in functions]
+    wait(futures)
+    return [future.result() for future in futures]
+
+def _in_worker(function):
+    close_old_connections()
+    try:
+        return function()
+    finally:
+        close_old_connections()
@@ -0,0 +1,93 @@
+"""
+Recognition of duplicate transactions by their content fingerprint.
+"""
+from collections import Counter
+
+from django.db import models
+
+from budgeteer.models import Transaction
+
+DEFAULT_BATCH_SIZE = 1000
+
+LOOKUP_CHUNK_SIZE = 500
+
+class DuplicateFilter:
+    """
+    In-memory filter for skipping transactions that already exist in the database.
+
+    The known fingerprints are looked up with one query per chunk. Every query looks up at most
+    LOOKUP_CHUNK_SIZE fingerprints to stay below the variable limit of older SQLite versions. A
+    fingerprint that exists n times in the database lets the first n occurrences pass as known,
+    so identical transactions within a statement are kept on a re-import. Only transactions that
+    existed when the filter was created count as known.
+
+    To keep the memory bounded, only the fingerprints of the days in the last chunk are kept.
+    Identical transactions share their day and statements list their transactions in date order,
+    so they are in the same or in consecutive chunks.
+    """
+
+    def __init__(self):
+        self.last_pk = Transaction.objects.aggregate(last=models.Max('pk'))['last'] or 0
+        self.known = {}
+        self.seen = Counter()
+        self.days = {}
+
+    def filter(self, transactions):
+        """
+        Returns the given unsaved transactions without the ones that already exist.
+
+        The fingerprints of the returned transactions are set.
+        """
+        assign_fingerprints(transactions)
+
+        unknown = list({t.fingerprint for t in transactions} - self.known.keys())
+        self.known.update({fingerprint: 0 for fingerprint in unknown})
+        for start in range(0, len(unknown), LOOKUP_CHUNK_SIZE):
+            chunk = unknown[start:start + LOOKUP_CHUNK_SIZE]
+            self.known.update(Counter(Transaction.objects
+                                      .filter(fingerprint__in=chunk, pk__lte=self.last_pk)
+                                      .values_list('fingerprint', flat=True)))
+
+        new_transactions = []
+        for transaction in transactions:
+            self.days[transaction.fingerprint] = transaction.date
+            self.seen[transaction.fingerprint] += 1
+            if self.seen[transaction.fingerprint] > self.known[transaction.fingerprint]:
+                new_transactions.append(transaction)
+        self.__forget_other_days({t.date for t in transactions})
+        return new_transactions
+
+    def __forget_other_days(self, days):
+        forgotten = [fingerprint for fingerprint, day in self.days.items() if day not in days]
+        for fingerprint in forgotten:
+            del self.days[fingerprint]
+            del self.known[fingerprint]
+            self.seen.pop(fingerprint, None)
+
+def assign_fingerprints(transactions):
+    """
+    Sets the fingerprint of all given transactions without saving them.
+    """
+    for transaction in transactions:
+        transaction.update_fingerprint()
+
+def backfill_fingerprints(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Calculates the fingerprints of all transactions that don't have one yet.
+
+    The transactions are processed in batches ordered by primary key. Returns the number of
+    updated transactions.
+    """
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(Transaction.objects
+                     .filter(fingerprint='', pk__gt=last_pk)
+                     .order_by('pk')
+                     .only('pk', 'account_id', 'date', 'value', 'partner')[:batch_size])
+        if not batch:
+            return updated
+        assign_fingerprints(batch)
+        Transaction.objects.bulk_update(batch, ['fingerprint'])
+        updated += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,138 @@
+"""
+Cash-flow forecast of the daily balances of all accounts.
+
+The forecast starts with the balance of every account at the end of the day before the first
+forecast day and adds all transactions and pending occurrences of recurring transactions on their
+day. Balances are kept in cents in a flat integer array with one row per day and one column per
+account instead of model instances, so a forecast over years for all accounts needs only a handful
+of queries and a pass over the array per account.
+"""
+import calendar
+import datetime
+from array import array
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import Coalesce
+
+from budgeteer.models import (Account, AccountBalanceSnapshot, RecurringTransaction,
+                              Transaction)
+
+DEFAULT_MONTHS = 12
+
+class Forecast:
+    """
+    Projected balances at the end of consecutive days for a list of accounts.
+    """
+
+    def __init__(self, start, days, accounts, balances):
+        self.start = start
+        self.days = days
+        self.accounts = accounts
+        self.balances = balances
+        self.__columns = {pk: column for column, (pk, _) in enumerate(accounts)}
+
+    @property
+    def end(self):
+        """
+        Returns the last day of the forecast.
+        """
+        return self.start + datetime.timedelta(days=self.days - 1)
+
+    def dates(self):
+        """
+        Yields all days of the forecast in order.
+        """
+        for day in range(self.days):
+            yield self.start + datetime.timedelta(days=day)
+
+    def series(self, account_id):
+        """
+        Returns the balances of the given account in cents for all days of the forecast.
+        """
+        return self.balances[self.__columns[account_id]::len(self.accounts)]
+
+    def balance(self, account_id, date):
+        """
+        Returns the projected balance of the given account at the end of the given day.
+
+        Days outside of the forecast are a ValueError.
+        """
+        day = (date - self.start).days
+        if not 0 <= day < self.days:
+            raise ValueError(f"{date:%Y-%m-%d} is not part of the forecast")
+        cents = self.balances[day * len(self.accounts) + self.__columns[account_id]]
+        return Decimal(cents).scaleb(-2)
+
+def forecast(months=None, start=None):
+    """
+    Returns the forecast of all accounts for the given number of months from the start date.
+
+    If no number of months is given BUDGETEER_FORECAST_MONTHS from the settings is used, the start
+    date defaults to today. Materialized transactions are included whether they are locked or not,
+    recurring transactions only with their occurrences that are not materialized yet.
+    """
+    if months is None:
+        months = getattr(settings, 'BUDGETEER_FORECAST_MONTHS', DEFAULT_MONTHS)
+    if start is None:
+        start = datetime.date.today()
+    end = _add_months(start, months) - datetime.timedelta(days=1)
+    days = (end - start).days + 1
+
+    rows = list(_with_opening_balances(Account.objects.order_by('pk'), start)
+                .values_list('pk', 'name', 'balance', 'latest_locked', 'before_start'))
+    accounts = [(pk, name) for pk, name, *_ in rows]
+    width = len(accounts)
+    columns = {pk: column for column, (pk, _) in enumerate(accounts)}
+
+    balances = array('q', [0]) * (days * width)
+    for column, (_, _, balance, latest_locked, before_start) in enumerate(rows):
+        balances[column] = _cents(balance) - _cents(latest_locked) + _cents(before_start)
+
+    transactions = (Transaction.objects
+                    .filter(date__gte=start, date__lte=end)
+                    .values_list('account_id', 'date', 'value'))
+    for account_id, date, value in transactions:
+        balances[(date - start).days * width + columns[account_id]] += _cents(value)
+
+    for date, recurring in RecurringTransaction.objects.pending(start, end):
+        balances[(date - start).days * width + columns[recurring.account_id]] += (
+            _cents(recurring.value)
+        )
+
+    for column in range(width):
+        balances[column::width] = array('q', accumulate(balances[column::width]))
+    return Forecast(start, days, accounts, balances)
+
+def _with_opening_balances(accounts, start):
+    """
+    Annotates the locked total of the latest snapshot and the sum of all transactions before the
+    start date of each account.
+    """
+    snapshots = (AccountBalanceSnapshot.objects
+                 .filter(account=models.OuterRef('pk'))
+                 .order_by('-date'))
+    before_start = (snapshots
+                    .filter(date__lt=start)
+                    .annotate(total=models.F('unlocked_total') + models.F('locked_total'))
+                    .values('total')[:1])
+    output_field = models.DecimalField(max_digits=12, decimal_places=2)
+    return accounts.annotate(
+        latest_locked=Coalesce(
+            models.Subquery(snapshots.values('locked_total')[:1]), Decimal(0),
+            output_field=output_field
+        ),
+        before_start=Coalesce(
+            models.Subquery(before_start), Decimal(0), output_field=output_field
+        ),
+    )
+
+def _add_months(date, months):
+    year, month = divmod(date.year * 12 + date.month - 1 + months, 12)
+    month += 1
+    return datetime.date(year, month, min(date.day, calendar.monthrange(year, month)[1]))
+
+def _cents(value):
+    return int((Decimal(value) * 100).to_integral_value())
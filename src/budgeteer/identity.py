@@ -0,0 +1,95 @@
+"""
+Identity map for model instances looked up repeatedly during a request or a batch job.
+
+While an identity map is active every lookup of the same model and fields returns the same
+instance without querying the database again. Requests get their own map from the
+IdentityMapMiddleware, other code can activate one with the identity_map context manager.
+"""
+import contextvars
+from contextlib import contextmanager
+
+_CURRENT = contextvars.ContextVar('budgeteer_identity_map', default=None)
+
+class IdentityMap:
+    """
+    Instances of models by their lookup fields, including lookups without a result.
+    """
+
+    def __init__(self):
+        self.__instances = {}
+
+    def get(self, model, **lookup):
+        """
+        Returns the instance of the model matching the lookup or None if none exists.
+
+        The database is only queried the first time a lookup is made.
+        """
+        key = _key(model, lookup)
+        if key not in self.__instances:
+            try:
+                instance = model._default_manager.get(**lookup)
+            except model.DoesNotExist:
+                instance = None
+            self.__instances[key] = instance
+            if instance is not None:
+                self.__instances.setdefault(_key(model, {'pk': instance.pk}), instance)
+        return self.__instances[key]
+
+    def remember(self, instance):
+        """
+        Adds a saved instance and drops all other lookups of its model, which may be outdated.
+        """
+        self.forget(instance)
+        self.__instances[_key(type(instance), {'pk': instance.pk})] = instance
+
+    def forget(self, instance):
+        """
+        Drops all lookups of the model of the given instance.
+        """
+        model = type(instance)
+        for key in [key for key in self.__instances if key[0] is model]:
+            del self.__instances[key]
+
+    def __len__(self):
+        return len(self.__instances)
+
+def current():
+    """
+    Returns the active identity map or None if there is none.
+    """
+    return _CURRENT.get()
+
+@contextmanager
+def identity_map():
+    """
+    Activates an identity map for the enclosed code and returns it.
+
+    If an identity map is already active it is used instead of a new one.
+    """
+    active = _CURRENT.get()
+    if active is not None:
+        yield active
+        return
+
+    token = _CURRENT.set(IdentityMap())
+    try:
+        yield _CURRENT.get()
+    finally:
+        _CURRENT.reset(token)
+
+def lookup(model, **fields):
+    """
+    Returns the instance of the model matching the lookup or None if none exists.
+
+    The active identity map is used if there is one, otherwise the database is queried directly.
+    """
+    active = _CURRENT.get()
+    if active is not None:
+        return active.get(model, **fields)
+    try:
+        return model._default_manager.get(**fields)
+    except model.DoesNotExist:
+        return None
+
+def _key(model, lookup):
+    return (model, tuple(sorted(lookup.items())))
@@ -0,0 +1,255 @@
+"""
+Import of transactions from bank statement exports.
+
+Statements are parsed as a stream of rows and imported in batches, so even very large files are
+imported with bounded memory and a small number of queries.
+"""
+import csv
+import datetime
+import re
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from budgeteer import caching
+from budgeteer.fingerprints import DuplicateFilter, assign_fingerprints
+from budgeteer.models import (Account, AccountBalanceSnapshot, Category, CategoryMonthActivity,
+                              Sheet, Transaction)
+
+DEFAULT_BATCH_SIZE = 1000
+
+PARTNER_MAX_LENGTH = Transaction._meta.get_field('partner').max_length
+
+ImportResult = namedtuple('ImportResult', ['imported', 'skipped'])
+
+StatementRow = namedtuple('StatementRow', ['date', 'value', 'partner', 'category', 'account'],
+                          defaults=[None, None])
+
+def parse_csv(stream, delimiter=',', date_format='%Y-%m-%d', decimal_separator='.'):
+    """
+    Parses a CSV statement with a header line.
+
+    The columns date, partner and value are required, the columns category and account are
+    optional and contain names.
+    """
+    reader = csv.DictReader(stream, delimiter=delimiter)
+    for line, record in enumerate(reader, start=2):
+        try:
+            yield StatementRow(
+                date=datetime.datetime.strptime(record['date'].strip(), date_format).date(),
+                value=Decimal(record['value'].strip()
+                              .replace(' ', '')
+                              .replace(decimal_separator, '.')),
+                partner=record['partner'].strip(),
+                category=(record.get('category') or '').strip() or None,
+                account=(record.get('account') or '').strip() or None,
+            )
+        except (KeyError, AttributeError, ValueError, InvalidOperation) as error:
+            raise ValueError(f"Invalid CSV record in line {line}: {error}") from error
+
+_MT940_STATEMENT_LINE = re.compile(r'^(\d{6})(\d{4})?(RC|RD|C|D)[A-Z]?(\d+,\d{0,2})')
+
+_MT940_SUBFIELD = re.compile(r'\?(\d{2})')
+
+def parse_mt940(stream):
+    """
+    Parses a SWIFT MT940 statement.
+
+    Every :61: statement line becomes a row, the partner is taken from the following :86: field.
+    """
+    statement_line = None
+    details = None
+    in_details = False
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if line.startswith(':61:'):
+            if statement_line is not None:
+                yield _mt940_row(statement_line, details)
+            statement_line, details = line[4:], None
+            in_details = False
+        elif line.startswith(':86:'):
+            details, in_details = line[4:], True
+        elif line.startswith(':') or line.startswith('-'):
+            in_details = False
+        elif in_details:
+            details += line
+    if statement_line is not None:
+        yield _mt940_row(statement_line, details)
+
+def _mt940_row(statement_line, details):
+    match = _MT940_STATEMENT_LINE.match(statement_line)
+    if match is None:
+        raise ValueError(f"Invalid MT940 statement line: {statement_line}")
+    value = Decimal(match.group(4).replace(',', '.'))
+    if match.group(3) in ('D', 'RC'):
+        value = -value
+    return StatementRow(date=datetime.datetime.strptime(match.group(1), '%y%m%d').date(),
+                        value=value,
+                        partner=_mt940_partner(details or ''))
+
+def _mt940_partner(details):
+    if '?' not in details:
+        return details.strip()
+
+    parts = _MT940_SUBFIELD.split(details)
+    subfields = dict(zip(parts[1::2], parts[2::2]))
+    partner = (subfields.get('32', '') + subfields.get('33', '')).strip()
+    if partner:
+        return partner
+    return ''.join(subfields.get(str(code), '') for code in range(20, 30)).strip()
+
+def parse_camt(stream):
+    """
+    Parses an ISO 20022 CAMT.052/053 statement.
+
+    Every entry becomes a row, the partner is the debtor of credits and the creditor of debits.
+    """
+    for _, element in ElementTree.iterparse(stream):
+        if _local_name(element.tag) != 'Ntry':
+            continue
+
+        value = Decimal(_find_text(element, 'Amt'))
+        if _find_text(element, 'CdtDbtInd') == 'DBIT':
+            value = -value
+            partner = _find_text(element, 'Cdtr', 'Nm')
+        else:
+            partner = _find_text(element, 'Dbtr', 'Nm')
+        date = (_find_text(element, 'BookgDt', 'Dt') or _find_text(element, 'ValDt', 'Dt')
+                or _find_text(element, 'BookgDt', 'DtTm')[:10])
+
+        yield StatementRow(
+            date=datetime.date.fromisoformat(date),
+            value=value,
+            partner=(partner or _find_text(element, 'Ustrd')
+                     or _find_text(element, 'AddtlNtryInf') or '').strip(),
+        )
+        element.clear()
+
+def _local_name(tag):
+    return tag.rpartition('}')[2]
+
+def _find_text(element, *path):
+    """
+    Returns the text of the first descendant matching the path of local names or an empty string.
+    """
+    candidates = [element]
+    for name in path:
+        candidates = [descendant for candidate in candidates for descendant in candidate.iter()
+                      if descendant is not candidate and _local_name(descendant.tag) == name]
+    return (candidates[0].text or '') if candidates else ''
+
+PARSERS = {
+    'csv': parse_csv,
+    'mt940': parse_mt940,
+    'camt': parse_camt,
+}
+
+class _Resolver:
+    """
+    Resolves category and account names to primary keys with an in-memory cache.
+
+    Unknown categories are created, unknown accounts are an error.
+    """
+
+    def __init__(self, default_account, default_category):
+        self.default_account = default_account
+        self.default_category = default_category
+        self.accounts = {}
+        self.categories = {}
+
+    def account(self, name):
+        """
+        Returns the primary key of the account with the given name or of the default account.
+        """
+        if name is None:
+            if self.default_account is None:
+                raise ValueError("Statement row without account and no default account given")
+            return self.default_account.pk
+        if name not in self.accounts:
+            account = Account.objects.filter(name=name).first()
+            if account is None:
+                raise ValueError(f"Unknown account {name}")
+            self.accounts[name] = account.pk
+        return self.accounts[name]
+
+    def category(self, name):
+        """
+        Returns the primary key of the category with the given name or of the default category.
+        """
+        if name is None:
+            if self.default_category is None:
+                raise ValueError("Statement row without category and no default category given")
+            return self.default_category.pk
+        if name not in self.categories:
+            category = Category.objects.filter(name=name).first()
+            if category is None:
+                category = Category(name=name)
+                category.save()
+            self.categories[name] = category.pk
+        return self.categories[name]
+
+def import_transactions(rows, account=None, category=None, batch_size=DEFAULT_BATCH_SIZE,
+                        skip_duplicates=True):
+    """
+    Imports the given statement rows as transactions.
+
+    Rows without account or category are assigned to the given defaults. The rows are consumed
+    lazily and inserted in batches of the given size inside a single database transaction.
+    Transactions that already exist are skipped unless skip_duplicates is disabled. The monthly
+    category activity and the running totals of the accounts are updated once per batch, the
+    cached values of the affected accounts and sheets are invalidated once at the end.
+    """
+    if batch_size <= 0:
+        raise ValueError(f"Batch size must be positive, got {batch_size}")
+    resolver = _Resolver(account, category)
+    duplicates = DuplicateFilter()
+    rows = iter(rows)
+    result = ImportResult(0, 0)
+    accounts = set()
+    earliest = datetime.date.max
+    with transaction.atomic():
+        for chunk in iter(lambda: list(islice(rows, batch_size)), []):
+            transactions = [
+                Transaction(date=row.date,
+                            value=row.value,
+                            partner=row.partner[:PARTNER_MAX_LENGTH],
+                            category_id=resolver.category(row.category),
+                            account_id=resolver.account(row.account))
+                for row in chunk
+            ]
+            if skip_duplicates:
+                new_transactions = duplicates.filter(transactions)
+            else:
+                assign_fingerprints(transactions)
+                new_transactions = transactions
+            Transaction.objects.bulk_create(new_transactions)
+            CategoryMonthActivity.objects.apply_transactions(new_transactions)
+            AccountBalanceSnapshot.objects.apply_transactions(new_transactions)
+            accounts.update(t.account_id for t in new_transactions)
+            earliest = min([earliest] + [t.date for t in new_transactions])
+            result = ImportResult(result.imported + len(new_transactions),
+                                  result.skipped + len(chunk) - len(new_transactions))
+        if accounts:
+            caching.invalidate('account', accounts)
+            Sheet.objects.invalidate_from(earliest.year, earliest.month)
+    return result
+
+def import_file(path, statement_format, account=None, category=None,
+                batch_size=DEFAULT_BATCH_SIZE, encoding='utf-8', skip_duplicates=True,
+                **parser_options):
+    """
+    Imports all transactions of the statement file at the given path.
+
+    Additional keyword arguments are passed on to the parser of the statement format.
+    """
+    parser = PARSERS[statement_format]
+    if statement_format == 'camt':
+        with open(path, 'rb') as stream:
+            return import_transactions(parser(stream, **parser_options),
+                                       account, category, batch_size, skip_duplicates)
+    with open(path, encoding=encoding, newline='') as stream:
+        return import_transactions(parser(stream, **parser_options),
+                                   account, category, batch_size, skip_duplicates)
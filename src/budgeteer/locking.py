@@ -0,0 +1,140 @@
+"""
+Locking of old sheets and the transactions belonging to them.
+
+Locked sheets have their carryover frozen which keeps the calculation of available amounts short.
+"""
+import datetime
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from budgeteer import caching
+from budgeteer.models import Account, AccountBalanceSnapshot, Sheet, SheetEntry, Transaction
+from budgeteer.profiling import QueryCounter
+
+DEFAULT_HORIZON_MONTHS = 3
+
+LockResult = namedtuple('LockResult', ['sheets', 'entries', 'transactions'])
+
+AvailablePathCost = namedtuple('AvailablePathCost', ['sheets', 'queries'])
+
+def lock_old_sheets(months=None, today=None):
+    """
+    Locks all open sheets that are more than the given number of months in the past.
+
+    The sheets are processed from the oldest to the newest one. Every sheet gets its carryover
+    frozen and its sheet entries and transactions locked in a single database transaction, so an
+    interrupted run can simply be started again. Sheets that already have a carryover are skipped.
+
+    If no number of months is given BUDGETEER_LOCK_HORIZON_MONTHS from the settings is used.
+    """
+    if months is None:
+        months = getattr(settings, 'BUDGETEER_LOCK_HORIZON_MONTHS', DEFAULT_HORIZON_MONTHS)
+    if today is None:
+        today = datetime.date.today()
+
+    last_year, last_month = divmod(today.year * 12 + today.month - 2 - months, 12)
+    last_month += 1
+    candidates = list(Sheet.objects
+                      .filter(carryover__isnull=True)
+                      .filter(models.Q(year__lt=last_year)
+                              | models.Q(year=last_year, month__lte=last_month))
+                      .order_by('-year', '-month'))
+
+    available = {}
+    for sheet in candidates:
+        if sheet.pk not in available:
+            available.update(Sheet.objects.available_chain(sheet))
+
+    result = LockResult(0, 0, 0)
+    for sheet in reversed(candidates):
+        with transaction.atomic():
+            frozen = (Sheet.objects
+                      .filter(pk=sheet.pk, carryover__isnull=True)
+                      .update(carryover=available[sheet.pk], updated=timezone.now()))
+            if not frozen:
+                continue
+            entries = lock_sheet_entries(SheetEntry.objects.filter(sheet=sheet))
+            transactions = lock_transactions(sheet.transactions)
+        result = LockResult(result.sheets + 1,
+                            result.entries + entries,
+                            result.transactions + transactions)
+    return result
+
+def filter_transactions(start=None, end=None, account=None, sheet=None):
+    """
+    Returns all transactions in the given date range, on the given account and on the given sheet.
+
+    Every criterion that is None is ignored.
+    """
+    transactions = sheet.transactions if sheet is not None else Transaction.objects.all()
+    if start is not None:
+        transactions = transactions.filter(date__gte=start)
+    if end is not None:
+        transactions = transactions.filter(date__lte=end)
+    if account is not None:
+        transactions = transactions.filter(account=account)
+    return transactions
+
+def lock_transactions(transactions):
+    """
+    Locks all unlocked transactions of the given query set.
+
+    The values of the newly locked transactions are moved into the balance of their accounts so
+    the account totals stay the same. Returns the number of locked transactions.
+    """
+    return _set_transactions_locked(transactions, True)
+
+def unlock_transactions(transactions):
+    """
+    Unlocks all locked transactions of the given query set.
+
+    The values of the unlocked transactions are removed from the balance of their accounts so
+    the account totals stay the same. Returns the number of unlocked transactions.
+    """
+    return _set_transactions_locked(transactions, False)
+
+def lock_sheet_entries(entries):
+    """
+    Locks all unlocked sheet entries of the given query set and returns their number.
+    """
+    return entries.filter(locked=False).update(locked=True, updated=timezone.now())
+
+def unlock_sheet_entries(entries):
+    """
+    Unlocks all locked sheet entries of the given query set and returns their number.
+    """
+    return entries.filter(locked=True).update(locked=False, updated=timezone.now())
+
+def _set_transactions_locked(transactions, locked):
+    transactions = transactions.filter(locked=not locked)
+    sign = 1 if locked else -1
+    with transaction.atomic():
+        totals = {account_id: sign * Decimal(total).quantize(Decimal('.01'))
+                  for account_id, total in (transactions
+                                            .order_by()
+                                            .values('account')
+                                            .annotate(total=models.Sum('value'))
+                                            .values_list('account', 'total'))}
+        Account.objects.add_to_balances(totals)
+        AccountBalanceSnapshot.objects.move(transactions, locked)
+        changed = transactions.update(locked=locked, updated=timezone.now())
+    caching.invalidate('account', totals)
+    return changed
+
+def measure_available_path():
+    """
+    Measures the cost of calculating the available amount of the latest sheet.
+
+    Returns the number of sheets in the carryover chain and the number of queries needed, or
+    None if there are no sheets.
+    """
+    latest = Sheet.objects.order_by('-year', '-month').first()
+    if latest is None:
+        return None
+    with QueryCounter() as queries:
+        chain = Sheet.objects.available_chain(latest)
+    return AvailablePathCost(len(chain), queries.count)
@@ -0,0 +1,19 @@
+"""
+Management command for rebuilding the monthly category activity.
+"""
+from django.core.management.base import BaseCommand
+
+from budgeteer.models import CategoryMonthActivity
+
+class Command(BaseCommand):
+    """
+    Rebuilds the monthly activity of all categories from the existing transactions.
+    """
+    help = "Calculates the monthly category activity from all transactions in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = CategoryMonthActivity.objects.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} monthly category activities."))
@@ -0,0 +1,19 @@
+"""
+Management command for calculating missing transaction fingerprints.
+"""
+from django.core.management.base import BaseCommand
+
+from budgeteer.fingerprints import DEFAULT_BATCH_SIZE, backfill_fingerprints
+
+class Command(BaseCommand):
+    """
+    Calculates the fingerprints of all transactions that don't have one yet.
+    """
+    help = "Calculates missing fingerprints of transactions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        updated = backfill_fingerprints(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Calculated {updated} fingerprints."))
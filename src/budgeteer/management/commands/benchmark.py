@@ -0,0 +1,54 @@
+"""
+Management command for benchmarking models and views.
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from budgeteer.benchmark import generate_data, run_benchmarks, run_throughput
+
+class Command(BaseCommand):
+    """
+    Runs the benchmarks against synthetic data in a temporary test database.
+    """
+    help = "Measures queries, time and memory of models and views and writes the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=5)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--transactions', type=int, default=100,
+                            help="Number of transactions per month.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clients', type=int, default=8,
+                            help="Number of parallel clients of the throughput benchmark.")
+        parser.add_argument('--requests', type=int, default=20,
+                            help="Number of requests per client of the throughput benchmark.")
+        parser.add_argument('--output', help="File to write the results to instead of stdout.")
+
+    def handle(self, *args, **options):
+        parameters = {name: options[name] for name in
+                      ('accounts', 'categories', 'years', 'transactions', 'seed')}
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            generate_data(parameters['accounts'], parameters['categories'],
+                          parameters['years'], parameters['transactions'], parameters['seed'])
+            results = run_benchmarks(options['repeat'])
+            throughput = run_throughput(options['clients'], options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = json.dumps({'parameters': parameters, 'results': results,
+                             'throughput': throughput}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
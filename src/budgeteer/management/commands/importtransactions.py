@@ -0,0 +1,57 @@
+"""
+Management command for importing bank statements.
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budgeteer.importing import DEFAULT_BATCH_SIZE, PARSERS, import_file
+from budgeteer.models import Account, Category
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.sta': 'mt940',
+    '.mt940': 'mt940',
+    '.xml': 'camt',
+}
+
+class Command(BaseCommand):
+    """
+    Imports the transactions of a bank statement file.
+    """
+    help = "Imports transactions from a CSV, MT940 or CAMT bank statement."
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--format', choices=sorted(PARSERS),
+                            help="Statement format, guessed from the file extension by default.")
+        parser.add_argument('--account', help="Name of the account for rows without account.")
+        parser.add_argument('--category', help="Name of the category for rows without category.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--keep-duplicates', action='store_true',
+                            help="Import transactions even if they already exist.")
+
+    def handle(self, *args, **options):
+        statement_format = options['format']
+        if statement_format is None:
+            extension = os.path.splitext(options['file'])[1].lower()
+            if extension not in EXTENSIONS:
+                raise CommandError("Unknown file extension, please specify the format.")
+            statement_format = EXTENSIONS[extension]
+
+        try:
+            account = (Account.objects.get(name=options['account'])
+                       if options['account'] else None)
+            category = (Category.objects.get(name=options['category'])
+                        if options['category'] else None)
+            result = import_file(options['file'], statement_format, account, category,
+                                 batch_size=options['batch_size'],
+                                 encoding=options['encoding'],
+                                 skip_duplicates=not options['keep_duplicates'])
+        except (Account.DoesNotExist, Category.DoesNotExist, ValueError, OSError) as error:
+            raise CommandError(error) from error
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} transactions, skipped {result.skipped} duplicates."
+        ))
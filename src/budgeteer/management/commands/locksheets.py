@@ -0,0 +1,32 @@
+"""
+Management command for locking old sheets.
+"""
+from django.core.management.base import BaseCommand
+
+from budgeteer.locking import lock_old_sheets, measure_available_path
+
+class Command(BaseCommand):
+    """
+    Locks all open sheets older than a configurable number of months.
+    """
+    help = "Freezes the carryover of old sheets and locks their entries and transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=None,
+                            help="Number of past months to keep open. Defaults to the "
+                                 "BUDGETEER_LOCK_HORIZON_MONTHS setting.")
+
+    def handle(self, *args, **options):
+        before = measure_available_path()
+        result = lock_old_sheets(months=options['months'])
+        after = measure_available_path()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Locked {result.sheets} sheets, {result.entries} sheet entries "
+            f"and {result.transactions} transactions."
+        ))
+        if before is not None:
+            self.stdout.write(
+                f"Available calculation of the latest sheet: {before.sheets} -> {after.sheets} "
+                f"sheets, {before.queries} -> {after.queries} queries."
+            )
@@ -0,0 +1,28 @@
+"""
+Management command for materializing recurring transactions.
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budgeteer.recurring import materialize
+
+class Command(BaseCommand):
+    """
+    Creates the transactions of all due occurrences of recurring transactions.
+    """
+    help = "Creates the transactions of all occurrences of recurring transactions up to a date."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help="Last day to materialize as YYYY-MM-DD, default today.")
+
+    def handle(self, *args, **options):
+        until = datetime.date.today()
+        if options['until']:
+            try:
+                until = datetime.date.fromisoformat(options['until'])
+            except ValueError as error:
+                raise CommandError(f"Invalid date {options['until']}") from error
+
+        created = materialize(until)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} recurring transactions."))
@@ -0,0 +1,32 @@
+"""
+Management command for verifying and rebuilding the running account totals.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from budgeteer.models import AccountBalanceSnapshot
+
+class Command(BaseCommand):
+    """
+    Verifies the stored running totals of all accounts and rebuilds them from the transactions.
+    """
+    help = "Compares the account balance snapshots with a full recalculation and rebuilds them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only verify the snapshots and fail if they don't match.")
+
+    def handle(self, *args, **options):
+        mismatches = AccountBalanceSnapshot.objects.verify()
+        for account_id, date in mismatches:
+            self.stdout.write(f"Mismatch for account {account_id} on {date:%Y-%m-%d}")
+
+        if options['check']:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} balance snapshots don't match.")
+            self.stdout.write(self.style.SUCCESS("All balance snapshots match."))
+            return
+
+        created = AccountBalanceSnapshot.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(mismatches)} mismatches, rebuilt {created} balance snapshots."
+        ))
@@ -0,0 +1,127 @@
+"""
+Budgeteer main app middleware
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from budgeteer.identity import identity_map
+from budgeteer.profiling import QueryCounter
+
+DEFAULT_WINDOW = 1000
+
+class TimingStatistics:
+    """
+    Rolling window of the latest request timings per URL name.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.__samples = {}
+        self.__lock = threading.Lock()
+
+    def record(self, url_name, total, database, queries, render):
+        """
+        Records the timing of a single request, dropping the oldest one if the window is full.
+        """
+        samples = self.__samples.get(url_name)
+        if samples is None:
+            with self.__lock:
+                samples = self.__samples.setdefault(url_name, deque(maxlen=self.window))
+        samples.append((total, database, queries, render))
+
+    def summary(self):
+        """
+        Returns percentiles of time and query count per URL name.
+
+        Times are given in milliseconds.
+        """
+        with self.__lock:
+            samples = {url_name: list(values) for url_name, values in self.__samples.items()}
+
+        return {
+            url_name: {
+                'requests': len(values),
+                'total': _percentiles([value[0] * 1000 for value in values]),
+                'database': _percentiles([value[1] * 1000 for value in values]),
+                'queries': _percentiles([value[2] for value in values]),
+                'render': _percentiles([value[3] * 1000 for value in values]),
+            } for url_name, values in sorted(samples.items()) if values
+        }
+
+    def clear(self):
+        """
+        Removes all recorded timings.
+        """
+        with self.__lock:
+            self.__samples.clear()
+
+STATISTICS = TimingStatistics(getattr(settings, 'BUDGETEER_TIMING_WINDOW', DEFAULT_WINDOW))
+
+class TimingMiddleware:
+    """
+    Measures query count, database time, template render time and total time of every request.
+
+    The measurements are added to the response as Server-Timing header and recorded in the
+    in-process statistics. The middleware is only active if BUDGETEER_TIMING is enabled.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BUDGETEER_TIMING', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.budgeteer_render_time = 0.0
+        start = time.perf_counter()
+        with QueryCounter() as queries:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        render = request.budgeteer_render_time
+        response['Server-Timing'] = (
+            f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries", '
+            f'render;dur={render * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+
+        match = request.resolver_match
+        url_name = match.view_name if match is not None else None
+        STATISTICS.record(url_name or '<unresolved>', total, queries.duration, queries.count,
+                          render)
+        return response
+
+    def process_template_response(self, request, response):
+        #pylint: disable=no-self-use
+        """
+        Starts measuring the render time, which ends when the response has been rendered.
+        """
+        start = time.perf_counter()
+
+        def stop(_):
+            request.budgeteer_render_time += time.perf_counter() - start
+
+        response.add_post_render_callback(stop)
+        return response
+
+class IdentityMapMiddleware:
+    """
+    Activates an identity map for every request, so repeated lookups of sheets and accounts
+    during the request are answered from memory.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map():
+            return self.get_response(request)
+
+def _percentiles(values):
+    values = sorted(values)
+    return {
+        f'p{percentile}': values[min(len(values) - 1, len(values) * percentile // 100)]
+        for percentile in (50, 95, 99)
+    }
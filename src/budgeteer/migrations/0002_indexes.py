@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-16 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sheet',
+            index=models.Index(fields=['year', 'month'], name='sheet_year_month'),
+        ),
+        migrations.AddIndex(
+            model_name='sheetentry',
+            index=models.Index(fields=['sheet', 'category'], name='sheetentry_sheet_category'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'locked'], name='transaction_account_locked'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='transaction_date'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-date'], name='transaction_account_date'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.0.14 on 2026-10-16 20:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_snapshots(apps, schema_editor):
+    Transaction = apps.get_model('budgeteer', 'Transaction')
+    AccountBalanceSnapshot = apps.get_model('budgeteer', 'AccountBalanceSnapshot')
+
+    snapshots = []
+    totals = {}
+    for transaction in Transaction.objects.order_by('account', 'date').iterator():
+        unlocked_total, locked_total = totals.get(transaction.account_id, (Decimal(0), Decimal(0)))
+        if transaction.locked:
+            locked_total += transaction.value
+        else:
+            unlocked_total += transaction.value
+        totals[transaction.account_id] = (unlocked_total, locked_total)
+
+        if snapshots and (snapshots[-1].account_id, snapshots[-1].date) == (transaction.account_id,
+                                                                           transaction.date):
+            snapshots.pop()
+        snapshots.append(AccountBalanceSnapshot(account_id=transaction.account_id,
+                                                date=transaction.date,
+                                                unlocked_total=unlocked_total,
+                                                locked_total=locked_total))
+    AccountBalanceSnapshot.objects.bulk_create(snapshots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0003_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('unlocked_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('locked_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='budgeteer.Account')),
+            ],
+            options={
+                'unique_together': {('account', 'date')},
+            },
+        ),
+        migrations.RunPython(create_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.14 on 2026-10-16 20:23
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def create_activity(apps, schema_editor):
+    Transaction = apps.get_model('budgeteer', 'Transaction')
+    CategoryMonthActivity = apps.get_model('budgeteer', 'CategoryMonthActivity')
+
+    CategoryMonthActivity.objects.bulk_create(
+        CategoryMonthActivity(category_id=activity['category'],
+                              year=activity['year'],
+                              month=activity['month'],
+                              activity=activity['total'])
+        for activity in (Transaction.objects
+                         .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                         .values('category', 'year', 'month')
+                         .annotate(total=Sum('value'))
+                         .order_by())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0004_account_balance_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryMonthActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)])),
+                ('activity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='budgeteer.Category')),
+            ],
+            options={
+                'unique_together': {('category', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(create_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.14 on 2026-10-16 20:45
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0007_recurring_transaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetTarget',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('monthly', 'Monthly amount'), ('by_date', 'Total amount by date'), ('minimum_balance', 'Minimum balance')], default='monthly', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('date', models.DateField(blank=True, null=True)),
+                ('budgeted', models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=12)),
+                ('activity', models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=12)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='target', to='budgeteer.Category')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-16 20:47
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0008_budget_target'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('kind', models.CharField(choices=[('purchase', 'Purchase'), ('project', 'Project')], default='project', max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('path', models.CharField(db_index=True, editable=False, max_length=255)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=12)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='budgeteer.Category')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='budgeteer.Budget')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='budget',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='budgeteer.Budget'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-16 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0009_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budgettarget',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
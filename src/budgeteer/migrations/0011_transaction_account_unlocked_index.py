@@ -0,0 +1,21 @@
+# Generated by Django 3.0.14 on 2026-10-16 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgeteer', '0010_budget_target_update_marker'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_account_locked',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(locked=False), fields=['account'], name='transaction_account_unlocked'),
+        ),
+    ]
@@ -5,13 +5,22 @@ This includes everything that's absolutely needed for Budgeteer to function.
 """
 import calendar
 import datetime
-from decimal import Decimal
+import hashlib
+import heapq
+from collections import Counter
+from decimal import ROUND_CEILING, Decimal
+from itertools import groupby, islice
 
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.functions import (Cast, Coalesce, Concat, ExtractMonth, ExtractYear, LPad,
+                                        Substr)
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from budgeteer import caching, identity
 
 class Category(models.Model):
     """
@@ -25,6 +34,221 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def _sum_of_transactions(condition=None, field='value'):
+    """
+    Builds a conditional sum over transaction values that is zero instead of NULL.
+    """
+    return Coalesce(models.Sum(field, filter=condition), Decimal(0),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+def _first_day(year, month):
+    """
+    Builds a date expression for the first day of the month given by year and month expressions.
+    """
+    return Cast(Concat(Cast(year, models.CharField()), models.Value('-'),
+                       LPad(Cast(month, models.CharField()), 2, models.Value('0')),
+                       models.Value('-01'), output_field=models.CharField()),
+                models.DateField())
+
+class SheetQuerySet(models.QuerySet):
+    """
+    Query set for sheets with support for bulk annotation of aggregated values.
+    """
+
+    def with_totals(self):
+        """
+        Annotates inflow, outflow and net sum of the transactions of each sheet.
+
+        The values are calculated by the database with a single query for all sheets and are
+        picked up by the inflow, outflow and net properties of the sheets. The transactions are
+        matched by a date range, so the date index can be used.
+        """
+        return self.annotate(
+            totals_start=_first_day(models.F('year'), models.F('month')),
+            totals_end=models.Case(
+                models.When(month=12, then=_first_day(models.F('year') + 1, models.Value(1))),
+                default=_first_day(models.F('year'), models.F('month') + 1),
+            ),
+        ).annotate(**{
+            f"{name}_sum": models.Subquery(
+                Transaction.objects
+                .filter(date__gte=models.OuterRef('totals_start'),
+                        date__lt=models.OuterRef('totals_end'))
+                .order_by()
+                # Grouping by a constant makes the sum an aggregate over all matched rows without
+                # calculating a group key per transaction.
+                .annotate(group=models.Value(1, output_field=models.IntegerField()))
+                .values('group')
+                .annotate(total=_sum_of_transactions(condition))
+                .values('total'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ) for name, condition in Sheet.TOTALS.items()
+        })
+
+class SheetManager(models.Manager.from_queryset(SheetQuerySet)):
+    """
+    Manager for sheets including the calculation of available amounts over the sheet chain.
+    """
+
+    def create_with_entries(self, months):
+        """
+        Creates a sheet for every given pair of month and year including all sheet entries.
+
+        Sheets and entries are created with batched inserts in a single transaction, so the
+        number of queries does not depend on the number of sheets or categories. Returns the
+        created sheets in the given order.
+        """
+        months = list(months)
+        if not months:
+            return []
+
+        with transaction.atomic():
+            self.bulk_create(Sheet(month=month, year=year) for month, year in months)
+            sheets = {
+                (sheet.month, sheet.year): sheet for sheet in
+                self.filter(year__in={year for _, year in months})
+            }
+            categories = list(Category.objects.values_list('pk', flat=True))
+            SheetEntry.objects.bulk_create(
+                SheetEntry(sheet=sheets[period], category_id=category, value=Decimal(0))
+                for period in months for category in categories
+            )
+        earliest_month, earliest_year = min(months, key=lambda period: (period[1], period[0]))
+        self.invalidate_from(earliest_year, earliest_month)
+        return [sheets[period] for period in months]
+
+    def invalidate_from(self, year, month):
+        """
+        Invalidates the cached values of the sheet of the given month and all later sheets.
+
+        Later sheets are included because their available amount depends on the earlier sheets.
+        """
+        caching.invalidate('sheet', self.filter(models.Q(year__gt=year)
+                                                | models.Q(year=year, month__gte=month))
+                           .values_list('pk', flat=True))
+
+    def load_overview(self, year, month):
+        """
+        Loads the sheet of the given month with everything needed to show its budget overview.
+
+        The entries are prefetched with their category, budget target and activity into the
+        entries attribute and get the available amount of their category, which is the sum of
+        everything budgeted and spent in the category up to this month, from one grouped query per
+        table. The number of queries does not depend on the number of categories or transactions.
+
+        The underfunded amounts of the entries and their sum on the sheet are calculated in the
+        same pass. They start from the progress counters of the budget targets and only subtract
+        what was budgeted and spent after this month, which is little or nothing for the current
+        sheet.
+        """
+        sheet = (self.with_totals()
+                 .prefetch_related(models.Prefetch(
+                     'sheetentry_set',
+                     queryset=(SheetEntry.objects
+                               .with_activity()
+                               .select_related('category__target')
+                               .order_by('category__name', 'pk')),
+                     to_attr='entries'
+                 ))
+                 .get(year=year, month=month))
+
+        until_sheet = models.Q(year__lt=year) | models.Q(year=year, month__lte=month)
+        budgeted = dict(SheetEntry.objects
+                        .filter(sheet__in=self.filter(until_sheet))
+                        .values('category')
+                        .annotate(total=models.Sum('value'))
+                        .order_by()
+                        .values_list('category', 'total'))
+        activities = dict(CategoryMonthActivity.objects
+                          .filter(until_sheet)
+                          .values('category')
+                          .annotate(total=models.Sum('activity'))
+                          .order_by()
+                          .values_list('category', 'total'))
+        targets = {entry.category_id: entry.category.target for entry in sheet.entries
+                   if getattr(entry.category, 'target', None) is not None}
+        later = _totals_after(targets, year, month) if targets else {}
+
+        sheet.underfunded_total = Decimal(0)
+        for entry in sheet.entries:
+            entry.available_total = (budgeted.get(entry.category_id, Decimal(0))
+                                     + activities.get(entry.category_id, Decimal(0)))
+            target = targets.get(entry.category_id)
+            entry.underfunded_total = Decimal(0)
+            if target is not None:
+                entry.underfunded_total = target.underfunded(
+                    year, month, entry.value,
+                    target.progress - later.get(entry.category_id, Decimal(0))
+                )
+            sheet.underfunded_total += entry.underfunded_total
+        return sheet
+
+    def available_chain(self, sheet):
+        """
+        Calculates the available amount for the given sheet and all its predecessors.
+
+        The chain is followed back until a sheet with a carryover or a missing month is found.
+        Instead of recursing through the previous sheets this uses a single grouped query per
+        table and a running sum from the oldest to the newest sheet.
+
+        Returns a dictionary mapping the primary keys of all sheets in the chain to their available
+        amount.
+        """
+        chain = [(sheet.pk, sheet.year, sheet.month, sheet.carryover)]
+        if sheet.carryover is None:
+            predecessors = (self.get_queryset()
+                            .filter(models.Q(year__lt=sheet.year)
+                                    | models.Q(year=sheet.year, month__lt=sheet.month))
+                            .order_by('-year', '-month')
+                            .values_list('pk', 'year', 'month', 'carryover'))
+            for predecessor in predecessors.iterator():
+                _, year, month, _ = chain[-1]
+                expected = (year, month - 1) if month > 1 else (year - 1, 12)
+                if predecessor[1:3] != expected:
+                    break
+                chain.append(predecessor)
+                if predecessor[3] is not None:
+                    break
+        chain.reverse()
+
+        open_sheets = [link for link in chain if link[3] is None]
+        inflows = {}
+        budgets = {}
+        if open_sheets:
+            _, first_year, first_month, _ = open_sheets[0]
+            _, last_year, last_month, _ = open_sheets[-1]
+            inflows = {
+                (row['year'], row['month']): row['inflow'] for row in
+                Transaction.objects
+                .filter(date__gte=datetime.date(first_year, first_month, 1))
+                .filter(date__lte=datetime.date(last_year, last_month,
+                                                calendar.monthrange(last_year, last_month)[1]))
+                .filter(value__gt=0)
+                .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                .values('year', 'month')
+                .annotate(inflow=models.Sum('value'))
+                .order_by()
+            }
+            budgets = {
+                row['sheet']: row['budget'] for row in
+                SheetEntry.objects
+                .filter(sheet__in=[pk for pk, _, _, _ in open_sheets])
+                .values('sheet')
+                .annotate(budget=models.Sum('value'))
+                .order_by()
+            }
+
+        available = {}
+        running = Decimal(0)
+        for pk, year, month, carryover in chain:
+            if carryover is not None:
+                running = _quantize(carryover)
+            else:
+                running += (_quantize(inflows.get((year, month), 0))
+                            - _quantize(budgets.get(pk, 0)))
+            available[pk] = running
+        return available
+
 class Sheet(models.Model):
     """
     A round of budgeting where categories get assigned monetary values.
@@ -40,6 +264,15 @@ class Sheet(models.Model):
     )
     year = models.PositiveSmallIntegerField()
     carryover = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = SheetManager()
+
+    TOTALS = {
+        'inflow': models.Q(value__gt=0),
+        'outflow': models.Q(value__lt=0),
+        'net': None,
+    }
 
     @property
     def transactions(self):
@@ -51,6 +284,27 @@ class Sheet(models.Model):
                                  calendar.monthrange(self.year, self.month)[1])
         return Transaction.objects.filter(date__gte=date_start).filter(date__lte=date_end)
 
+    @property
+    def inflow(self):
+        """
+        Returns the sum of all incoming transactions on this sheet.
+        """
+        return self.__get_totals()['inflow']
+
+    @property
+    def outflow(self):
+        """
+        Returns the sum of all outgoing transactions on this sheet as a negative value.
+        """
+        return self.__get_totals()['outflow']
+
+    @property
+    def net(self):
+        """
+        Returns the sum of all transactions on this sheet.
+        """
+        return self.__get_totals()['net']
+
     @property
     def available(self):
         """
@@ -62,38 +316,39 @@ class Sheet(models.Model):
         if self.carryover is not None:
             return self.carryover
 
-        if self.previous is not None:
-            return (self.__get_sum_of_inflows()
-                    - self.__get_sum_of_budgets()
-                    + self.previous.available)
-
-        return self.__get_sum_of_inflows() - self.__get_sum_of_budgets()
+        return caching.cached('sheet', self.pk, 'available',
+                              lambda: Sheet.objects.available_chain(self)[self.pk])
 
     @property
     def previous(self):
         """
         Gets the previous sheet or None of none exists.
 
-        This expects sheets to be continuous without gaps.
+        This expects sheets to be continuous without gaps. Within an active identity map the
+        previous sheet is only queried once.
         """
         month = self.month - 1 if self.month > 1 else 12
         year = self.year if self.month > 1 else self.year - 1
-        try:
-            return Sheet.objects.get(month=month, year=year)
-        except Sheet.DoesNotExist:
-            return None
+        return identity.lookup(Sheet, month=month, year=year)
 
     def __str__(self):
         return f"{self.month:02d}/{self.year}"
 
     class Meta:
         unique_together = ['month', 'year']
+        indexes = [
+            models.Index(fields=['year', 'month'], name='sheet_year_month'),
+        ]
 
-    def __get_sum_of_inflows(self):
-        return sum(trans.value for trans in filter(lambda t: t.value > 0, self.transactions))
+    def __get_totals(self):
+        if all(hasattr(self, f"{name}_sum") for name in Sheet.TOTALS):
+            return {name: _quantize(getattr(self, f"{name}_sum") or 0) for name in Sheet.TOTALS}
 
-    def __get_sum_of_budgets(self):
-        return self.sheetentry_set.all().aggregate(models.Sum('value'))['value__sum']
+        return caching.cached('sheet', self.pk, 'totals', lambda: {
+            name: _quantize(total) for name, total in self.transactions.aggregate(**{
+                name: _sum_of_transactions(condition) for name, condition in Sheet.TOTALS.items()
+            }).items()
+        })
 
 @receiver(post_save, sender=Sheet)
 def initialize_sheet_with_entries(instance, created, raw, **kwargs):
@@ -101,10 +356,122 @@ def initialize_sheet_with_entries(instance, created, raw, **kwargs):
     Creates a sheet entry for every category the moment the sheet is created.
     """
     if created and not raw:
-        for category in Category.objects.all():
-            SheetEntry(sheet=instance, category=category, value=Decimal(0)).save()
+        with transaction.atomic():
+            SheetEntry.objects.bulk_create(
+                SheetEntry(sheet=instance, category_id=category, value=Decimal(0))
+                for category in Category.objects.values_list('pk', flat=True)
+            )
+
+class LockableQuerySet(models.QuerySet):
+    """
+    Query set for models that can be locked against changes of their LOCKABLE_FIELDS.
+    """
+
+    def validate_locked_unchanged(self, instances):
+        """
+        Checks that none of the given locked instances has changes to its lockable fields.
+
+        The stored state of all instances is loaded with a single query. Raises a ValidationError
+        listing every changed field.
+        """
+        locked = {instance.pk: instance for instance in instances
+                  if instance.pk is not None and instance.locked}
+        if not locked:
+            return
+
+        attnames = self.model.lockable_attnames()
+        errors = []
+        for stored in self.filter(pk__in=locked.keys()).values('pk', *attnames):
+            errors += locked[stored['pk']].changed_lockable_fields(stored)
+        if errors:
+            raise ValidationError(errors)
+
+class LockableMixin:
+    """
+    Model mixin that prevents changes to the LOCKABLE_FIELDS of locked instances.
+
+    Instances remember the state of their lockable fields when loaded from or saved to the
+    database, so validating a locked instance needs no additional query.
+    """
+    LOCKABLE_FIELDS = []
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_lockable_state()
+        return instance
+
+    @classmethod
+    def lockable_attnames(cls):
+        """
+        Returns the column attribute names of the lockable fields.
+        """
+        return [cls._meta.get_field(field).attname for field in cls.LOCKABLE_FIELDS]
+
+    def remember_lockable_state(self):
+        """
+        Stores the current values of the lockable fields as the state known to be in the database.
+        """
+        deferred = self.get_deferred_fields()
+        self._lockable_state = {attname: getattr(self, attname)
+                                for attname in self.lockable_attnames()
+                                if attname not in deferred}
+
+    def changed_lockable_fields(self, stored_state):
+        """
+        Returns a validation error for every lockable field that differs from the stored state.
+        """
+        return [
+            ValidationError(f"Field {field} was changed on locked {self._meta.verbose_name}.")
+            for field, attname in zip(self.LOCKABLE_FIELDS, self.lockable_attnames())
+            if stored_state[attname] != getattr(self, attname)
+        ]
+
+    def clean(self):
+        super().clean()
+
+        if self.pk is not None and self.locked:
+            stored_state = getattr(self, '_lockable_state', {})
+            if any(attname not in stored_state for attname in self.lockable_attnames()):
+                stored_state = (type(self)._default_manager
+                                .filter(pk=self.pk)
+                                .values(*self.lockable_attnames())
+                                .get())
+            errors = self.changed_lockable_fields(stored_state)
+            if errors:
+                raise errors[0]
 
-class SheetEntry(models.Model):
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_lockable_state()
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self.remember_lockable_state()
+
+class SheetEntryQuerySet(LockableQuerySet):
+    """
+    Query set for sheet entries with support for bulk annotation of the category activity.
+    """
+
+    def with_activity(self):
+        """
+        Annotates the activity of the category in the month of the sheet of each entry.
+
+        The activity is read from the monthly category activity in the same query and is picked up
+        by the activity and remaining properties of the entries.
+        """
+        return self.annotate(activity_total=Coalesce(
+            models.Subquery(CategoryMonthActivity.objects
+                            .filter(category=models.OuterRef('category'),
+                                    year=models.OuterRef('sheet__year'),
+                                    month=models.OuterRef('sheet__month'))
+                            .values('activity')[:1]),
+            Decimal(0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ))
+
+class SheetEntry(LockableMixin, models.Model):
     """
     The budget of a single category for a single sheet.
 
@@ -118,19 +485,74 @@ class SheetEntry(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     value = models.DecimalField(max_digits=12, decimal_places=2)
     locked = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = SheetEntryQuerySet.as_manager()
 
     LOCKABLE_FIELDS = ['sheet', 'category', 'value']
 
-    def clean(self):
-        super(SheetEntry, self).clean()
+    class Meta:
+        indexes = [
+            models.Index(fields=['sheet', 'category'], name='sheetentry_sheet_category'),
+        ]
 
-        if self.pk is not None and self.locked:
-            previous_state = SheetEntry.objects.get(pk=self.pk)
-            for field in SheetEntry.LOCKABLE_FIELDS:
-                previous_value = getattr(previous_state, field)
-                current_value = getattr(self, field)
-                if previous_value != current_value:
-                    raise ValidationError(f"Field {field} was changed on locked sheet entry.")
+    @property
+    def activity(self):
+        """
+        Returns the sum of all transactions of the category in the month of the sheet.
+        """
+        if hasattr(self, 'activity_total'):
+            return self.activity_total
+
+        activity = (CategoryMonthActivity.objects
+                    .filter(category_id=self.category_id,
+                            year=self.sheet.year,
+                            month=self.sheet.month)
+                    .values_list('activity', flat=True)
+                    .first())
+        return activity if activity is not None else Decimal(0)
+
+    @property
+    def remaining(self):
+        """
+        Returns the budgeted value plus the activity of the category in the month of the sheet.
+        """
+        return self.value + self.activity
+
+    @property
+    def available(self):
+        """
+        Returns everything budgeted in the category up to this sheet plus its activity until then.
+        """
+        if hasattr(self, 'available_total'):
+            return self.available_total
+
+        until_sheet = (models.Q(year__lt=self.sheet.year)
+                       | models.Q(year=self.sheet.year, month__lte=self.sheet.month))
+        budgeted = (SheetEntry.objects
+                    .filter(category_id=self.category_id,
+                            sheet__in=Sheet.objects.filter(until_sheet))
+                    .aggregate(total=models.Sum('value'))['total'])
+        activity = (CategoryMonthActivity.objects
+                    .filter(until_sheet, category_id=self.category_id)
+                    .aggregate(total=models.Sum('activity'))['total'])
+        return (budgeted or Decimal(0)) + (activity or Decimal(0))
+
+    @property
+    def underfunded(self):
+        """
+        Returns how much more has to be budgeted in this entry to meet the target of its category.
+
+        Categories without budget target are never underfunded.
+        """
+        if hasattr(self, 'underfunded_total'):
+            return self.underfunded_total
+
+        target = getattr(self.category, 'target', None)
+        if target is None:
+            return Decimal(0)
+        return target.underfunded(self.sheet.year, self.sheet.month, self.value,
+                                  target.available_at(self.sheet.year, self.sheet.month))
 
     def __str__(self):
         return f"[{str(self.sheet)}] {str(self.category)}: {str(self.value)}"
@@ -141,9 +563,54 @@ def create_sheet_entries_on_category_creation(instance, created, raw, **kwargs):
     Creates a sheet entry for every open sheet the moment a new category is created.
     """
     if created and not raw:
-        for sheet in Sheet.objects.filter(carryover__isnull=True):
-            new_sheet = SheetEntry(sheet=sheet, category=instance, value=Decimal(0))
-            new_sheet.save()
+        with transaction.atomic():
+            SheetEntry.objects.bulk_create(
+                SheetEntry(sheet_id=sheet, category=instance, value=Decimal(0))
+                for sheet in Sheet.objects.filter(carryover__isnull=True)
+                .values_list('pk', flat=True)
+            )
+
+class AccountQuerySet(models.QuerySet):
+    """
+    Query set for accounts with support for bulk annotation of aggregated values.
+    """
+
+    def with_totals(self):
+        """
+        Annotates the sum of all non-locked transactions of each account.
+
+        The sum is read from the latest balance snapshot of each account with a single query for
+        all accounts and is picked up by the total property of the accounts.
+        """
+        latest = (AccountBalanceSnapshot.objects
+                  .filter(account=models.OuterRef('pk'))
+                  .order_by('-date')
+                  .values('unlocked_total')[:1])
+        return self.annotate(transaction_total=Coalesce(
+            models.Subquery(latest), Decimal(0),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ))
+
+    def add_to_balances(self, changes):
+        """
+        Adds the given changes to the balance of the accounts.
+
+        The changes map account primary keys to the value to add, which is the value of locked
+        transactions moved into the balance or, negated, of unlocked ones moved out of it. All
+        accounts are updated with a single query and their cached values are invalidated.
+        """
+        changes = {account_id: change for account_id, change in changes.items() if change}
+        if not changes:
+            return 0
+        change = models.Case(
+            *[models.When(pk=account_id, then=models.Value(value))
+              for account_id, value in changes.items()],
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+        updated = (self.filter(pk__in=changes)
+                   .update(balance=models.F('balance') + change, updated=timezone.now()))
+        caching.invalidate('account', changes)
+        return updated
 
 class Account(models.Model):
     """
@@ -151,6 +618,9 @@ class Account(models.Model):
     """
     name = models.CharField(max_length=200)
     balance = models.DecimalField(max_digits=12, decimal_places=2)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = AccountQuerySet.as_manager()
 
     @property
     def total(self):
@@ -161,18 +631,35 @@ class Account(models.Model):
         """
         return self.balance + self.__get_transaction_total()
 
+    def balance_at(self, date):
+        """
+        Returns the account balance at the end of the given day.
+        """
+        return AccountBalanceSnapshot.objects.balance_at(self, date)
+
+    def forecast(self, date):
+        """
+        Returns the expected account balance at the end of the given day.
+
+        In addition to the balance this includes all occurrences of recurring transactions until
+        that day which are not materialized yet.
+        """
+        projected = RecurringTransaction.objects.filter(account=self).project(end=date)
+        return self.balance_at(date) + sum((booking.value for booking in projected),
+                                           Decimal(0))
+
     def __str__(self):
         return self.name
 
     def __get_transaction_total(self):
-        aggregated = (Transaction.objects
-                      .filter(account=self)
-                      .filter(locked=False)
-                      .aggregate(models.Sum('value'))
-                      ['value__sum'])
-        return aggregated if aggregated is not None else 0
+        if hasattr(self, 'transaction_total'):
+            return _quantize(self.transaction_total)
+
+        return caching.cached('account', self.pk, 'transaction_total',
+                              lambda: AccountBalanceSnapshot.objects
+                              .latest_totals(self.pk)['unlocked_total'])
 
-class Transaction(models.Model):
+class Transaction(LockableMixin, models.Model):
     """
     The flow of money from an account to a partner with a category as classification.
     """
@@ -182,22 +669,1145 @@ class Transaction(models.Model):
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     account = models.ForeignKey(Account, on_delete=models.PROTECT)
     locked = models.BooleanField(default=False)
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+    recurring = models.ForeignKey('RecurringTransaction', on_delete=models.SET_NULL,
+                                  blank=True, null=True, editable=False)
+    occurrence = models.DateField(blank=True, null=True, editable=False)
+    budget = models.ForeignKey('Budget', on_delete=models.SET_NULL, blank=True, null=True)
+
+    objects = LockableQuerySet.as_manager()
 
     LOCKABLE_FIELDS = ['partner', 'date', 'value', 'category', 'account']
 
-    def clean(self):
-        super(Transaction, self).clean()
+    class Meta:
+        indexes = [
+            models.Index(fields=['account'], condition=models.Q(locked=False),
+                         name='transaction_account_unlocked'),
+            models.Index(fields=['date'], name='transaction_date'),
+            models.Index(fields=['account', '-date'], name='transaction_account_date'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring', 'occurrence'],
+                                    name='transaction_recurring_occurrence'),
+        ]
 
-        if self.pk is not None and self.locked:
-            previous_state = Transaction.objects.get(pk=self.pk)
-            for field in Transaction.LOCKABLE_FIELDS:
-                previous_value = getattr(previous_state, field)
-                current_value = getattr(self, field)
-                if previous_value != current_value:
-                    raise ValidationError(f"Field {field} was changed on locked transaction.")
+    def save(self, *args, **kwargs):
+        #pylint: disable=signature-differs
+        self.update_fingerprint()
+        super(Transaction, self).save(*args, **kwargs)
+
+    def update_fingerprint(self):
+        """
+        Sets the fingerprint from the content of this transaction without saving it.
+
+        Date and value are converted to their Python types first, so they may also be given as
+        strings.
+        """
+        self.date = self._meta.get_field('date').to_python(self.date)
+        self.value = self._meta.get_field('value').to_python(self.value)
+        self.fingerprint = Transaction.calculate_fingerprint(self.account_id, self.date,
+                                                             self.value, self.partner)
+
+    @staticmethod
+    def calculate_fingerprint(account_id, date, value, partner):
+        """
+        Returns a hash of the content of a transaction for recognizing duplicates.
+
+        The partner is compared case insensitive and with normalized whitespace.
+        """
+        normalized_partner = " ".join(str(partner).casefold().split())
+        content = f"{account_id}|{date:%Y-%m-%d}|{Decimal(value):.2f}|{normalized_partner}"
+        return hashlib.sha256(content.encode()).hexdigest()
 
     def __str__(self):
         return (
             f"[{self.date:%Y-%m-%d}] {str(self.account)} "
             f"-> {str(self.partner)} ({str(self.category)})"
         )
+
+class RecurringTransactionQuerySet(models.QuerySet):
+    """
+    Query set for recurring transactions with support for projecting their occurrences.
+    """
+
+    def project(self, start=None, end=None):
+        """
+        Yields unsaved transactions for all occurrences between the given dates, ordered by date.
+
+        Occurrences that are already materialized are skipped. The occurrences are calculated
+        lazily, so without an end date the generator may never end. Nothing is saved.
+        """
+        for date, schedule in self.pending(start, end):
+            yield schedule.transaction(date)
+
+    def pending(self, start=None, end=None):
+        """
+        Yields the date and recurring transaction of all occurrences between the given dates that
+        are not materialized yet, ordered by date.
+
+        Unlike project no transaction instances are created for the occurrences.
+        """
+        schedules = list(self)
+        materialized = Transaction.objects.filter(recurring__in=schedules)
+        if start is not None:
+            materialized = materialized.filter(occurrence__gte=start)
+        if end is not None:
+            materialized = materialized.filter(occurrence__lte=end)
+        existing = set(materialized.values_list('recurring', 'occurrence'))
+
+        streams = [_pending_occurrences(schedule, start, end, existing) for schedule in schedules]
+        for date, _, schedule in heapq.merge(*streams):
+            yield date, schedule
+
+def _pending_occurrences(schedule, start, end, existing):
+    for date in schedule.occurrences(start, end):
+        if (schedule.pk, date) not in existing:
+            yield date, schedule.pk, schedule
+
+class RecurringTransaction(models.Model):
+    """
+    A transaction that repeats on a schedule, eg. rent or a salary.
+
+    The schedule works like a simplified iCalendar recurrence rule: starting at the start date
+    an occurrence happens every interval days, weeks, months or years until the optional until date
+    or the optional number of occurrences is reached. Monthly and yearly occurrences on days that
+    don't exist in a month fall on the last day of that month.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+    FREQUENCIES = [
+        (DAILY, "Daily"),
+        (WEEKLY, "Weekly"),
+        (MONTHLY, "Monthly"),
+        (YEARLY, "Yearly"),
+    ]
+
+    partner = models.CharField(max_length=200)
+    value = models.DecimalField(max_digits=12, decimal_places=2)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    account = models.ForeignKey(Account, on_delete=models.PROTECT)
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES, default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+    start = models.DateField()
+    until = models.DateField(blank=True, null=True)
+    count = models.PositiveIntegerField(blank=True, null=True,
+                                        validators=[MinValueValidator(1)])
+
+    objects = RecurringTransactionQuerySet.as_manager()
+
+    def occurrences(self, start=None, end=None):
+        """
+        Yields the dates of all occurrences between the given start and end date lazily.
+
+        Without an end date and without until date or count the generator never ends. Occurrences
+        before the start date are skipped without being calculated.
+        """
+        index = self.__first_index(start)
+        while True:
+            if self.count is not None and index >= self.count:
+                return
+            date = self.occurrence(index)
+            if (self.until is not None and date > self.until) or (end is not None and date > end):
+                return
+            if start is None or date >= start:
+                yield date
+            index += 1
+
+    def occurrence(self, index):
+        """
+        Returns the date of the occurrence with the given zero-based index.
+        """
+        steps = index * self.interval
+        if self.frequency == RecurringTransaction.DAILY:
+            return self.start + datetime.timedelta(days=steps)
+        if self.frequency == RecurringTransaction.WEEKLY:
+            return self.start + datetime.timedelta(weeks=steps)
+        if self.frequency == RecurringTransaction.YEARLY:
+            steps *= 12
+        year, month = divmod(self.start.year * 12 + self.start.month - 1 + steps, 12)
+        month += 1
+        return datetime.date(year, month,
+                             min(self.start.day, calendar.monthrange(year, month)[1]))
+
+    def transaction(self, date):
+        """
+        Returns an unsaved transaction for the occurrence on the given date.
+        """
+        return Transaction(partner=self.partner, date=date, value=self.value,
+                           category_id=self.category_id, account_id=self.account_id,
+                           recurring=self, occurrence=date)
+
+    def __str__(self):
+        return (
+            f"[{self.get_frequency_display()} from {self.start:%Y-%m-%d}] {str(self.account)} "
+            f"-> {str(self.partner)} ({str(self.category)})"
+        )
+
+    def __first_index(self, start):
+        """
+        Returns the index of the first occurrence that may be on or after the given date.
+        """
+        if start is None or start <= self.start:
+            return 0
+        if self.frequency == RecurringTransaction.DAILY:
+            elapsed = (start - self.start).days
+        elif self.frequency == RecurringTransaction.WEEKLY:
+            elapsed = (start - self.start).days // 7
+        else:
+            elapsed = (start.year - self.start.year) * 12 + start.month - self.start.month - 1
+            if self.frequency == RecurringTransaction.YEARLY:
+                elapsed //= 12
+        return max(0, elapsed // self.interval)
+
+# Every day of a conditional update of the running totals needs up to six query parameters.
+_SNAPSHOT_CHUNK_SIZE = 100
+
+class AccountBalanceSnapshotManager(models.Manager):
+    """
+    Manager for maintaining and reading the running totals of accounts.
+    """
+
+    def latest_totals(self, account_id):
+        """
+        Returns the running totals of the last day with transactions of the given account.
+        """
+        return self.__totals_before(account_id)
+
+    def balance_at(self, account, date):
+        """
+        Returns the balance of the given account at the end of the given day.
+
+        The balance of an account includes the values of all locked transactions, so the running
+        totals are offset by the locked total of the latest day.
+        """
+        latest = self.latest_totals(account.pk)
+        at_date = self.__totals_before(account.pk, date)
+        return (account.balance - latest['locked_total']
+                + at_date['unlocked_total'] + at_date['locked_total'])
+
+    def running_balances(self, account, transactions):
+        """
+        Returns the account balance after each of the given transactions.
+
+        The transactions have to be ordered by date descending and primary key descending, as
+        shown on the account overview, so transactions of the same day are booked in order of
+        their primary key. Needs three queries no matter how many transactions are given, plus one
+        for every day without a snapshot.
+        """
+        if not transactions:
+            return []
+
+        latest = self.latest_totals(account.pk)
+        end_of_day = {
+            snapshot['date']: (account.balance - latest['locked_total']
+                               + snapshot['unlocked_total'] + snapshot['locked_total'])
+            for snapshot in self.filter(account=account,
+                                        date__in={t.date for t in transactions})
+            .values('date', 'unlocked_total', 'locked_total')
+        }
+        first = transactions[0]
+        later_on_day = (Transaction.objects
+                        .filter(account=account, date=first.date, pk__gt=first.pk)
+                        .aggregate(total=_sum_of_transactions())['total'])
+
+        balances = []
+        previous_date = first.date
+        for booking in transactions:
+            if booking.date != previous_date:
+                later_on_day = Decimal(0)
+            if booking.date not in end_of_day:
+                at_date = self.__totals_before(account.pk, booking.date)
+                end_of_day[booking.date] = (account.balance - latest['locked_total']
+                                            + at_date['unlocked_total']
+                                            + at_date['locked_total'])
+            balances.append(end_of_day[booking.date] - later_on_day)
+            later_on_day += booking.value
+            previous_date = booking.date
+        return balances
+
+    def apply(self, account_id, date, unlocked_change=0, locked_change=0):
+        """
+        Adds the given changes to the running totals of the account from the given day on.
+        """
+        if not unlocked_change and not locked_change:
+            return
+        if not self.filter(account_id=account_id, date=date).exists():
+            previous = self.__totals_before(account_id, date)
+            self.create(account_id=account_id, date=date, **previous)
+        (self.filter(account_id=account_id, date__gte=date)
+         .update(unlocked_total=models.F('unlocked_total') + unlocked_change,
+                 locked_total=models.F('locked_total') + locked_change))
+
+    def apply_transactions(self, transactions):
+        """
+        Adds the values of the given new transactions to the running totals of their accounts.
+
+        Missing snapshots for the days of the transactions are created with up to two queries and
+        a single batched insert per account. The running totals are updated with one conditional
+        update per hundred days, so the number of queries does not depend on the number of
+        transactions.
+        """
+        changes = {False: Counter(), True: Counter()}
+        for new_transaction in transactions:
+            day = (new_transaction.account_id, new_transaction.date)
+            changes[bool(new_transaction.locked)][day] += _quantize(new_transaction.value)
+        days = sorted(set(changes[False]) | set(changes[True]))
+        if not days:
+            return
+
+        with transaction.atomic(savepoint=False):
+            for account_id, account_days in groupby(days, key=lambda day: day[0]):
+                self.__create_missing(account_id, [date for _, date in account_days])
+            for start in range(0, len(days), _SNAPSHOT_CHUNK_SIZE):
+                chunk = days[start:start + _SNAPSHOT_CHUNK_SIZE]
+                updates = {}
+                for locked, field in ((False, 'unlocked_total'), (True, 'locked_total')):
+                    if not any(changes[locked][day] for day in chunk):
+                        continue
+                    running = Counter()
+                    cases = []
+                    for account_id, date in chunk:
+                        running[account_id] += changes[locked][(account_id, date)]
+                        cases.append(models.When(account_id=account_id, date__gte=date,
+                                                 then=models.Value(running[account_id])))
+                    cases.reverse()
+                    updates[field] = models.F(field) + models.Case(
+                        *cases, default=models.Value(Decimal(0)),
+                        output_field=models.DecimalField(max_digits=12, decimal_places=2)
+                    )
+                if updates:
+                    (self.filter(account_id__in={account_id for account_id, _ in chunk},
+                                 date__gte=min(date for _, date in chunk))
+                     .update(**updates))
+
+    def move(self, transactions, locked):
+        """
+        Moves the values of the given transactions between the unlocked and locked running totals.
+
+        Must be called before the transactions are locked or unlocked. All running totals are
+        updated with a single query.
+        """
+        moved = Coalesce(models.Subquery(
+            transactions
+            .filter(account=models.OuterRef('account'), date__lte=models.OuterRef('date'))
+            .order_by()
+            .values('account')
+            .annotate(total=models.Sum('value'))
+            .values('total'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ), Decimal(0))
+        if not locked:
+            moved = -moved
+        (self.filter(account__in=transactions.values('account'))
+         .update(unlocked_total=models.F('unlocked_total') - moved,
+                 locked_total=models.F('locked_total') + moved))
+
+    def rebuild(self, accounts=None):
+        """
+        Recalculates all running totals of the given accounts or of all accounts.
+
+        The cached values of the rebuilt accounts are invalidated. Returns the number of created
+        snapshots.
+        """
+        snapshots = self.all()
+        transactions = Transaction.objects.all()
+        if accounts is not None:
+            snapshots = snapshots.filter(account__in=accounts)
+            transactions = transactions.filter(account__in=accounts)
+        else:
+            accounts = Account.objects.values_list('pk', flat=True)
+
+        with transaction.atomic():
+            snapshots.delete()
+            created = len(self.bulk_create(
+                AccountBalanceSnapshot(account_id=account_id, date=date, **totals)
+                for (account_id, date), totals in _running_totals(transactions).items()
+            ))
+            caching.invalidate('account', list(accounts))
+        return created
+
+    def verify(self):
+        """
+        Compares the stored running totals with a full recalculation.
+
+        Returns the account and date of every stored or expected snapshot that does not match.
+        """
+        expected = _running_totals(Transaction.objects.all())
+        stored = {
+            (snapshot['account'], snapshot['date']): {
+                'unlocked_total': _quantize(snapshot['unlocked_total']),
+                'locked_total': _quantize(snapshot['locked_total']),
+            } for snapshot in
+            self.values('account', 'date', 'unlocked_total', 'locked_total')
+            .order_by('account', 'date')
+        }
+
+        mismatches = [key for key, totals in expected.items() if stored.get(key) != totals]
+        last_totals = {}
+        for (account_id, date), totals in stored.items():
+            if (account_id, date) in expected:
+                last_totals[account_id] = expected[(account_id, date)]
+            elif totals != last_totals.get(account_id, _NO_TOTALS):
+                mismatches.append((account_id, date))
+        return mismatches
+
+    def __create_missing(self, account_id, dates):
+        first, last = min(dates), max(dates)
+        existing = {snapshot['date']: snapshot for snapshot in
+                    self.filter(account_id=account_id, date__gte=first, date__lte=last)
+                    .values('date', 'unlocked_total', 'locked_total')}
+        totals = None
+        if first not in existing:
+            totals = self.__totals_before(account_id, first - datetime.timedelta(days=1))
+        missing = []
+        for date in sorted(set(dates) | existing.keys()):
+            if date in existing:
+                totals = existing[date]
+            else:
+                missing.append(AccountBalanceSnapshot(account_id=account_id, date=date,
+                                                      unlocked_total=totals['unlocked_total'],
+                                                      locked_total=totals['locked_total']))
+        self.bulk_create(missing)
+
+    def __totals_before(self, account_id, date=None):
+        snapshots = self.filter(account_id=account_id)
+        if date is not None:
+            snapshots = snapshots.filter(date__lte=date)
+        latest = snapshots.order_by('-date').values('unlocked_total', 'locked_total').first()
+        return latest if latest is not None else dict(_NO_TOTALS)
+
+_NO_TOTALS = {'unlocked_total': Decimal(0), 'locked_total': Decimal(0)}
+
+def _running_totals(transactions):
+    """
+    Calculates the running totals per account and day of the given transactions.
+    """
+    days = (transactions
+            .values('account', 'date')
+            .annotate(unlocked=_sum_of_transactions(models.Q(locked=False)),
+                      locked=_sum_of_transactions(models.Q(locked=True)))
+            .order_by('account', 'date'))
+
+    totals = {}
+    current_account = None
+    for day in days.iterator():
+        if day['account'] != current_account:
+            current_account = day['account']
+            unlocked_total = locked_total = Decimal(0)
+        unlocked_total += _quantize(day['unlocked'])
+        locked_total += _quantize(day['locked'])
+        totals[(day['account'], day['date'])] = {'unlocked_total': unlocked_total,
+                                                 'locked_total': locked_total}
+    return totals
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    The running totals of the transactions of an account up to and including a single day.
+
+    There is a snapshot for every account and day with transactions. Snapshots are maintained
+    automatically when transactions are saved or deleted and should not be edited by the user.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    date = models.DateField()
+    unlocked_total = models.DecimalField(max_digits=12, decimal_places=2)
+    locked_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    objects = AccountBalanceSnapshotManager()
+
+    class Meta:
+        unique_together = ['account', 'date']
+
+    def __str__(self):
+        return f"[{self.date:%Y-%m-%d}] {str(self.account)}"
+
+@receiver(pre_save, sender=Transaction)
+def remember_transaction_before_save(instance, raw, **kwargs):
+    """
+    Remembers the stored state of a transaction for updating the aggregates after saving.
+
+    The state is always read from the database. The state remembered by the instance may be
+    outdated, e.g. after the transaction was locked or unlocked by a set-based update.
+    """
+    instance.stored_state = None
+    if not raw and instance.pk is not None and not instance._state.adding:
+        instance.stored_state = (Transaction.objects
+                                 .filter(pk=instance.pk)
+                                 .values('account', 'category', 'date', 'value', 'locked',
+                                         'budget')
+                                 .first())
+
+@receiver(post_save, sender=Transaction)
+def update_balance_snapshots_on_save(instance, raw, **kwargs):
+    """
+    Updates the running totals of the account with the changes of a saved transaction.
+    """
+    if raw:
+        return
+    changes = Counter()
+    stored = getattr(instance, 'stored_state', None)
+    if stored is not None:
+        changes[(stored['account'], stored['date'], stored['locked'])] -= stored['value']
+    changes[(instance.account_id, instance.date, instance.locked)] += _quantize(instance.value)
+
+    with transaction.atomic():
+        for (account_id, date, locked), value in changes.items():
+            _apply_transaction(account_id, date, value, locked)
+
+@receiver(post_save, sender=Transaction)
+def update_account_balance_on_save(instance, raw, **kwargs):
+    """
+    Moves the value of a locked or unlocked transaction into or out of the account balance.
+
+    Only stored transactions are moved. The balance already covers transactions that are created
+    locked.
+    """
+    stored = getattr(instance, 'stored_state', None)
+    if raw or stored is None:
+        return
+    changes = Counter()
+    if stored['locked']:
+        changes[stored['account']] -= stored['value']
+    if instance.locked:
+        changes[instance.account_id] += _quantize(instance.value)
+    Account.objects.add_to_balances(changes)
+
+@receiver(post_delete, sender=Transaction)
+def update_balance_snapshots_on_delete(instance, **kwargs):
+    """
+    Removes the value of a deleted transaction from the running totals of the account.
+    """
+    _apply_transaction(instance.account_id, instance.date, -_quantize(instance.value),
+                       instance.locked)
+
+@receiver(post_save, sender=Transaction)
+def update_category_activity_on_save(instance, raw, **kwargs):
+    """
+    Updates the monthly category activity with the changes of a saved transaction.
+    """
+    if raw:
+        return
+    changes = Counter()
+    stored = getattr(instance, 'stored_state', None)
+    if stored is not None:
+        changes[(stored['category'], stored['date'].year, stored['date'].month)] -= \
+            stored['value']
+    changes[(instance.category_id, instance.date.year, instance.date.month)] += \
+        _quantize(instance.value)
+
+    CategoryMonthActivity.objects.apply(changes)
+
+@receiver(post_delete, sender=Transaction)
+def update_category_activity_on_delete(instance, **kwargs):
+    """
+    Removes the value of a deleted transaction from the monthly category activity.
+    """
+    CategoryMonthActivity.objects.apply({
+        (instance.category_id, instance.date.year, instance.date.month):
+            -_quantize(instance.value)
+    })
+
+def _quantize(value):
+    return Decimal(value).quantize(Decimal('.01'))
+
+def _apply_transaction(account_id, date, value, locked):
+    if locked:
+        AccountBalanceSnapshot.objects.apply(account_id, date, locked_change=value)
+    else:
+        AccountBalanceSnapshot.objects.apply(account_id, date, unlocked_change=value)
+
+_UPDATE_CHUNK_SIZE = 300
+
+class CategoryMonthActivityManager(models.Manager):
+    """
+    Manager for maintaining the monthly activity of categories.
+    """
+
+    def apply(self, changes):
+        """
+        Adds the given changes to the activity.
+
+        The changes map tuples of category primary key, year and month to the value to add.
+        For multiple changes the existing rows are found with a single query and updated with one
+        conditional update per few hundred rows, missing rows are created with a single
+        batched insert. The activity counters of the budget targets of the categories are updated
+        as well.
+        """
+        changes = {key: change for key, change in changes.items() if change}
+        if not changes:
+            return
+        per_category = Counter()
+        for (category_id, _, _), change in changes.items():
+            per_category[category_id] += change
+
+        if len(changes) == 1:
+            ((category_id, year, month), change), = changes.items()
+            with transaction.atomic(savepoint=False):
+                updated = (self.filter(category_id=category_id, year=year, month=month)
+                           .update(activity=models.F('activity') + change))
+                if not updated:
+                    self.create(category_id=category_id, year=year, month=month,
+                                activity=change)
+                BudgetTarget.objects.apply('activity', per_category)
+            return
+
+        existing = {(category_id, year, month): pk
+                    for pk, category_id, year, month
+                    in self.filter(category_id__in={key[0] for key in changes},
+                                   year__in={key[1] for key in changes},
+                                   month__in={key[2] for key in changes})
+                    .values_list('pk', 'category', 'year', 'month')
+                    if (category_id, year, month) in changes}
+        rows = list(existing.items())
+        with transaction.atomic(savepoint=False):
+            for start in range(0, len(rows), _UPDATE_CHUNK_SIZE):
+                chunk = rows[start:start + _UPDATE_CHUNK_SIZE]
+                change = models.Case(
+                    *[models.When(pk=pk, then=models.Value(changes[key])) for key, pk in chunk],
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2)
+                )
+                (self.filter(pk__in=[pk for _, pk in chunk])
+                 .update(activity=models.F('activity') + change))
+            self.bulk_create(CategoryMonthActivity(category_id=category_id, year=year,
+                                                   month=month, activity=change)
+                             for (category_id, year, month), change in changes.items()
+                             if (category_id, year, month) not in existing)
+            BudgetTarget.objects.apply('activity', per_category)
+
+    def apply_transactions(self, transactions):
+        """
+        Adds the values of the given new transactions to the activity.
+        """
+        changes = Counter()
+        for new_transaction in transactions:
+            changes[(new_transaction.category_id, new_transaction.date.year,
+                     new_transaction.date.month)] += _quantize(new_transaction.value)
+        self.apply(changes)
+
+    def rebuild(self, batch_size=1000):
+        """
+        Recalculates the activity of all categories and months from the transactions.
+
+        The grouped transaction sums are read and inserted in chunks of the given size. The
+        progress counters of all budget targets are recalculated afterwards. Returns the number of
+        created rows.
+        """
+        activities = (Transaction.objects
+                      .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                      .values('category', 'year', 'month')
+                      .annotate(total=models.Sum('value'))
+                      .order_by()
+                      .iterator(chunk_size=batch_size))
+        created = 0
+        with transaction.atomic():
+            self.all().delete()
+            while True:
+                chunk = [CategoryMonthActivity(category_id=activity['category'],
+                                               year=activity['year'],
+                                               month=activity['month'],
+                                               activity=activity['total'])
+                         for activity in islice(activities, batch_size)]
+                if not chunk:
+                    BudgetTarget.objects.rebuild()
+                    return created
+                self.bulk_create(chunk)
+                created += len(chunk)
+
+class CategoryMonthActivity(models.Model):
+    """
+    The sum of all transactions of a category in a single month.
+
+    Rows are maintained automatically when transactions are saved or deleted and should not be
+    edited by the user.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(12)]
+    )
+    activity = models.DecimalField(max_digits=12, decimal_places=2)
+
+    objects = CategoryMonthActivityManager()
+
+    class Meta:
+        unique_together = ['category', 'year', 'month']
+
+    def __str__(self):
+        return f"[{self.month:02d}/{self.year}] {str(self.category)}: {str(self.activity)}"
+
+class BudgetTargetQuerySet(models.QuerySet):
+    """
+    Query set for budget targets with support for maintaining their progress counters.
+    """
+
+    def apply(self, counter, changes):
+        """
+        Adds the given changes to the named counter of the targets of the categories.
+
+        The changes map category primary keys to the value to add. All targets are updated with a
+        single query.
+        """
+        changes = {category_id: change for category_id, change in changes.items() if change}
+        if not changes:
+            return 0
+        if len(changes) == 1:
+            (category_id, change), = changes.items()
+            return (self.filter(category_id=category_id)
+                    .update(**{counter: models.F(counter) + change}))
+        change = models.Case(
+            *[models.When(category_id=category_id, then=models.Value(value))
+              for category_id, value in changes.items()],
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+        return (self.filter(category_id__in=changes)
+                .update(**{counter: models.F(counter) + change}))
+
+    def rebuild(self):
+        """
+        Recalculates the progress counters of the targets from the sheet entries and the monthly
+        category activity. Returns the number of updated targets.
+        """
+        output_field = models.DecimalField(max_digits=12, decimal_places=2)
+        budgeted = (SheetEntry.objects
+                    .filter(category=models.OuterRef('category'))
+                    .values('category')
+                    .annotate(total=models.Sum('value'))
+                    .values('total'))
+        activity = (CategoryMonthActivity.objects
+                    .filter(category=models.OuterRef('category'))
+                    .values('category')
+                    .annotate(total=models.Sum('activity'))
+                    .values('total'))
+        return self.update(
+            budgeted=Coalesce(models.Subquery(budgeted), Decimal(0), output_field=output_field),
+            activity=Coalesce(models.Subquery(activity), Decimal(0), output_field=output_field),
+        )
+
+class BudgetTarget(models.Model):
+    """
+    A goal for the money budgeted in a category.
+
+    A monthly target asks for the amount to be budgeted every month, a target by date for the
+    amount to be available in the category at the given date and a minimum balance target for the
+    amount to be available at the end of every month.
+
+    The progress is kept in counters of everything budgeted in and spent from the category. They
+    are maintained automatically with the sheet entries and the monthly category activity and
+    should not be edited by the user.
+    """
+    MONTHLY = 'monthly'
+    BY_DATE = 'by_date'
+    MINIMUM_BALANCE = 'minimum_balance'
+    KINDS = [
+        (MONTHLY, "Monthly amount"),
+        (BY_DATE, "Total amount by date"),
+        (MINIMUM_BALANCE, "Minimum balance"),
+    ]
+
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='target')
+    kind = models.CharField(max_length=20, choices=KINDS, default=MONTHLY)
+    amount = models.DecimalField(max_digits=12, decimal_places=2,
+                                 validators=[MinValueValidator(0)])
+    date = models.DateField(blank=True, null=True)
+    budgeted = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal(0),
+                                   editable=False)
+    activity = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal(0),
+                                   editable=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = BudgetTargetQuerySet.as_manager()
+
+    @property
+    def progress(self):
+        """
+        Returns everything budgeted in the category plus its activity, including upcoming
+        transactions.
+        """
+        return self.budgeted + self.activity
+
+    def available_at(self, year, month):
+        """
+        Returns the amount available in the category at the end of the given month.
+
+        Starts from the progress counters and subtracts only what was budgeted and spent in later
+        months.
+        """
+        return self.progress - _totals_after([self.category_id], year, month).get(
+            self.category_id, Decimal(0)
+        )
+
+    def underfunded(self, year, month, budgeted, available):
+        """
+        Returns how much more has to be budgeted in the given month to meet the target.
+
+        Takes the amount budgeted in the category in that month and the amount available in the
+        category at the end of that month. A target by date spreads the missing amount evenly
+        over the months left until its date.
+        """
+        if self.kind == BudgetTarget.MONTHLY:
+            missing = self.amount - budgeted
+        elif self.kind == BudgetTarget.MINIMUM_BALANCE:
+            missing = self.amount - available
+        else:
+            months_left = max(1, (self.date.year - year) * 12 + self.date.month - month + 1)
+            missing = (self.amount - available + budgeted) / months_left - budgeted
+        return max(Decimal(missing).quantize(Decimal('.01'), rounding=ROUND_CEILING), Decimal(0))
+
+    def clean(self):
+        super().clean()
+
+        if self.kind == BudgetTarget.BY_DATE and self.date is None:
+            raise ValidationError("A target by date needs a date.")
+
+    def save(self, *args, **kwargs):
+        #pylint: disable=signature-differs
+        super().save(*args, **kwargs)
+        BudgetTarget.objects.filter(pk=self.pk).rebuild()
+        self.budgeted, self.activity = (BudgetTarget.objects
+                                        .filter(pk=self.pk)
+                                        .values_list('budgeted', 'activity')
+                                        .get())
+
+    def __str__(self):
+        return f"{str(self.category)}: {self.get_kind_display()} {str(self.amount)}"
+
+class BudgetQuerySet(models.QuerySet):
+    """
+    Query set for hierarchical budgets with support for maintaining their rollup totals.
+    """
+
+    def apply(self, changes):
+        """
+        Adds the given changes to the totals of the budgets and all their ancestors.
+
+        The changes map budget primary keys to the value to add. The ancestors are read from the
+        paths of the budgets, so this needs one query for the paths and one for the update no
+        matter how deep the budgets are nested.
+        """
+        changes = {pk: change for pk, change in changes.items() if pk is not None and change}
+        if not changes:
+            return 0
+
+        totals = Counter()
+        for pk, path in self.filter(pk__in=changes).values_list('pk', 'path'):
+            for ancestor in _path_pks(path):
+                totals[ancestor] += changes[pk]
+        return self.__add_to_totals(totals)
+
+    def rebuild(self):
+        """
+        Recalculates the totals of all budgets from the transactions assigned to them.
+
+        The transaction sums are read with a single grouped query and added up along the paths.
+        Returns the number of budgets.
+        """
+        own = dict(Transaction.objects
+                   .filter(budget__isnull=False)
+                   .values('budget')
+                   .annotate(total=models.Sum('value'))
+                   .order_by()
+                   .values_list('budget', 'total'))
+        budgets = list(Budget.objects.only('pk', 'path'))
+        totals = Counter()
+        for budget in budgets:
+            for ancestor in _path_pks(budget.path):
+                totals[ancestor] += _quantize(own.get(budget.pk, 0))
+        for budget in budgets:
+            budget.total = totals[budget.pk]
+        Budget.objects.bulk_update(budgets, ['total'], batch_size=1000)
+        return len(budgets)
+
+    def __add_to_totals(self, totals):
+        totals = {pk: total for pk, total in totals.items() if total}
+        if not totals:
+            return 0
+        if len(set(totals.values())) == 1:
+            change, = set(totals.values())
+            return Budget.objects.filter(pk__in=totals).update(total=models.F('total') + change)
+        change = models.Case(
+            *[models.When(pk=pk, then=models.Value(total)) for pk, total in totals.items()],
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+        return Budget.objects.filter(pk__in=totals).update(total=models.F('total') + change)
+
+class Budget(models.Model):
+    """
+    A budget for a purchase or a project organized in a tree of budgets.
+
+    Purchase budgets sit below a category, project budgets may span transactions of multiple
+    categories. Transactions are assigned to a single budget and count towards the total of that
+    budget and all its ancestors.
+
+    Every budget stores the path of primary keys from the root to itself, so ancestors and
+    descendants are found without recursion, and the total of its whole subtree, which is
+    maintained automatically when transactions change or budgets are deleted and should not be
+    edited by the user.
+    """
+    PURCHASE = 'purchase'
+    PROJECT = 'project'
+    KINDS = [
+        (PURCHASE, "Purchase"),
+        (PROJECT, "Project"),
+    ]
+    SEPARATOR = '/'
+
+    name = models.CharField(max_length=200)
+    kind = models.CharField(max_length=10, choices=KINDS, default=PROJECT)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True,
+                               related_name='children')
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, blank=True, null=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal(0))
+    path = models.CharField(max_length=255, editable=False, db_index=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal(0),
+                                editable=False)
+
+    objects = BudgetQuerySet.as_manager()
+
+    @property
+    def depth(self):
+        """
+        Returns the number of ancestors of the budget.
+        """
+        return self.path.count(Budget.SEPARATOR) - 1
+
+    @property
+    def remaining(self):
+        """
+        Returns the planned amount plus the total of all transactions in the subtree.
+        """
+        return self.amount + self.total
+
+    def ancestors(self):
+        """
+        Returns a query set of all ancestors of the budget, starting with the root.
+        """
+        return Budget.objects.filter(pk__in=_path_pks(self.path)[:-1]).order_by('path')
+
+    def descendants(self):
+        """
+        Returns a query set of all descendants of the budget in depth-first order.
+        """
+        return (Budget.objects
+                .filter(path__startswith=self.path)
+                .exclude(pk=self.pk)
+                .order_by('path'))
+
+    def clean(self):
+        super().clean()
+
+        if self.kind == Budget.PURCHASE and self.category_id is None:
+            raise ValidationError("A purchase budget needs a category.")
+        if self.parent_id is not None and self.pk is not None:
+            parent_path = Budget.objects.values_list('path', flat=True).get(pk=self.parent_id)
+            if str(self.pk) in parent_path.split(Budget.SEPARATOR):
+                raise ValidationError("A budget can't be moved below itself.")
+
+    def save(self, *args, **kwargs):
+        #pylint: disable=signature-differs
+        parent_path = ''
+        if self.parent_id is not None:
+            parent_path = Budget.objects.values_list('path', flat=True).get(pk=self.parent_id)
+
+        with transaction.atomic():
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                self.path = f"{parent_path}{self.pk}{Budget.SEPARATOR}"
+                Budget.objects.filter(pk=self.pk).update(path=self.path)
+                return
+
+            old_path, total = (Budget.objects
+                               .select_for_update()
+                               .values_list('path', 'total')
+                               .get(pk=self.pk))
+            new_path = f"{parent_path}{self.pk}{Budget.SEPARATOR}"
+            if new_path != old_path:
+                if parent_path.startswith(old_path):
+                    raise ValidationError("A budget can't be moved below itself.")
+                self.__move(old_path, new_path, total)
+            self.path, self.total = new_path, total
+            super().save(*args, **kwargs)
+
+    def __move(self, old_path, new_path, total):
+        Budget.objects.filter(pk__in=_path_pks(old_path)[:-1]).update(
+            total=models.F('total') - total
+        )
+        Budget.objects.filter(pk__in=_path_pks(new_path)[:-1]).update(
+            total=models.F('total') + total
+        )
+        Budget.objects.filter(path__startswith=old_path).update(path=Concat(
+            models.Value(new_path), Substr('path', len(old_path) + 1),
+            output_field=models.CharField()
+        ))
+
+    def __str__(self):
+        return self.name
+
+def _path_pks(path):
+    return [int(pk) for pk in path.split(Budget.SEPARATOR) if pk]
+
+@receiver(pre_delete, sender=Budget)
+def update_budget_totals_on_budget_delete(instance, **kwargs):
+    """
+    Removes the transactions of a budget that is about to be deleted from the totals of its
+    ancestors.
+
+    Only the transactions assigned directly to the budget are removed, so deleting a whole subtree
+    removes every transaction exactly once no matter in which order the budgets are deleted. The
+    path is read from the database, as the instance may be outdated.
+    """
+    stored = (Budget.objects
+              .filter(pk=instance.pk)
+              .annotate(own=_sum_of_transactions(field='transaction__value'))
+              .values_list('path', 'own')
+              .first())
+    if stored is None:
+        return
+    path, own = stored
+    own = _quantize(own)
+    if own:
+        Budget.objects.filter(pk__in=_path_pks(path)[:-1]).update(total=models.F('total') - own)
+
+@receiver(post_save, sender=Transaction)
+def update_budget_totals_on_save(instance, raw, **kwargs):
+    """
+    Updates the totals of the budgets of a saved transaction and their ancestors.
+    """
+    if raw:
+        return
+    changes = Counter()
+    stored = getattr(instance, 'stored_state', None)
+    if stored is not None:
+        changes[stored['budget']] -= stored['value']
+    changes[instance.budget_id] += _quantize(instance.value)
+    Budget.objects.apply(changes)
+
+@receiver(post_delete, sender=Transaction)
+def update_budget_totals_on_delete(instance, **kwargs):
+    """
+    Removes the value of a deleted transaction from the totals of its budget and its ancestors.
+    """
+    Budget.objects.apply({instance.budget_id: -_quantize(instance.value)})
+
+def _totals_after(category_ids, year, month):
+    """
+    Returns everything budgeted in and spent from the given categories after the given month.
+    """
+    after_month = models.Q(year__gt=year) | models.Q(year=year, month__gt=month)
+    totals = Counter(dict(SheetEntry.objects
+                          .filter(category__in=category_ids,
+                                  sheet__in=Sheet.objects.filter(after_month))
+                          .values('category')
+                          .annotate(total=models.Sum('value'))
+                          .order_by()
+                          .values_list('category', 'total')))
+    totals.update(dict(CategoryMonthActivity.objects
+                       .filter(after_month, category__in=category_ids)
+                       .values('category')
+                       .annotate(total=models.Sum('activity'))
+                       .order_by()
+                       .values_list('category', 'total')))
+    return {category_id: _quantize(total) for category_id, total in totals.items()}
+
+@receiver(pre_save, sender=SheetEntry)
+def remember_sheet_entry_before_save(instance, raw, **kwargs):
+    """
+    Remembers the stored category and value of a sheet entry for updating the budget targets.
+
+    The state is always read from the database, as the state remembered by the instance may be
+    outdated, e.g. after another instance of the same entry was saved.
+    """
+    instance.stored_state = None
+    if not raw and instance.pk is not None and not instance._state.adding:
+        instance.stored_state = (SheetEntry.objects
+                                 .filter(pk=instance.pk)
+                                 .values('category', 'value')
+                                 .first())
+
+@receiver(post_save, sender=SheetEntry)
+def update_target_progress_on_save(instance, raw, **kwargs):
+    """
+    Updates the budgeted counter of the budget targets with the changes of a saved sheet entry.
+    """
+    if raw:
+        return
+    changes = Counter()
+    stored = getattr(instance, 'stored_state', None)
+    if stored is not None:
+        changes[stored['category']] -= _quantize(stored['value'])
+    changes[instance.category_id] += _quantize(instance.value)
+    BudgetTarget.objects.apply('budgeted', changes)
+
+@receiver(post_delete, sender=SheetEntry)
+def update_target_progress_on_delete(instance, **kwargs):
+    """
+    Removes the value of a deleted sheet entry from the budgeted counter of its budget target.
+    """
+    BudgetTarget.objects.apply('budgeted', {instance.category_id: -_quantize(instance.value)})
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_cache_on_transaction_change(instance, **kwargs):
+    """
+    Invalidates the cached values of the accounts and sheets affected by a changed transaction.
+    """
+    accounts = {instance.account_id}
+    dates = [instance.date]
+    stored = getattr(instance, 'stored_state', None)
+    if stored is not None:
+        accounts.add(stored['account'])
+        dates.append(stored['date'])
+    caching.invalidate('account', accounts)
+    earliest = min(dates)
+    Sheet.objects.invalidate_from(earliest.year, earliest.month)
+
+@receiver(post_save, sender=SheetEntry)
+@receiver(post_delete, sender=SheetEntry)
+def invalidate_cache_on_sheet_entry_change(instance, **kwargs):
+    """
+    Invalidates the cached values of the sheet of a changed entry and all later sheets.
+    """
+    if SheetEntry.sheet.is_cached(instance):
+        Sheet.objects.invalidate_from(instance.sheet.year, instance.sheet.month)
+        return
+    sheet = Sheet.objects.filter(pk=instance.sheet_id).values_list('year', 'month').first()
+    if sheet is not None:
+        Sheet.objects.invalidate_from(*sheet)
+
+@receiver(post_save, sender=Sheet)
+@receiver(post_delete, sender=Sheet)
+def invalidate_cache_on_sheet_change(instance, **kwargs):
+    """
+    Invalidates the cached values of a changed sheet and all later sheets.
+    """
+    caching.invalidate('sheet', [instance.pk])
+    Sheet.objects.invalidate_from(instance.year, instance.month)
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_cache_on_account_change(instance, **kwargs):
+    """
+    Invalidates the cached values of a changed account.
+    """
+    caching.invalidate('account', [instance.pk])
+
+@receiver(post_save, sender=Sheet)
+@receiver(post_save, sender=Account)
+def remember_in_identity_map(instance, **kwargs):
+    """
+    Updates the active identity map with a saved sheet or account.
+    """
+    active = identity.current()
+    if active is not None:
+        active.remember(instance)
+
+@receiver(post_delete, sender=Sheet)
+@receiver(post_delete, sender=Account)
+def forget_in_identity_map(instance, **kwargs):
+    """
+    Removes a deleted sheet or account from the active identity map.
+    """
+    active = identity.current()
+    if active is not None:
+        active.forget(instance)
@@ -0,0 +1,45 @@
+"""
+Keyset pagination for transactions.
+
+Transactions are ordered by date descending and primary key descending, so the latest booking
+of a day comes first. A page is selected by the position of the last transaction of the previous
+page instead of an offset, so loading a page stays cheap no matter how far back in the history it
+is.
+"""
+import datetime
+
+from django.db import models
+
+PAGE_SIZE = 100
+
+def encode_cursor(transaction):
+    """
+    Returns the cursor pointing directly after the given transaction.
+    """
+    return f"{transaction.date:%Y-%m-%d}_{transaction.pk}"
+
+def decode_cursor(cursor):
+    """
+    Returns date and primary key stored in the given cursor.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    date, _, pk = cursor.partition('_')
+    return datetime.datetime.strptime(date, '%Y-%m-%d').date(), int(pk)
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """
+    Returns a page of transactions from the given query set and the cursor of the next page.
+
+    The cursor of the next page is None if there are no more transactions. Raises ValueError if
+    the given cursor is malformed.
+    """
+    queryset = queryset.order_by('-date', '-pk')
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(models.Q(date__lt=date) | models.Q(date=date, pk__lt=pk))
+
+    page = list(queryset[:size + 1])
+    if len(page) > size:
+        return page[:size], encode_cursor(page[size - 1])
+    return page, None
@@ -0,0 +1,35 @@
+"""
+Helpers for measuring the database usage of code paths.
+"""
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+class QueryCounter:
+    """
+    Counts the queries executed on a database connection and the time spent executing them.
+
+    Used as a context manager, all queries inside the block are counted.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+        self.duration = 0.0
+        self.__wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    def __enter__(self):
+        self.__wrapper = self.connection.execute_wrapper(self)
+        self.__wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__wrapper.__exit__(exc_type, exc_value, traceback)
@@ -0,0 +1,38 @@
+"""
+Materialization of recurring transactions.
+
+Occurrences are turned into transactions with a single batched insert per run. Every materialized
+transaction keeps its recurring transaction and occurrence date as key, so a run can be repeated
+for any date window without creating duplicates.
+"""
+from django.db import transaction
+
+from budgeteer import caching
+from budgeteer.fingerprints import assign_fingerprints
+from budgeteer.models import (AccountBalanceSnapshot, CategoryMonthActivity, RecurringTransaction,
+                              Sheet, Transaction)
+
+def materialize(end, start=None, recurring=None):
+    """
+    Creates the transactions of all occurrences between the given dates that don't exist yet.
+
+    Without start date all occurrences since the start of each schedule are materialized. If no
+    query set of recurring transactions is given all of them are materialized. Returns the number
+    of created transactions.
+    """
+    if recurring is None:
+        recurring = RecurringTransaction.objects.all()
+    new_transactions = list(recurring.project(start, end))
+    if not new_transactions:
+        return 0
+
+    assign_fingerprints(new_transactions)
+    accounts = {t.account_id for t in new_transactions}
+    earliest = min(t.date for t in new_transactions)
+    with transaction.atomic():
+        Transaction.objects.bulk_create(new_transactions)
+        CategoryMonthActivity.objects.apply_transactions(new_transactions)
+        AccountBalanceSnapshot.objects.apply_transactions(new_transactions)
+        caching.invalidate('account', accounts)
+        Sheet.objects.invalidate_from(earliest.year, earliest.month)
+    return len(new_transactions)
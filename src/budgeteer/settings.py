@@ -48,6 +48,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'budgeteer.middleware.TimingMiddleware',
+    'budgeteer.middleware.IdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'budgeteer.urls'
@@ -115,7 +117,42 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Budgeteer
+
+# Number of past months that stay open when old sheets get locked automatically
+BUDGETEER_LOCK_HORIZON_MONTHS = 3
+
+# Measure query count and timings of every request, see budgeteer.middleware.TimingMiddleware
+BUDGETEER_TIMING = False
+
+# Number of latest requests per URL name kept for the timing statistics
+BUDGETEER_TIMING_WINDOW = 1000
+
+# Cache alias and timeout in seconds for aggregated account and sheet values, see budgeteer.caching
+BUDGETEER_CACHE = 'default'
+BUDGETEER_CACHE_TIMEOUT = 3600
+
+# Number of threads for running independent queries of concurrent views, see budgeteer.concurrency
+BUDGETEER_CONCURRENT_WORKERS = 4
+
+# Default number of months projected by the cash-flow forecast, see budgeteer.forecasting
+BUDGETEER_FORECAST_MONTHS = 12
+
+# Number of months up to the current one covered by the statistics, see budgeteer.statistics
+BUDGETEER_STATISTICS_MONTHS = 12
@@ -0,0 +1,182 @@
+"""
+Statistics over the transactions of the latest months.
+
+All transactions of the period are read with a single query into columns of integer arrays, one
+entry per transaction, and aggregated from there without creating model instances. Values are
+kept in cents. The aggregates are cached for the data version of the transactions, which changes
+whenever a transaction is added, changed or deleted.
+"""
+import datetime
+import heapq
+from array import array
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models
+
+from budgeteer.caching import cached_for_version
+from budgeteer.models import Transaction
+
+DEFAULT_MONTHS = 12
+
+DEFAULT_WINDOW = 3
+
+DEFAULT_PARTNERS = 10
+
+class Statistics:
+    """
+    Aggregated transactions of consecutive months.
+
+    Spending is the sum of all outflows as a positive value. The spending and rolling average
+    arrays have one row per month and one column per category.
+    """
+
+    def __init__(self, months, categories, accounts, window):
+        self.months = months
+        self.categories = categories
+        self.accounts = accounts
+        self.window = window
+        self.spending = _zeros(len(months) * len(categories))
+        self.rolling = _zeros(len(months) * len(categories))
+        self.income = _zeros(len(months))
+        self.expenses = _zeros(len(months))
+        self.account_income = _zeros(len(accounts))
+        self.account_expenses = _zeros(len(accounts))
+        self.partners = []
+
+    def category_spending(self, category_id):
+        """
+        Returns the spending of the given category in cents for every month.
+        """
+        return self.spending[self.categories.index(category_id)::len(self.categories)]
+
+    def category_rolling(self, category_id):
+        """
+        Returns the rolling average of the spending of the given category in cents for every month.
+        """
+        return self.rolling[self.categories.index(category_id)::len(self.categories)]
+
+    def ratios(self):
+        """
+        Returns the income divided by the expenses for every month, None for months without
+        expenses.
+        """
+        return [_ratio(income, expenses) for income, expenses in zip(self.income, self.expenses)]
+
+    def account_ratios(self):
+        """
+        Returns the income divided by the expenses of the whole period for every account.
+        """
+        return [_ratio(income, expenses)
+                for income, expenses in zip(self.account_income, self.account_expenses)]
+
+def statistics(months=None, today=None, window=DEFAULT_WINDOW, partners=DEFAULT_PARTNERS):
+    """
+    Returns the statistics of the given number of months up to and including the current one.
+
+    If no number of months is given BUDGETEER_STATISTICS_MONTHS from the settings is used.
+    Rolling averages span the given number of months, fewer at the start of the period. The
+    result is taken from the cache unless transactions changed since it was calculated.
+    """
+    if months is None:
+        months = getattr(settings, 'BUDGETEER_STATISTICS_MONTHS', DEFAULT_MONTHS)
+    if today is None:
+        today = datetime.date.today()
+    first = _month_index(today) - months + 1
+
+    state = Transaction.objects.aggregate(updated=models.Max('updated'),
+                                          count=models.Count('pk'))
+    updated = state['updated'].isoformat() if state['updated'] is not None else 'none'
+    version = f"{first}:{months}:{window}:{partners}:{state['count']}:{updated}"
+    return cached_for_version('statistics', version,
+                              lambda: calculate(first, months, window, partners))
+
+def calculate(first, months, window, partners):
+    """
+    Returns the statistics of the given number of months starting with the given month index.
+
+    The month index of a date is its year times twelve plus its zero-based month.
+    """
+    start_year, start_month = divmod(first, 12)
+    end_year, end_month = divmod(first + months, 12)
+    rows = (Transaction.objects
+            .filter(date__gte=datetime.date(start_year, start_month + 1, 1),
+                    date__lt=datetime.date(end_year, end_month + 1, 1))
+            .values_list('date', 'category_id', 'account_id', 'value', 'partner'))
+
+    month_column, category_column, account_column = array('l'), array('l'), array('l')
+    value_column, partner_column = array('q'), array('l')
+    partner_indexes = {}
+    for date, category_id, account_id, value, partner in rows.iterator():
+        month_column.append(_month_index(date) - first)
+        category_column.append(category_id)
+        account_column.append(account_id)
+        value_column.append(int((value * 100).to_integral_value()))
+        partner_column.append(partner_indexes.setdefault(partner, len(partner_indexes)))
+
+    result = Statistics([(year, month + 1)
+                         for year, month in (divmod(first + offset, 12)
+                                             for offset in range(months))],
+                        sorted(set(category_column)), sorted(set(account_column)), window)
+    _aggregate_months(result, month_column, category_column, value_column)
+    _aggregate_accounts(result, account_column, value_column)
+    _aggregate_rolling(result)
+
+    partner_spending = _zeros(len(partner_indexes))
+    for partner, value in zip(partner_column, value_column):
+        if value < 0:
+            partner_spending[partner] -= value
+    names = list(partner_indexes)
+    result.partners = [(names[partner], partner_spending[partner])
+                       for partner in heapq.nlargest(partners, range(len(names)),
+                                                     key=partner_spending.__getitem__)
+                       if partner_spending[partner]]
+    return result
+
+def as_decimal(cents):
+    """
+    Returns the given amount of cents as decimal.
+    """
+    return Decimal(cents).scaleb(-2)
+
+def _aggregate_months(result, month_column, category_column, value_column):
+    columns = {category_id: column for column, category_id in enumerate(result.categories)}
+    width = len(columns)
+    for month, category_id, value in zip(month_column, category_column, value_column):
+        if value < 0:
+            result.spending[month * width + columns[category_id]] -= value
+            result.expenses[month] -= value
+        else:
+            result.income[month] += value
+
+def _aggregate_accounts(result, account_column, value_column):
+    columns = {account_id: column for column, account_id in enumerate(result.accounts)}
+    for account_id, value in zip(account_column, value_column):
+        if value < 0:
+            result.account_expenses[columns[account_id]] -= value
+        else:
+            result.account_income[columns[account_id]] += value
+
+def _aggregate_rolling(result):
+    width = len(result.categories)
+    for column in range(width):
+        spending = result.spending[column::width]
+        total = 0
+        for month, value in enumerate(spending):
+            total += value
+            if month >= result.window:
+                total -= spending[month - result.window]
+            result.rolling[month * width + column] = round(
+                total / min(month + 1, result.window)
+            )
+
+def _month_index(date):
+    return date.year * 12 + date.month - 1
+
+def _ratio(income, expenses):
+    if not expenses:
+        return None
+    return (Decimal(income) / Decimal(expenses)).quantize(Decimal('.01'))
+
+def _zeros(length):
+    return array('q', [0]) * length
@@ -0,0 +1,102 @@
+"""
+Unit tests for the budgeteer main app admin.
+"""
+from decimal import Decimal
+
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+
+import budgeteer.models as models
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class TransactionAdminTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_superuser('admin', 'admin@test.zz', 'testpassword')
+        self.client.login(username='admin', password='testpassword')
+
+    def test_lock_action(self):
+        expected_total = models.Account.objects.get(pk=1).total
+
+        response = self.__action('lock', [1, 2])
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(2, models.Transaction.objects.filter(locked=True).count())
+        self.assertEqual(expected_total, models.Account.objects.get(pk=1).total)
+
+    def test_unlock_action(self):
+        self.__action('lock', [1, 2, 3])
+
+        self.__action('unlock', [3])
+
+        self.assertListEqual([1, 2], list(models.Transaction.objects
+                                          .filter(locked=True)
+                                          .order_by('pk')
+                                          .values_list('pk', flat=True)))
+        self.assertEqual(Decimal(7000), models.Account.objects.get(pk=2).balance)
+
+    def test_changelist_query_count_independent_of_rows(self):
+        budget = models.Budget(name="Trip")
+        budget.save()
+        for transaction in models.Transaction.objects.all():
+            transaction.budget = budget
+            transaction.save()
+        with self.assertNumQueries(8):
+            self.client.get(reverse('admin:budgeteer_transaction_changelist'))
+
+        date = models.Transaction.objects.first().date
+        for i in range(10):
+            budget = models.Budget(name=f"Budget {i}")
+            budget.save()
+            models.Transaction(partner="Test partner", date=date, value=Decimal(i),
+                               category_id=1, account_id=1, budget=budget).save()
+        with self.assertNumQueries(8):
+            self.client.get(reverse('admin:budgeteer_transaction_changelist'))
+
+    def __action(self, action, pks):
+        return self.client.post(reverse('admin:budgeteer_transaction_changelist'), {
+            'action': action,
+            helpers.ACTION_CHECKBOX_NAME: pks,
+        })
+
+class SheetEntryAdminTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_superuser('admin', 'admin@test.zz', 'testpassword')
+        self.client.login(username='admin', password='testpassword')
+
+    def test_lock_action(self):
+        self.client.post(reverse('admin:budgeteer_sheetentry_changelist'), {
+            'action': 'lock',
+            helpers.ACTION_CHECKBOX_NAME: [1],
+        })
+
+        self.assertTrue(models.SheetEntry.objects.get(pk=1).locked)
+
+class BudgetAdminTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_superuser('admin', 'admin@test.zz', 'testpassword')
+        self.client.login(username='admin', password='testpassword')
+
+    def test_changelist_query_count_independent_of_rows(self):
+        parent = models.Budget(name="Home")
+        parent.save()
+        with self.assertNumQueries(6):
+            self.client.get(reverse('admin:budgeteer_budget_changelist'))
+
+        for i in range(10):
+            models.Budget(name=f"Room {i}", parent=parent, category_id=1,
+                          kind=models.Budget.PURCHASE).save()
+        with self.assertNumQueries(6):
+            self.client.get(reverse('admin:budgeteer_budget_changelist'))
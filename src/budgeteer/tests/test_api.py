@@ -0,0 +1,226 @@
+"""
+Unit tests for the read-only JSON API.
+"""
+import datetime
+import gzip
+import json
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+import budgeteer.models as models
+from budgeteer.caching import get_cache
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class AccountListApiTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_accounts(self):
+        self.__login()
+        response = self.client.get(reverse('api-accounts'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual([
+            {'id': 1, 'name': "Test account 1", 'balance': "7000.00", 'total': "7000.00"},
+            {'id': 2, 'name': "Test account 2", 'balance': "7000.00", 'total': "7010.00"},
+        ], response.json()['accounts'])
+
+    def test_prevents_not_logged_in_user(self):
+        response = self.client.get(reverse('api-accounts'))
+        self.assertEqual(403, response.status_code)
+
+    def test_sparse_fieldset(self):
+        self.__login()
+        response = self.client.get(reverse('api-accounts'), {'fields[account]': 'id,name'})
+        self.assertListEqual([{'id': 1, 'name': "Test account 1"},
+                              {'id': 2, 'name': "Test account 2"}],
+                             response.json()['accounts'])
+
+    def test_400_on_unknown_field(self):
+        self.__login()
+        response = self.client.get(reverse('api-accounts'), {'fields[account]': 'id,secret'})
+        self.assertEqual(400, response.status_code)
+
+    def test_not_modified(self):
+        self.__login()
+        response = self.client.get(reverse('api-accounts'))
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('api-accounts'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+        models.Transaction(partner="Test partner", date=datetime.date(2020, 6, 28),
+                           value=Decimal(1), category_id=1, account_id=1).save()
+        response = self.client.get(reverse('api-accounts'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_not_modified_after_deletion(self):
+        self.__login()
+        etag = self.client.get(reverse('api-accounts'))['ETag']
+
+        models.Transaction.objects.get(pk=1).delete()
+
+        response = self.client.get(reverse('api-accounts'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+
+    def test_modified_since_after_deletion(self):
+        self.__login()
+        since = http_date(time.time() + 60)
+
+        models.Transaction.objects.get(pk=1).delete()
+
+        response = self.client.get(reverse('api-accounts'), HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(200, response.status_code)
+
+    def test_gzip(self):
+        self.__login()
+        for i in range(50):
+            models.Account(name=f"Account {i}", balance=Decimal(i)).save()
+
+        response = self.client.get(reverse('api-accounts'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual('gzip', response['Content-Encoding'])
+        self.assertEqual(52, len(json.loads(gzip.decompress(response.content))['accounts']))
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
+
+class AccountTransactionsApiTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_transactions(self):
+        self.__login()
+        response = self.client.get(reverse('api-account-transactions', args=[1]),
+                                   {'fields[transaction]': 'id,value'})
+
+        self.assertDictEqual({'transactions': [{'id': 2, 'value': "-10.00"},
+                                               {'id': 1, 'value': "10.00"}],
+                              'next': None},
+                             response.json())
+
+    def test_pagination(self):
+        self.__login()
+        start = datetime.date(2020, 1, 1)
+        models.Transaction.objects.bulk_create(
+            models.Transaction(partner="Test partner", date=start + datetime.timedelta(days=i),
+                               value=Decimal(i), category_id=1, account_id=2)
+            for i in range(150)
+        )
+
+        first = self.client.get(reverse('api-account-transactions', args=[2])).json()
+        second = self.client.get(reverse('api-account-transactions', args=[2]),
+                                 {'after': first['next']}).json()
+
+        self.assertEqual(100, len(first['transactions']))
+        self.assertEqual(51, len(second['transactions']))
+        self.assertIsNone(second['next'])
+
+    def test_404_on_unknown_account(self):
+        self.__login()
+        response = self.client.get(reverse('api-account-transactions', args=[42]))
+        self.assertEqual(404, response.status_code)
+
+    def test_400_on_invalid_cursor(self):
+        self.__login()
+        response = self.client.get(reverse('api-account-transactions', args=[1]),
+                                   {'after': 'invalid'})
+        self.assertEqual(400, response.status_code)
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
+
+class SheetApiTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_sheet(self):
+        self.__login()
+        models.SheetEntry.objects.filter(pk=1).update(value=Decimal(3))
+
+        response = self.client.get(reverse('api-sheet', args=[2020, 6]),
+                                   {'fields[sheet]': 'year,month,available',
+                                    'fields[entry]': 'category,value,available'})
+
+        sheet = response.json()
+        self.assertListEqual(['year', 'month', 'available', 'entries'], list(sheet))
+        self.assertEqual(Decimal(17), Decimal(sheet['available']))
+        self.assertListEqual([{'category': 2, 'value': Decimal(3), 'available': Decimal(3)}],
+                             [{'category': entry['category'],
+                               'value': Decimal(entry['value']),
+                               'available': Decimal(entry['available'])}
+                              for entry in sheet['entries']])
+
+    def test_money_format(self):
+        self.__login()
+        response = self.client.get(reverse('api-sheet', args=[2020, 6]))
+        self.assertEqual("0.00", response.json()['entries'][0]['activity'])
+        self.assertEqual("0.00", response.json()['entries'][0]['underfunded'])
+
+        for value in [Decimal('558007.14')] + [Decimal('0.20')] * 12:
+            models.Transaction(partner="Test", date=datetime.date(2020, 6, 10), value=value,
+                               category_id=2, account_id=1).save()
+        sheet = self.client.get(reverse('api-sheet', args=[2020, 6])).json()
+
+        self.assertEqual("558009.54", sheet['entries'][0]['activity'])
+        self.assertEqual("558009.54", sheet['entries'][0]['available'])
+        for field in ('inflow', 'outflow', 'available'):
+            self.assertRegex(sheet[field], r'^-?\d+\.\d{2}$')
+
+    def test_404_on_unknown_sheet(self):
+        self.__login()
+        response = self.client.get(reverse('api-sheet', args=[2020, 7]))
+        self.assertEqual(404, response.status_code)
+
+    def test_not_modified_until_entry_changes(self):
+        self.__login()
+        etag = self.client.get(reverse('api-sheet', args=[2020, 6]))['ETag']
+        self.assertEqual(304, self.client.get(reverse('api-sheet', args=[2020, 6]),
+                                              HTTP_IF_NONE_MATCH=etag).status_code)
+
+        entry = models.SheetEntry.objects.get(pk=1)
+        entry.value = Decimal(5)
+        entry.save()
+
+        self.assertEqual(200, self.client.get(reverse('api-sheet', args=[2020, 6]),
+                                              HTTP_IF_NONE_MATCH=etag).status_code)
+
+    def test_not_modified_until_target_changes(self):
+        self.__login()
+        target = models.BudgetTarget(category_id=2, amount=Decimal(50))
+        target.save()
+        response = self.client.get(reverse('api-sheet', args=[2020, 6]),
+                                   {'fields[entry]': 'underfunded'})
+        self.assertEqual(Decimal(50), Decimal(response.json()['entries'][0]['underfunded']))
+
+        target.amount = Decimal(80)
+        target.save()
+        response = self.client.get(reverse('api-sheet', args=[2020, 6]),
+                                   {'fields[entry]': 'underfunded'},
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(Decimal(80), Decimal(response.json()['entries'][0]['underfunded']))
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
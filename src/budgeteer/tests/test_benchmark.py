@@ -0,0 +1,77 @@
+"""
+Unit tests for the benchmarks of models and views.
+"""
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase
+
+import budgeteer.models as models
+from budgeteer.benchmark import generate_data, measure, run_benchmarks, run_throughput
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class GenerateDataTest(TestCase):
+
+    def test_data_set_size(self):
+        generate_data(accounts=2, categories=3, years=2, transactions_per_month=4)
+
+        self.assertEqual(2, models.Account.objects.count())
+        self.assertEqual(3, models.Category.objects.count())
+        self.assertEqual(24, models.Sheet.objects.count())
+        self.assertEqual(72, models.SheetEntry.objects.count())
+        self.assertEqual(96, models.Transaction.objects.count())
+
+class RunBenchmarksTest(TestCase):
+
+    def test_results(self):
+        generate_data(accounts=2, categories=3, years=1, transactions_per_month=4)
+
+        results = run_benchmarks(repeat=1)
+
+        self.assertCountEqual(['sheet_available', 'account_total', 'account_list',
+                               'account_overview'], results.keys())
+        for result in results.values():
+            self.assertGreater(result['queries'], 0)
+            self.assertGreaterEqual(result['time_median'], result['time_min'])
+
+    def test_measures_without_cache(self):
+        generate_data(accounts=2, categories=3, years=1, transactions_per_month=4)
+
+        first = run_benchmarks(repeat=2)
+        second = run_benchmarks(repeat=2)
+
+        for name in ('sheet_available', 'account_total'):
+            self.assertGreater(first[name]['queries'], 1)
+            self.assertEqual(first[name]['queries'], second[name]['queries'])
+
+    def test_keeps_configured_cache(self):
+        generate_data(accounts=2, categories=3, years=1, transactions_per_month=4)
+        account = models.Account.objects.order_by('pk').first()
+        version = caches['default'].get(f"budgeteer:account:{account.pk}:version")
+        caches['default'].set('unrelated', 1)
+
+        run_benchmarks(repeat=1)
+
+        self.assertEqual(1, caches['default'].get('unrelated'))
+        self.assertIsNone(caches['default'].get(
+            f"budgeteer:account:{account.pk}:{version}:transaction_total"
+        ))
+
+    def test_measure_counts_queries(self):
+        result = measure(lambda: list(models.Account.objects.all()), repeat=2)
+
+        self.assertEqual(1, result['queries'])
+        self.assertGreater(result['peak_memory'], 0)
+
+class RunThroughputTest(TransactionTestCase):
+
+    def test_results(self):
+        generate_data(accounts=2, categories=3, years=1, transactions_per_month=4)
+
+        results = run_throughput(clients=2, requests=2)
+
+        self.assertCountEqual(['account-view', 'account-view-concurrent'], results.keys())
+        for result in results.values():
+            self.assertEqual(4, result['requests'])
+            self.assertEqual(0, result['failures'])
+            self.assertGreater(result['requests_per_second'], 0)
@@ -0,0 +1,129 @@
+"""
+Unit tests for the caching of aggregated account and sheet values.
+"""
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.caching import cached, cached_for_version, get_cache, invalidate
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class CachedTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_calculates_once(self):
+        calls = []
+
+        def calculate():
+            calls.append(1)
+            return Decimal(len(calls))
+
+        self.assertEqual(Decimal(1), cached('test', 1, 'value', calculate))
+        self.assertEqual(Decimal(1), cached('test', 1, 'value', calculate))
+        self.assertEqual(1, len(calls))
+
+    def test_invalidate(self):
+        cached('test', 1, 'value', lambda: 1)
+        cached('test', 2, 'value', lambda: 2)
+
+        invalidate('test', [1])
+
+        self.assertEqual(3, cached('test', 1, 'value', lambda: 3))
+        self.assertEqual(2, cached('test', 2, 'value', lambda: 4))
+
+    def test_no_caching_without_primary_key(self):
+        cached('test', None, 'value', lambda: 1)
+        self.assertEqual(2, cached('test', None, 'value', lambda: 2))
+
+    def test_cached_for_version(self):
+        self.assertEqual(1, cached_for_version('test', 'a', lambda: 1))
+        self.assertEqual(1, cached_for_version('test', 'a', lambda: 2))
+        self.assertEqual(3, cached_for_version('test', 'b', lambda: 3))
+
+class AggregateInvalidationTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.category = models.Category(name="Test")
+        self.category.save()
+        self.accounts = [models.Account(name=f"Test {i}", balance=Decimal(0)) for i in range(2)]
+        for account in self.accounts:
+            account.save()
+        self.sheets = []
+        for month in range(1, 4):
+            sheet = models.Sheet(month=month, year=2020)
+            sheet.save()
+            self.sheets.append(sheet)
+
+    def test_account_total_cached(self):
+        self.__transaction(1, Decimal(10))
+        self.assertEqual(Decimal(10), self.__account(0).total)
+
+        account = self.__account(0)
+        with self.assertNumQueries(0):
+            self.assertEqual(Decimal(10), account.total)
+
+    def test_transaction_invalidates_accounts(self):
+        transaction = self.__transaction(1, Decimal(10))
+        self.assertEqual(Decimal(10), self.__account(0).total)
+
+        transaction.account = self.accounts[1]
+        transaction.save()
+
+        self.assertEqual(Decimal(0), self.__account(0).total)
+        self.assertEqual(Decimal(10), self.__account(1).total)
+
+    def test_transaction_invalidates_later_sheets(self):
+        self.assertListEqual([Decimal(0)] * 3, self.__available())
+
+        transaction = self.__transaction(2, Decimal(10))
+        self.assertListEqual([Decimal(0), Decimal(10), Decimal(10)], self.__available())
+        self.assertEqual(Decimal(10), self.__sheet(1).inflow)
+
+        transaction.date = datetime.date(2020, 3, 1)
+        transaction.save()
+        self.assertListEqual([Decimal(0), Decimal(0), Decimal(10)], self.__available())
+        self.assertEqual(Decimal(0), self.__sheet(1).inflow)
+
+        transaction.delete()
+        self.assertListEqual([Decimal(0)] * 3, self.__available())
+
+    def test_sheet_entry_invalidates_later_sheets(self):
+        self.assertListEqual([Decimal(0)] * 3, self.__available())
+
+        entry = models.SheetEntry.objects.get(sheet=self.sheets[0])
+        entry.value = Decimal(5)
+        entry.save()
+
+        self.assertListEqual([Decimal(-5)] * 3, self.__available())
+
+    def test_sheet_invalidates_later_sheets(self):
+        self.assertListEqual([Decimal(0)] * 3, self.__available())
+
+        sheet = self.__sheet(1)
+        sheet.carryover = Decimal(20)
+        sheet.save()
+
+        self.assertListEqual([Decimal(0), Decimal(20), Decimal(20)], self.__available())
+
+    def __transaction(self, month, value):
+        transaction = models.Transaction(partner="Test", date=datetime.date(2020, month, 1),
+                                         value=value, category=self.category,
+                                         account=self.accounts[0])
+        transaction.save()
+        return transaction
+
+    def __account(self, index):
+        return models.Account.objects.get(pk=self.accounts[index].pk)
+
+    def __sheet(self, index):
+        return models.Sheet.objects.get(pk=self.sheets[index].pk)
+
+    def __available(self):
+        return [self.__sheet(index).available for index in range(len(self.sheets))]
@@ -0,0 +1,52 @@
+"""
+Unit tests for the concurrent execution of database calls.
+"""
+import threading
+from decimal import Decimal
+
+from django.test import TestCase, TransactionTestCase
+
+import budgeteer.models as models
+from budgeteer.concurrency import run_concurrently
+from budgeteer.identity import identity_map, lookup
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class RunConcurrentlyTest(TransactionTestCase):
+
+    def setUp(self):
+        self.account = models.Account(name="Test", balance=Decimal(10))
+        self.account.save()
+
+    def test_results_in_order(self):
+        results = run_concurrently(lambda: models.Account.objects.count(),
+                                   lambda: models.Account.objects.get().balance)
+
+        self.assertListEqual([1, Decimal(10)], results)
+
+    def test_runs_in_worker_threads(self):
+        threads = run_concurrently(threading.current_thread, threading.current_thread)
+
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_raises_exception(self):
+        with self.assertRaises(models.Account.DoesNotExist):
+            run_concurrently(lambda: models.Account.objects.get(pk=self.account.pk + 1),
+                             lambda: None)
+
+    def test_shares_identity_map(self):
+        with identity_map():
+            account, _ = run_concurrently(lambda: lookup(models.Account, pk=self.account.pk),
+                                          lambda: None)
+            with self.assertNumQueries(0):
+                self.assertIs(account, lookup(models.Account, pk=self.account.pk))
+
+class RunConcurrentlyInTransactionTest(TestCase):
+
+    def test_sequential_in_transaction(self):
+        models.Account(name="Test", balance=Decimal(10)).save()
+
+        threads = run_concurrently(threading.current_thread, threading.current_thread)
+
+        self.assertListEqual([threading.current_thread()] * 2, threads)
@@ -0,0 +1,148 @@
+"""
+Unit tests for the recognition of duplicate transactions.
+"""
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.fingerprints import LOOKUP_CHUNK_SIZE, DuplicateFilter, backfill_fingerprints
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class FingerprintTest(TestCase):
+
+    def test_normalized_partner(self):
+        self.assertEqual(
+            models.Transaction.calculate_fingerprint(1, datetime.date(2020, 1, 1), Decimal('1.5'),
+                                                     "  Some   Partner "),
+            models.Transaction.calculate_fingerprint(1, datetime.date(2020, 1, 1),
+                                                     Decimal('1.50'), "some partner")
+        )
+
+    def test_differs_by_content(self):
+        fingerprint = models.Transaction.calculate_fingerprint(1, datetime.date(2020, 1, 1),
+                                                               Decimal(1), "Partner")
+        self.assertNotEqual(fingerprint, models.Transaction.calculate_fingerprint(
+            2, datetime.date(2020, 1, 1), Decimal(1), "Partner"))
+        self.assertNotEqual(fingerprint, models.Transaction.calculate_fingerprint(
+            1, datetime.date(2020, 1, 2), Decimal(1), "Partner"))
+        self.assertNotEqual(fingerprint, models.Transaction.calculate_fingerprint(
+            1, datetime.date(2020, 1, 1), Decimal(-1), "Partner"))
+        self.assertNotEqual(fingerprint, models.Transaction.calculate_fingerprint(
+            1, datetime.date(2020, 1, 1), Decimal(1), "Other partner"))
+
+class DuplicateFilterTest(TestCase):
+
+    def setUp(self):
+        self.category = models.Category(name="Test")
+        self.category.save()
+        self.account = models.Account(name="Test", balance=Decimal(0))
+        self.account.save()
+
+    def test_set_on_save(self):
+        transaction = self.__transaction("Partner")
+        transaction.save()
+
+        transaction_in_db = models.Transaction.objects.get(pk=transaction.pk)
+
+        self.assertEqual(models.Transaction.calculate_fingerprint(
+            self.account.pk, transaction.date, transaction.value, "Partner"
+        ), transaction_in_db.fingerprint)
+
+    def test_set_on_save_from_strings(self):
+        transaction = models.Transaction(partner="Partner", date='2020-06-01', value='1.5',
+                                         category=self.category, account=self.account)
+        transaction.save()
+
+        transaction_in_db = models.Transaction.objects.get(pk=transaction.pk)
+
+        self.assertEqual(datetime.date(2020, 6, 1), transaction_in_db.date)
+        self.assertEqual(models.Transaction.calculate_fingerprint(
+            self.account.pk, datetime.date(2020, 6, 1), Decimal('1.50'), "Partner"
+        ), transaction_in_db.fingerprint)
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_filters_known_transactions_with_one_query(self):
+        self.__transaction("Known").save()
+        duplicates = DuplicateFilter()
+
+        with self.assertNumQueries(1):
+            new_transactions = duplicates.filter([self.__transaction("Known"),
+                                                  self.__transaction("New")])
+
+        self.assertListEqual(["New"], [t.partner for t in new_transactions])
+
+    def test_chunks_lookup_of_fingerprints(self):
+        self.__transaction("Partner 0").save()
+        duplicates = DuplicateFilter()
+
+        with self.assertNumQueries(3):
+            new_transactions = duplicates.filter([self.__transaction(f"Partner {i}")
+                                                  for i in range(2 * LOOKUP_CHUNK_SIZE + 1)])
+
+        self.assertEqual(2 * LOOKUP_CHUNK_SIZE, len(new_transactions))
+
+    def test_known_fingerprints_kept_in_memory(self):
+        duplicates = DuplicateFilter()
+        duplicates.filter([self.__transaction("Partner")])
+
+        with self.assertNumQueries(0):
+            duplicates.filter([self.__transaction("Partner")])
+
+    def test_forgets_fingerprints_of_earlier_days(self):
+        duplicates = DuplicateFilter()
+        for day in range(1, 11):
+            duplicates.filter([self.__transaction("Partner", day), self.__transaction("Other", day)])
+
+        self.assertEqual(2, len(duplicates.known))
+        self.assertEqual(2, len(duplicates.seen))
+
+    def test_keeps_identical_transactions_across_chunks(self):
+        duplicates = DuplicateFilter()
+
+        first = duplicates.filter([self.__transaction("Partner")])
+        models.Transaction.objects.bulk_create(first)
+        second = duplicates.filter([self.__transaction("Partner")])
+
+        self.assertEqual(1, len(first))
+        self.assertEqual(1, len(second))
+
+    def __transaction(self, partner, day=1):
+        return models.Transaction(partner=partner, date=datetime.date(2020, 1, day),
+                                  value=Decimal(1), category=self.category, account=self.account)
+
+class BackfillFingerprintsTest(TestCase):
+
+    def setUp(self):
+        category = models.Category(name="Test")
+        category.save()
+        account = models.Account(name="Test", balance=Decimal(0))
+        account.save()
+        models.Transaction.objects.bulk_create(
+            models.Transaction(partner=f"Partner {i}", date=datetime.date(2020, 1, 1),
+                               value=Decimal(i), category=category, account=account)
+            for i in range(25)
+        )
+
+    def test_backfill(self):
+        updated = backfill_fingerprints(batch_size=10)
+
+        self.assertEqual(25, updated)
+        for transaction in models.Transaction.objects.all():
+            self.assertEqual(models.Transaction.calculate_fingerprint(
+                transaction.account_id, transaction.date, transaction.value, transaction.partner
+            ), transaction.fingerprint)
+
+    def test_idempotent(self):
+        backfill_fingerprints()
+        self.assertEqual(0, backfill_fingerprints())
+
+    def test_command(self):
+        output = StringIO()
+        call_command('backfillfingerprints', '--batch-size=7', stdout=output)
+        self.assertIn("Calculated 25 fingerprints", output.getvalue())
@@ -0,0 +1,95 @@
+"""
+Unit tests for the cash-flow forecast.
+"""
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.forecasting import forecast
+from budgeteer.locking import lock_transactions
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class ForecastTest(TestCase):
+
+    def setUp(self):
+        self.category = models.Category(name="Test")
+        self.category.save()
+        self.account = models.Account(name="Test", balance=Decimal(100))
+        self.account.save()
+        self.other = models.Account(name="Other", balance=Decimal(0))
+        self.other.save()
+
+    def test_daily_balances(self):
+        self.__transaction(datetime.date(2020, 1, 10), Decimal(50))
+        self.__transaction(datetime.date(2020, 2, 5), Decimal('-30.50'))
+        models.RecurringTransaction(partner="Rent", value=Decimal(-20), category=self.category,
+                                    account=self.account,
+                                    start=datetime.date(2020, 1, 15)).save()
+
+        result = forecast(2, start=datetime.date(2020, 2, 1))
+
+        self.assertEqual(60, result.days)
+        self.assertEqual(datetime.date(2020, 3, 31), result.end)
+        self.assertListEqual([Decimal(150), Decimal('119.50'), Decimal('99.50'),
+                              Decimal('79.50'), Decimal('79.50')],
+                             [result.balance(self.account.pk, date)
+                              for date in [datetime.date(2020, 2, 1), datetime.date(2020, 2, 5),
+                                           datetime.date(2020, 2, 15), datetime.date(2020, 3, 15),
+                                           datetime.date(2020, 3, 31)]])
+        self.assertEqual(Decimal(0), result.balance(self.other.pk, datetime.date(2020, 3, 31)))
+
+    def test_matches_account_balance(self):
+        self.__transaction(datetime.date(2020, 1, 10), Decimal(50))
+        self.__transaction(datetime.date(2020, 1, 20), Decimal(-15))
+        self.__transaction(datetime.date(2020, 2, 10), Decimal(7))
+        lock_transactions(models.Transaction.objects.filter(date__lt=datetime.date(2020, 1, 15)))
+        account = models.Account.objects.get(pk=self.account.pk)
+
+        result = forecast(1, start=datetime.date(2020, 2, 1))
+
+        for date in [datetime.date(2020, 2, 1), datetime.date(2020, 2, 29)]:
+            self.assertEqual(account.balance_at(date), result.balance(account.pk, date))
+
+    def test_skips_materialized_occurrences(self):
+        recurring = models.RecurringTransaction(partner="Rent", value=Decimal(-20),
+                                                category=self.category, account=self.account,
+                                                start=datetime.date(2020, 2, 1))
+        recurring.save()
+        recurring.transaction(datetime.date(2020, 2, 1)).save()
+
+        result = forecast(1, start=datetime.date(2020, 2, 1))
+
+        self.assertEqual(Decimal(80), result.balance(self.account.pk, datetime.date(2020, 2, 29)))
+
+    def test_series(self):
+        self.__transaction(datetime.date(2020, 2, 2), Decimal(1))
+
+        result = forecast(1, start=datetime.date(2020, 2, 1))
+
+        self.assertEqual(29, len(result.series(self.account.pk)))
+        self.assertListEqual([10000, 10100, 10100], list(result.series(self.account.pk)[:3]))
+        self.assertListEqual([0] * 29, list(result.series(self.other.pk)))
+
+    def test_constant_queries(self):
+        for day in range(1, 28):
+            self.__transaction(datetime.date(2020, 2, day), Decimal(day))
+        models.RecurringTransaction(partner="Rent", value=Decimal(-20), category=self.category,
+                                    account=self.other, frequency=models.RecurringTransaction.DAILY,
+                                    start=datetime.date(2020, 1, 1)).save()
+
+        with self.assertNumQueries(4):
+            forecast(24, start=datetime.date(2020, 1, 1))
+
+    def test_rejects_dates_outside(self):
+        result = forecast(1, start=datetime.date(2020, 2, 1))
+
+        with self.assertRaises(ValueError):
+            result.balance(self.account.pk, datetime.date(2020, 3, 1))
+
+    def __transaction(self, date, value):
+        models.Transaction(partner="Test", date=date, value=value, category=self.category,
+                           account=self.account).save()
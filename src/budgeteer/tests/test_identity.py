@@ -0,0 +1,70 @@
+"""
+Unit tests for the identity map of sheets and accounts.
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.identity import current, identity_map, lookup
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class IdentityMapTest(TestCase):
+
+    def setUp(self):
+        self.account = models.Account(name="Test", balance=Decimal(0))
+        self.account.save()
+
+    def test_lookup_once(self):
+        with identity_map():
+            with self.assertNumQueries(1):
+                first = lookup(models.Account, pk=self.account.pk)
+                second = lookup(models.Account, pk=self.account.pk)
+
+        self.assertIs(first, second)
+
+    def test_lookup_without_map(self):
+        with self.assertNumQueries(2):
+            lookup(models.Account, pk=self.account.pk)
+            lookup(models.Account, pk=self.account.pk)
+
+    def test_missing_instance(self):
+        with identity_map():
+            with self.assertNumQueries(1):
+                self.assertIsNone(lookup(models.Account, pk=self.account.pk + 1))
+                self.assertIsNone(lookup(models.Account, pk=self.account.pk + 1))
+
+    def test_nested_maps_are_shared(self):
+        with identity_map() as outer:
+            with identity_map() as inner:
+                self.assertIs(outer, inner)
+            self.assertIs(outer, current())
+        self.assertIsNone(current())
+
+    def test_previous_sheet(self):
+        for month in range(1, 4):
+            models.Sheet(month=month, year=2020).save()
+        sheets = list(models.Sheet.objects.order_by('month'))
+
+        with identity_map():
+            with self.assertNumQueries(1):
+                self.assertEqual(sheets[1], sheets[2].previous)
+                self.assertIs(sheets[2].previous, sheets[2].previous)
+            with self.assertNumQueries(1):
+                self.assertIsNone(sheets[0].previous)
+                self.assertIsNone(sheets[0].previous)
+
+    def test_save_updates_map(self):
+        with identity_map():
+            self.assertIsNone(lookup(models.Sheet, month=12, year=2019))
+            sheet = models.Sheet(month=12, year=2019)
+            sheet.save()
+
+            self.assertEqual(sheet, lookup(models.Sheet, month=12, year=2019))
+            with self.assertNumQueries(0):
+                self.assertIs(sheet, lookup(models.Sheet, pk=sheet.pk))
+
+            sheet.delete()
+            self.assertIsNone(lookup(models.Sheet, month=12, year=2019))
@@ -0,0 +1,215 @@
+"""
+Unit tests for the import of bank statements.
+"""
+import datetime
+import io
+import os
+import tempfile
+from decimal import Decimal
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.importing import (StatementRow, import_transactions, parse_camt, parse_csv,
+                                 parse_mt940)
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+CSV_STATEMENT = """date;partner;value;category
+2020-06-01;Employer;2500,00;Income
+2020-06-02;Supermarket;-42,17;Groceries
+2020-06-03;Bakery;-3,50;
+"""
+
+MT940_STATEMENT = """:20:STARTUMS
+:25:12345678/0123456789
+:28C:00001/001
+:60F:C200601EUR1000,00
+:61:2006010601C2500,00NTRFNONREF
+:86:166?00GUTSCHRIFT?20Salary June?32Employer GmbH
+:61:2006020602D42,17NDDTNONREF
+:86:Supermarket
+ Store 123
+:62F:C200602EUR3457,83
+-
+"""
+
+CAMT_STATEMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02">
+  <BkToCstmrStmt><Stmt>
+    <Ntry>
+      <Amt Ccy="EUR">2500.00</Amt>
+      <CdtDbtInd>CRDT</CdtDbtInd>
+      <BookgDt><Dt>2020-06-01</Dt></BookgDt>
+      <NtryDtls><TxDtls><RltdPties><Dbtr><Nm>Employer</Nm></Dbtr></RltdPties></TxDtls></NtryDtls>
+    </Ntry>
+    <Ntry>
+      <Amt Ccy="EUR">42.17</Amt>
+      <CdtDbtInd>DBIT</CdtDbtInd>
+      <BookgDt><Dt>2020-06-02</Dt></BookgDt>
+      <NtryDtls><TxDtls><RltdPties><Cdtr><Nm>Supermarket</Nm></Cdtr></RltdPties></TxDtls></NtryDtls>
+    </Ntry>
+  </Stmt></BkToCstmrStmt>
+</Document>
+"""
+
+class ParserTest(TestCase):
+
+    def test_csv(self):
+        rows = list(parse_csv(io.StringIO(CSV_STATEMENT), delimiter=';', decimal_separator=','))
+        self.assertListEqual([
+            StatementRow(datetime.date(2020, 6, 1), Decimal('2500.00'), "Employer", "Income"),
+            StatementRow(datetime.date(2020, 6, 2), Decimal('-42.17'), "Supermarket",
+                         "Groceries"),
+            StatementRow(datetime.date(2020, 6, 3), Decimal('-3.50'), "Bakery"),
+        ], rows)
+
+    def test_csv_invalid(self):
+        with self.assertRaises(ValueError):
+            list(parse_csv(io.StringIO("date,partner,value\n2020-06-01,Test,abc\n")))
+
+    def test_mt940(self):
+        rows = list(parse_mt940(io.StringIO(MT940_STATEMENT)))
+        self.assertListEqual([
+            StatementRow(datetime.date(2020, 6, 1), Decimal('2500.00'), "Employer GmbH"),
+            StatementRow(datetime.date(2020, 6, 2), Decimal('-42.17'), "Supermarket Store 123"),
+        ], rows)
+
+    def test_camt(self):
+        rows = list(parse_camt(io.BytesIO(CAMT_STATEMENT.encode())))
+        self.assertListEqual([
+            StatementRow(datetime.date(2020, 6, 1), Decimal('2500.00'), "Employer"),
+            StatementRow(datetime.date(2020, 6, 2), Decimal('-42.17'), "Supermarket"),
+        ], rows)
+
+class ImportTransactionsTest(TestCase):
+
+    def setUp(self):
+        self.account = models.Account(name="Checking", balance=Decimal(0))
+        self.account.save()
+        self.category = models.Category(name="Uncategorized")
+        self.category.save()
+
+    def test_import(self):
+        rows = parse_csv(io.StringIO(CSV_STATEMENT), delimiter=';', decimal_separator=',')
+
+        result = import_transactions(rows, self.account, self.category)
+
+        self.assertEqual((3, 0), tuple(result))
+        transactions = models.Transaction.objects.order_by('date')
+        self.assertListEqual(["Income", "Groceries", "Uncategorized"],
+                             [t.category.name for t in transactions])
+        self.assertEqual(Decimal('2454.33'), models.Account.objects.get(pk=self.account.pk).total)
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_batches(self):
+        rows = (StatementRow(datetime.date(2020, 6, 1), Decimal(i), "Test") for i in range(100))
+
+        with self.assertNumQueries(67):
+            result = import_transactions(rows, self.account, self.category, batch_size=10)
+
+        self.assertEqual(100, result.imported)
+        self.assertEqual(100, models.Transaction.objects.count())
+
+    def test_resolves_names_once(self):
+        other_account = models.Account(name="Savings", balance=Decimal(0))
+        other_account.save()
+        rows = [StatementRow(datetime.date(2020, 6, 1), Decimal(1), "Test", "Uncategorized",
+                             "Savings") for _ in range(10)]
+
+        with self.assertNumQueries(15):
+            import_transactions(rows, batch_size=100)
+
+        self.assertEqual(10, models.Transaction.objects.filter(account=other_account).count())
+
+    def test_skips_duplicates(self):
+        rows = list(parse_csv(io.StringIO(CSV_STATEMENT), delimiter=';', decimal_separator=','))
+        import_transactions(rows[:2], self.account, self.category)
+
+        result = import_transactions(rows, self.account, self.category, batch_size=1)
+
+        self.assertEqual((1, 2), tuple(result))
+        self.assertEqual(3, models.Transaction.objects.count())
+
+    def test_keeps_identical_transactions_of_statement(self):
+        row = StatementRow(datetime.date(2020, 6, 1), Decimal('2.50'), "Coffee")
+        import_transactions([row, row], self.account, self.category)
+
+        result = import_transactions([row, row, row], self.account, self.category)
+
+        self.assertEqual((1, 2), tuple(result))
+        self.assertEqual(3, models.Transaction.objects.count())
+
+    def test_keep_duplicates(self):
+        row = StatementRow(datetime.date(2020, 6, 1), Decimal('2.50'), "Coffee")
+        import_transactions([row], self.account, self.category)
+
+        result = import_transactions([row], self.account, self.category, skip_duplicates=False)
+
+        self.assertEqual((1, 0), tuple(result))
+        self.assertEqual(2, models.Transaction.objects.count())
+
+    def test_updates_running_totals_incrementally(self):
+        for day in (2, 5, 9):
+            models.Transaction(partner="Existing", date=datetime.date(2020, 6, day),
+                               value=Decimal(day), category=self.category,
+                               account=self.account).save()
+        rows = [StatementRow(datetime.date(2020, 6, day), Decimal(10 * day), "Test")
+                for day in (1, 5, 7, 12, 5)]
+
+        import_transactions(rows, self.account, self.category, batch_size=2)
+
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+        self.assertEqual(Decimal(316), models.Account.objects.get(pk=self.account.pk).total)
+
+    def test_invalid_batch_size(self):
+        rows = [StatementRow(datetime.date(2020, 6, 1), Decimal(1), "Test")]
+
+        for batch_size in (0, -1):
+            with self.assertRaises(ValueError):
+                import_transactions(rows, self.account, self.category, batch_size=batch_size)
+
+        self.assertEqual(0, models.Transaction.objects.count())
+
+    def test_unknown_account(self):
+        rows = [StatementRow(datetime.date(2020, 6, 1), Decimal(1), "Test", None, "Unknown")]
+
+        with self.assertRaises(ValueError):
+            import_transactions(rows, category=self.category)
+
+        self.assertEqual(0, models.Transaction.objects.count())
+
+class ImportCommandTest(TestCase):
+
+    def test_command(self):
+        models.Account(name="Checking", balance=Decimal(0)).save()
+        models.Category(name="Uncategorized").save()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "statement.sta")
+            with open(path, 'w') as statement:
+                statement.write(MT940_STATEMENT)
+
+            output = io.StringIO()
+            call_command('importtransactions', path, '--account=Checking',
+                         '--category=Uncategorized', stdout=output)
+
+        self.assertIn("Imported 2 transactions, skipped 0 duplicates", output.getvalue())
+        self.assertEqual(2, models.Transaction.objects.count())
+
+    def test_invalid_batch_size(self):
+        models.Account(name="Checking", balance=Decimal(0)).save()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "statement.sta")
+            with open(path, 'w') as statement:
+                statement.write(MT940_STATEMENT)
+
+            with self.assertRaisesMessage(CommandError, "Batch size must be positive"):
+                call_command('importtransactions', path, '--account=Checking', '--batch-size=0')
+
+    def test_unknown_extension(self):
+        with self.assertRaises(CommandError):
+            call_command('importtransactions', 'statement.unknown')
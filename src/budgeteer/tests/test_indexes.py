@@ -0,0 +1,50 @@
+"""
+Query plan tests for the indexes of the budgeteer main app models.
+"""
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+import budgeteer.models as models
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are only checked on SQLite")
+class IndexUsageTest(TestCase):
+
+    def setUp(self):
+        self.account = models.Account(name="Test", balance=Decimal(0))
+        self.account.save()
+        self.sheet = models.Sheet(month=2, year=2020)
+        self.sheet.save()
+
+    def test_sheet_transactions(self):
+        self.assertIn("USING INDEX transaction_date", self.sheet.transactions.explain())
+
+    def test_sheet_totals(self):
+        self.assertIn("USING INDEX transaction_date", models.Sheet.objects.with_totals().explain())
+
+    def test_account_total(self):
+        plan = models.Transaction.objects.filter(account=self.account, locked=False).explain()
+        self.assertIn("USING INDEX transaction_account_unlocked", plan)
+
+    def test_account_overview(self):
+        plan = (models.Transaction.objects
+                .filter(account=self.account)
+                .order_by('-date', '-pk')
+                .explain())
+        self.assertIn("USING INDEX transaction_account_date", plan)
+
+    def test_sheet_entry(self):
+        plan = models.SheetEntry.objects.filter(sheet=self.sheet, category_id=1).explain()
+        self.assertIn("USING INDEX sheetentry_sheet_category", plan)
+
+    def test_previous_sheets(self):
+        plan = (models.Sheet.objects
+                .filter(year__lt=self.sheet.year)
+                .order_by('-year', '-month')
+                .explain())
+        self.assertIn("USING INDEX sheet_year_month", plan)
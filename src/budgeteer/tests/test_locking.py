@@ -0,0 +1,252 @@
+"""
+Unit tests for the locking of old sheets.
+"""
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.locking import (filter_transactions, lock_old_sheets, lock_sheet_entries,
+                               lock_transactions, unlock_sheet_entries, unlock_transactions)
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class LockOldSheetsTest(TestCase):
+
+    def setUp(self):
+        self.category = models.Category(name="Test")
+        self.category.save()
+        self.account = models.Account(name="Test", balance=Decimal(100))
+        self.account.save()
+
+        self.sheets = []
+        for month in range(1, 7):
+            sheet = models.Sheet(month=month, year=2020)
+            sheet.save()
+            models.SheetEntry.objects.filter(sheet=sheet).update(value=Decimal(month))
+            self.sheets.append(sheet)
+            _create_transaction(self.category, self.account, datetime.date(2020, month, 10),
+                                Decimal(10 * month))
+
+    def test_freezes_carryover_of_old_sheets(self):
+        expected_available = [sheet.available for sheet in self.sheets]
+
+        result = lock_old_sheets(months=2, today=datetime.date(2020, 6, 15))
+
+        self.assertEqual(3, result.sheets)
+        for sheet, expected in zip(self.sheets, expected_available):
+            sheet.refresh_from_db()
+            self.assertAlmostEqual(expected, sheet.available, 2)
+            if sheet.month <= 3:
+                self.assertAlmostEqual(expected, sheet.carryover, 2)
+            else:
+                self.assertIsNone(sheet.carryover)
+
+    def test_locks_entries_and_transactions(self):
+        lock_old_sheets(months=2, today=datetime.date(2020, 6, 15))
+
+        self.assertFalse(models.SheetEntry.objects.filter(sheet__month__lte=3,
+                                                          locked=False).exists())
+        self.assertFalse(models.SheetEntry.objects.filter(sheet__month__gt=3,
+                                                          locked=True).exists())
+        self.assertFalse(models.Transaction.objects.filter(date__month__lte=3,
+                                                           locked=False).exists())
+        self.assertFalse(models.Transaction.objects.filter(date__month__gt=3,
+                                                           locked=True).exists())
+
+    def test_keeps_account_total(self):
+        expected_total = self.account.total
+
+        lock_old_sheets(months=0, today=datetime.date(2020, 7, 1))
+
+        account = models.Account.objects.get(pk=self.account.pk)
+        self.assertEqual(expected_total, account.total)
+        self.assertEqual(Decimal(310), account.balance)
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_idempotent(self):
+        lock_old_sheets(months=2, today=datetime.date(2020, 6, 15))
+        balance = models.Account.objects.get(pk=self.account.pk).balance
+
+        result = lock_old_sheets(months=2, today=datetime.date(2020, 6, 15))
+
+        self.assertEqual((0, 0, 0), tuple(result))
+        self.assertEqual(balance, models.Account.objects.get(pk=self.account.pk).balance)
+
+    def test_horizon_from_settings(self):
+        with self.settings(BUDGETEER_LOCK_HORIZON_MONTHS=4):
+            result = lock_old_sheets(today=datetime.date(2020, 6, 15))
+
+        self.assertEqual(1, result.sheets)
+
+    def test_command(self):
+        output = StringIO()
+
+        call_command('locksheets', '--months=0', stdout=output)
+
+        self.assertFalse(models.Sheet.objects.filter(carryover__isnull=True).exists())
+        self.assertIn("Locked 6 sheets", output.getvalue())
+
+class LockTransactionsTest(TestCase):
+
+    def test_moves_values_into_balance(self):
+        category = models.Category(name="Test")
+        category.save()
+        accounts = [models.Account(name="Test", balance=Decimal(0)) for _ in range(2)]
+        for account in accounts:
+            account.save()
+            for value in (Decimal(5), Decimal(-2)):
+                _create_transaction(category, account, datetime.date(2020, 1, 1), value)
+
+        locked = lock_transactions(models.Transaction.objects.filter(account=accounts[0]))
+
+        self.assertEqual(2, locked)
+        self.assertEqual(Decimal(3), models.Account.objects.get(pk=accounts[0].pk).balance)
+        self.assertEqual(Decimal(0), models.Account.objects.get(pk=accounts[1].pk).balance)
+        self.assertEqual(Decimal(3), models.Account.objects.get(pk=accounts[0].pk).total)
+
+    def test_unlock_moves_values_out_of_balance(self):
+        category = models.Category(name="Test")
+        category.save()
+        account = models.Account(name="Test", balance=Decimal(10))
+        account.save()
+        for value in (Decimal(5), Decimal(-2)):
+            _create_transaction(category, account, datetime.date(2020, 1, 1), value)
+        lock_transactions(models.Transaction.objects.all())
+
+        unlocked = unlock_transactions(models.Transaction.objects.all())
+
+        account.refresh_from_db()
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+        self.assertEqual(2, unlocked)
+        self.assertEqual(Decimal(10), account.balance)
+        self.assertEqual(Decimal(13), account.total)
+
+    def test_unlock_transactions_created_locked(self):
+        category = models.Category(name="Test")
+        category.save()
+        account = models.Account(name="Test", balance=Decimal(10))
+        account.save()
+        created = models.Transaction(partner="Test partner", date=datetime.date(2020, 1, 1),
+                                     value=Decimal(5), category=category, account=account,
+                                     locked=True)
+        created.save()
+        account.refresh_from_db()
+        self.assertEqual(Decimal(10), account.balance)
+        self.assertEqual(Decimal(10), account.total)
+
+        unlock_transactions(models.Transaction.objects.all())
+
+        account.refresh_from_db()
+        self.assertEqual(Decimal(5), account.balance)
+        self.assertEqual(Decimal(10), account.total)
+        self.assertEqual(Decimal(5), account.balance_at(datetime.date(2019, 12, 31)))
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_save_and_bulk_locking_agree(self):
+        category = models.Category(name="Test")
+        category.save()
+        account = models.Account(name="Test", balance=Decimal(100))
+        account.save()
+        first = _create_transaction(category, account, datetime.date(2020, 1, 5), Decimal(10))
+        _create_transaction(category, account, datetime.date(2020, 1, 6), Decimal(20))
+
+        first.locked = True
+        first.save()
+        account.refresh_from_db()
+        self.assertEqual(Decimal(110), account.balance)
+        self.assertEqual(Decimal(130), account.total)
+
+        lock_transactions(models.Transaction.objects.all())
+        account.refresh_from_db()
+        self.assertEqual(Decimal(130), account.balance)
+        self.assertEqual(Decimal(130), account.total)
+        self.assertEqual(Decimal(100), account.balance_at(datetime.date(2020, 1, 4)))
+        self.assertEqual(Decimal(110), account.balance_at(datetime.date(2020, 1, 5)))
+
+        first.locked = False
+        first.save()
+        account.refresh_from_db()
+        self.assertEqual(Decimal(120), account.balance)
+        self.assertEqual(Decimal(130), account.total)
+        self.assertEqual(Decimal(100), account.balance_at(datetime.date(2020, 1, 4)))
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_save_of_instance_loaded_before_locking(self):
+        category = models.Category(name="Test")
+        category.save()
+        account = models.Account(name="Test", balance=Decimal(100))
+        account.save()
+        created = _create_transaction(category, account, datetime.date(2020, 1, 5), Decimal(10))
+        loaded = models.Transaction.objects.get(pk=created.pk)
+
+        lock_transactions(models.Transaction.objects.all())
+        loaded.save()
+
+        account.refresh_from_db()
+        self.assertFalse(models.Transaction.objects.get(pk=created.pk).locked)
+        self.assertEqual(Decimal(100), account.balance)
+        self.assertEqual(Decimal(110), account.total)
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_set_based(self):
+        category = models.Category(name="Test")
+        category.save()
+        for _ in range(3):
+            account = models.Account(name="Test", balance=Decimal(0))
+            account.save()
+            for day in range(1, 11):
+                _create_transaction(category, account, datetime.date(2020, 1, day), Decimal(1))
+
+        with self.assertNumQueries(6):
+            self.assertEqual(30, lock_transactions(models.Transaction.objects.all()))
+
+class FilterTransactionsTest(TestCase):
+
+    def setUp(self):
+        category = models.Category(name="Test")
+        category.save()
+        self.accounts = [models.Account(name="Test", balance=Decimal(0)) for _ in range(2)]
+        for account in self.accounts:
+            account.save()
+            for month in range(1, 4):
+                _create_transaction(category, account, datetime.date(2020, month, 15), Decimal(1))
+
+    def test_all(self):
+        self.assertEqual(6, filter_transactions().count())
+
+    def test_date_range(self):
+        transactions = filter_transactions(start=datetime.date(2020, 2, 1),
+                                           end=datetime.date(2020, 3, 1))
+        self.assertEqual(2, transactions.count())
+
+    def test_account(self):
+        self.assertEqual(3, filter_transactions(account=self.accounts[0]).count())
+
+    def test_sheet(self):
+        sheet = models.Sheet(month=2, year=2020)
+        sheet.save()
+        self.assertEqual(1, filter_transactions(sheet=sheet, account=self.accounts[1]).count())
+
+class LockSheetEntriesTest(TestCase):
+
+    def test_lock_and_unlock(self):
+        for i in range(3):
+            models.Category(name=f"Test {i}").save()
+        sheet = models.Sheet(month=1, year=2020)
+        sheet.save()
+
+        self.assertEqual(3, lock_sheet_entries(sheet.sheetentry_set.all()))
+        self.assertEqual(0, lock_sheet_entries(sheet.sheetentry_set.all()))
+        self.assertEqual(3, unlock_sheet_entries(sheet.sheetentry_set.all()))
+        self.assertFalse(models.SheetEntry.objects.filter(locked=True).exists())
+
+def _create_transaction(category, account, date, value):
+    transaction = models.Transaction(partner="Test partner", date=date, value=value,
+                                     category=category, account=account)
+    transaction.save()
+    return transaction
@@ -0,0 +1,80 @@
+"""
+Unit tests for the budgeteer main app middleware.
+"""
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from budgeteer.middleware import STATISTICS, TimingStatistics
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+@override_settings(BUDGETEER_TIMING=True)
+class TimingMiddlewareTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        STATISTICS.clear()
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+        self.client.login(username='test', password='testpassword')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('account-list'))
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_records_statistics(self):
+        for _ in range(3):
+            self.client.get(reverse('account-list'))
+        self.client.get(reverse('account-view', args=[1]))
+
+        summary = STATISTICS.summary()
+
+        self.assertEqual(3, summary['account-list']['requests'])
+        self.assertEqual(1, summary['account-view']['requests'])
+        self.assertGreater(summary['account-list']['queries']['p50'], 0)
+
+    @override_settings(BUDGETEER_TIMING=False)
+    def test_disabled(self):
+        client = Client()
+        response = client.get(reverse('account-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+class TimingStatisticsTest(TestCase):
+
+    def test_percentiles(self):
+        statistics = TimingStatistics()
+        for i in range(1, 101):
+            statistics.record('test', i / 1000, 0, i, 0)
+
+        summary = statistics.summary()['test']
+
+        self.assertEqual(100, summary['requests'])
+        self.assertEqual({'p50': 51, 'p95': 96, 'p99': 100}, summary['queries'])
+
+    def test_window(self):
+        statistics = TimingStatistics(window=10)
+        for i in range(20):
+            statistics.record('test', 0, 0, i, 0)
+
+        self.assertEqual(10, statistics.summary()['test']['requests'])
+        self.assertEqual(19, statistics.summary()['test']['queries']['p99'])
+
+class TimingStatisticsViewTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_user('test', 'test@test.zz', 'testpassword')
+        User.objects.create_user('staff', 'staff@test.zz', 'testpassword', is_staff=True)
+
+    def test_staff_only(self):
+        self.client.login(username='test', password='testpassword')
+        response = self.client.get(reverse('timing-statistics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_reachable_for_staff(self):
+        self.client.login(username='staff', password='testpassword')
+        response = self.client.get(reverse('timing-statistics'))
+        self.assertEqual(response.status_code, 200)
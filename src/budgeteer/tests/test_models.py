@@ -6,10 +6,13 @@ import random
 import string
 import calendar
 from decimal import Decimal
+from io import StringIO
+from itertools import islice
 
 from unittest_data_provider import data_provider
 
 from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
 from django.db.models.deletion import ProtectedError
 from django.db.utils import IntegrityError
 from django.test import TestCase
@@ -221,6 +224,105 @@ class SheetTests(TestCase):
 
         self.assertAlmostEqual(expected_available, sheet.available, 2)
 
+    def test_totals(self):
+        sheet = models.Sheet(month=2, year=2020)
+        sheet.save()
+
+        transactions = [_create_transaction(2, 2020) for _ in range(10)]
+        _create_transaction(3, 2020)
+
+        self.assertAlmostEqual(sum(t.value for t in transactions if t.value > 0),
+                               sheet.inflow, 2)
+        self.assertAlmostEqual(sum(t.value for t in transactions if t.value < 0),
+                               sheet.outflow, 2)
+        self.assertAlmostEqual(sum(t.value for t in transactions), sheet.net, 2)
+
+    def test_totals_no_transactions(self):
+        sheet = models.Sheet(month=2, year=2020)
+        sheet.save()
+
+        self.assertEqual(Decimal(0), sheet.inflow)
+        self.assertEqual(Decimal(0), sheet.outflow)
+        self.assertEqual(Decimal(0), sheet.net)
+
+    def test_totals_are_quantized(self):
+        sheet = models.Sheet(month=2, year=2020)
+        sheet.save()
+        category = _create_category()
+        account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        account.save()
+        for value in [Decimal('558007.14')] + [Decimal('0.20')] * 12 + [Decimal('-0.10')] * 23:
+            models.Transaction(partner="Test", date=datetime.date(2020, 2, 1), value=value,
+                               category=category, account=account).save()
+        annotated = models.Sheet.objects.with_totals().get(pk=sheet.pk)
+
+        for totals in (sheet, annotated):
+            self.assertEqual("558009.54", str(totals.inflow))
+            self.assertEqual("-2.30", str(totals.outflow))
+            self.assertEqual("558007.24", str(totals.net))
+        self.assertEqual("558009.54", str(sheet.available))
+
+    def test_with_totals(self):
+        sheets = [_create_sheet(month=month, year=2020) for month in range(1, 4)]
+        sheets.append(_create_sheet(month=4, year=2021))
+        expected_totals = [(s.inflow, s.outflow, s.net) for s in sheets]
+
+        with self.assertNumQueries(1):
+            annotated_sheets = list(models.Sheet.objects.with_totals().order_by('year', 'month'))
+            actual_totals = [(s.inflow, s.outflow, s.net) for s in annotated_sheets]
+
+        for expected, actual in zip(expected_totals, actual_totals):
+            for expected_value, actual_value in zip(expected, actual):
+                self.assertAlmostEqual(expected_value, actual_value, 2)
+
+    def test_with_totals_at_month_boundaries(self):
+        category = _create_category()
+        account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        account.save()
+        for day, value in [((2020, 8, 31), 1), ((2020, 9, 1), 2), ((2020, 9, 30), 4),
+                           ((2020, 10, 1), 8), ((2020, 12, 31), 16), ((2021, 1, 1), 32)]:
+            models.Transaction(partner="Test", date=datetime.date(*day), value=Decimal(value),
+                               category=category, account=account).save()
+        for month, year in [(9, 2020), (10, 2020), (12, 2020), (1, 2021)]:
+            models.Sheet(month=month, year=year).save()
+
+        annotated = models.Sheet.objects.with_totals().order_by('year', 'month')
+
+        self.assertEqual([Decimal(6), Decimal(8), Decimal(16), Decimal(32)],
+                         [sheet.net for sheet in annotated])
+
+    def test_available_stops_at_missing_month(self):
+        sheet = _create_sheet(month=3, year=2020)
+        _create_sheet(month=1, year=2020)
+
+        inflow = sum(t.value for t in sheet.transactions if t.value > 0)
+        budget = sum(e.value for e in sheet.sheetentry_set.all())
+
+        self.assertAlmostEqual(inflow - budget, sheet.available, 2)
+
+    def test_available_chain_matches_previous_sheets(self):
+        sheets = [_create_sheet(month=month, year=2020) for month in range(1, 7)]
+
+        expected_available = Decimal(0)
+        for sheet in sheets:
+            inflow = sum(t.value for t in sheet.transactions if t.value > 0)
+            budget = sum(e.value for e in sheet.sheetentry_set.all())
+            expected_available += inflow - budget
+            self.assertAlmostEqual(expected_available, sheet.available, 2)
+
+        chain = models.Sheet.objects.available_chain(sheets[-1])
+        self.assertCountEqual([sheet.pk for sheet in sheets], chain.keys())
+
+    def test_available_constant_query_count(self):
+        for year in range(2000, 2010):
+            for month in range(1, 13):
+                models.Sheet(month=month, year=year).save()
+
+        sheet = models.Sheet.objects.get(month=12, year=2009)
+
+        with self.assertNumQueries(3):
+            _ = sheet.available
+
     def test_get_previous_exists_same_year(self):
         sheet = models.Sheet(month=2, year=2020)
         sheet.save()
@@ -263,6 +365,33 @@ class SheetTests(TestCase):
         for entry in sheet_in_db.sheetentry_set.all():
             self.assertEqual(Decimal(0), entry.value)
 
+    def test_initialize_entries_constant_query_count(self):
+        for _ in range(50):
+            _create_category()
+
+        sheet = models.Sheet(month=2, year=2020)
+        with self.assertNumQueries(6):
+            sheet.save()
+
+        self.assertEqual(50, sheet.sheetentry_set.count())
+
+    def test_create_with_entries(self):
+        expected_categories = [_create_category() for _ in range(10)]
+        months = [(month, 2020) for month in range(1, 13)] + [(1, 2021)]
+
+        with self.assertNumQueries(7):
+            sheets = models.Sheet.objects.create_with_entries(months)
+
+        self.assertListEqual(months, [(sheet.month, sheet.year) for sheet in sheets])
+        for sheet in sheets:
+            self.assertIsNotNone(sheet.pk)
+            self.assertListEqual(expected_categories,
+                                 [e.category for e in sheet.sheetentry_set.all()])
+
+    def test_create_with_entries_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertListEqual([], models.Sheet.objects.create_with_entries([]))
+
     @data_provider(lambda: (
         (12, 1, "12/1"),
         (6, 2020, "06/2020"),
@@ -425,6 +554,29 @@ class SheetEntryTest(TestCase):
         with self.assertRaises(ValidationError):
             entry_in_db.full_clean()
 
+    def test_locked_clean_without_query(self):
+        entry = models.SheetEntry(sheet=self.sheet, category=self.category, value=Decimal(0))
+        entry.locked = True
+        entry.save()
+        entry_in_db = models.SheetEntry.objects.get(pk=entry.pk)
+
+        with self.assertNumQueries(0):
+            entry_in_db.clean()
+
+        entry_in_db.value = Decimal(1)
+        with self.assertNumQueries(0):
+            with self.assertRaises(ValidationError):
+                entry_in_db.clean()
+
+    def test_validate_locked_unchanged(self):
+        entry = models.SheetEntry(sheet=self.sheet, category=self.category, value=Decimal(0))
+        entry.locked = True
+        entry.save()
+
+        entry.value = Decimal(1)
+        with self.assertRaises(ValidationError):
+            models.SheetEntry.objects.validate_locked_unchanged([entry])
+
     def test_created_for_open_sheets_when_category_created(self):
         open_sheets = [_create_sheet(month, 2020) for month in range(1, 13)]
         closed_sheets = [_create_sheet(month, 2021) for month in range(1, 13)]
@@ -443,6 +595,17 @@ class SheetEntryTest(TestCase):
                 self.assertEqual(0, models.SheetEntry.objects.filter(category=category,
                                                                      sheet=sheet).count())
 
+    def test_created_for_open_sheets_constant_query_count(self):
+        for month in range(1, 13):
+            _create_sheet(month, 2020)
+
+        category = models.Category(name=_get_random_name())
+        with self.assertNumQueries(5):
+            category.save()
+
+        self.assertEqual(12, models.SheetEntry.objects.filter(category=category,
+                                                              sheet__year=2020).count())
+
     def test_str(self):
         value = Decimal(random.uniform(-999.99, 999.99))
         expected_name = f"[{str(self.sheet)}] {str(self.category)}: {str(value)}"
@@ -554,6 +717,30 @@ class AccountTest(TestCase):
 
         self.assertAlmostEqual(expected_total, account_in_db.total, 2)
 
+    def test_with_totals(self):
+        accounts = [models.Account(name=_get_random_name(), balance=Decimal(i))
+                    for i in range(5)]
+        for account in accounts:
+            account.save()
+            for _ in range(3):
+                _create_transaction(6, 2020, account)
+                _create_transaction(6, 2020, account, locked=True)
+        expected_totals = [account.total for account in accounts]
+
+        with self.assertNumQueries(1):
+            actual_totals = [account.total for account in
+                             models.Account.objects.with_totals().order_by('pk')]
+
+        self.assertListEqual(expected_totals, actual_totals)
+
+    def test_with_totals_no_transactions(self):
+        account = models.Account(name=_get_random_name(), balance=Decimal(12))
+        account.save()
+
+        account_in_db = models.Account.objects.with_totals().get(pk=account.pk)
+
+        self.assertEqual(Decimal(12), account_in_db.total)
+
     def test_str(self):
         expected_name = _get_random_name()
         account = models.Account(name=expected_name)
@@ -876,6 +1063,51 @@ class TransactionTest(TestCase):
         with self.assertRaises(ValidationError):
             transaction_in_db.full_clean()
 
+    def test_locked_clean_without_query(self):
+        transaction = _create_transaction(6, 2020, self.account, locked=True)
+        transaction_in_db = models.Transaction.objects.get(pk=transaction.pk)
+
+        with self.assertNumQueries(0):
+            transaction_in_db.clean()
+
+        transaction_in_db.value += 1
+        with self.assertNumQueries(0):
+            with self.assertRaises(ValidationError):
+                transaction_in_db.clean()
+
+    def test_locked_clean_after_save(self):
+        transaction = _create_transaction(6, 2020, self.account)
+        transaction.value += 1
+        transaction.locked = True
+        transaction.save()
+
+        transaction.clean()
+
+    def test_locked_clean_without_loaded_state(self):
+        transaction = _create_transaction(6, 2020, self.account, locked=True)
+        unsaved_copy = models.Transaction(pk=transaction.pk, partner=transaction.partner,
+                                          date=transaction.date, value=transaction.value + 1,
+                                          category=transaction.category, account=self.account,
+                                          locked=True)
+
+        with self.assertRaises(ValidationError):
+            unsaved_copy.clean()
+
+    def test_validate_locked_unchanged(self):
+        transactions = [_create_transaction(6, 2020, self.account, locked=locked)
+                        for locked in (True, True, False)]
+        transactions_in_db = list(models.Transaction.objects.filter(account=self.account))
+
+        with self.assertNumQueries(1):
+            models.Transaction.objects.validate_locked_unchanged(transactions_in_db)
+
+        for transaction in transactions:
+            transaction.partner = "Changed"
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError) as context:
+                models.Transaction.objects.validate_locked_unchanged(transactions)
+        self.assertEqual(2, len(context.exception.messages))
+
     @data_provider(lambda: (
         (datetime.date(1000, 12, 15), "1000-12-15"),
         (datetime.date(2020, 6, 1), "2020-06-01"),
@@ -893,6 +1125,601 @@ class TransactionTest(TestCase):
 
         self.assertEqual(expected_name, transaction.__str__())
 
+class AccountBalanceSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.category = _create_category()
+        self.account = models.Account(name=_get_random_name(), balance=Decimal(100))
+        self.account.save()
+
+    def test_total_after_changes(self):
+        transactions = [self.__transaction(day, Decimal(day)) for day in range(1, 11)]
+        self.assertEqual(Decimal(155), self.account.total)
+
+        transactions[0].value = Decimal(-10)
+        transactions[0].save()
+        self.assertEqual(Decimal(144), self.account.total)
+
+        transactions[1].delete()
+        self.assertEqual(Decimal(142), self.account.total)
+
+        transactions[2].locked = True
+        transactions[2].save()
+        self.assertEqual(Decimal(139), self.account.total)
+
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_move_between_accounts_and_days(self):
+        other_account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        other_account.save()
+        transaction = self.__transaction(5, Decimal(7))
+        self.__transaction(10, Decimal(1))
+
+        transaction.account = other_account
+        transaction.date = datetime.date(2020, 1, 20)
+        transaction.save()
+
+        self.assertEqual(Decimal(101), self.account.total)
+        self.assertEqual(Decimal(7), other_account.total)
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_total_single_query(self):
+        for day in range(1, 11):
+            self.__transaction(day, Decimal(day))
+
+        account = models.Account.objects.get(pk=self.account.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(Decimal(155), account.total)
+
+    def test_balance_at(self):
+        self.__transaction(1, Decimal(10))
+        self.__transaction(2, Decimal(-5), locked=True)
+        self.__transaction(3, Decimal(20))
+        self.account.balance = Decimal(95)
+
+        self.assertEqual(Decimal(100), self.account.balance_at(datetime.date(2019, 12, 31)))
+        self.assertEqual(Decimal(110), self.account.balance_at(datetime.date(2020, 1, 1)))
+        self.assertEqual(Decimal(105), self.account.balance_at(datetime.date(2020, 1, 2)))
+        self.assertEqual(Decimal(125), self.account.balance_at(datetime.date(2020, 1, 30)))
+
+    def test_running_balances(self):
+        for day, value in ((1, 10), (2, 1), (2, 2), (2, 3), (3, 20)):
+            self.__transaction(day, Decimal(value))
+        transactions = list(models.Transaction.objects
+                            .filter(account=self.account)
+                            .order_by('-date', '-pk'))
+
+        with self.assertNumQueries(3):
+            balances = models.AccountBalanceSnapshot.objects.running_balances(
+                self.account, transactions[:3]
+            )
+
+        self.assertListEqual([Decimal(136), Decimal(116), Decimal(113)], balances)
+        self.assertListEqual([Decimal(111), Decimal(110)],
+                             models.AccountBalanceSnapshot.objects.running_balances(
+                                 self.account, transactions[3:]))
+
+    def test_running_balances_without_snapshot(self):
+        for day, value in ((1, 10), (2, 1), (2, 2)):
+            self.__transaction(day, Decimal(value))
+        models.Transaction.objects.filter(value=Decimal(2)).update(date=datetime.date(2020, 1, 5))
+        transactions = list(models.Transaction.objects
+                            .filter(account=self.account)
+                            .order_by('-date', '-pk'))
+
+        balances = models.AccountBalanceSnapshot.objects.running_balances(self.account,
+                                                                          transactions)
+
+        self.assertListEqual([Decimal(113), Decimal(113), Decimal(110)], balances)
+
+    def test_apply_transactions(self):
+        other_account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        other_account.save()
+        for day in (3, 6):
+            self.__transaction(day, Decimal(day))
+        new_transactions = [
+            models.Transaction(partner="Test", date=datetime.date(2020, 1, day), value=value,
+                               category=self.category, account=account, locked=locked)
+            for day, value, account, locked in [(1, Decimal(1), self.account, False),
+                                                (3, Decimal(2), self.account, True),
+                                                (4, Decimal(4), other_account, False),
+                                                (8, Decimal(8), self.account, False)]
+        ]
+        models.Transaction.objects.bulk_create(new_transactions)
+
+        models.AccountBalanceSnapshot.objects.apply_transactions(new_transactions)
+
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+
+    def test_verify_and_rebuild(self):
+        for day in range(1, 6):
+            self.__transaction(day, Decimal(day))
+        models.AccountBalanceSnapshot.objects.filter(date__day=3).update(unlocked_total=0)
+
+        self.assertListEqual([(self.account.pk, datetime.date(2020, 1, 3))],
+                             models.AccountBalanceSnapshot.objects.verify())
+
+        models.AccountBalanceSnapshot.objects.rebuild()
+
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+        self.assertEqual(Decimal(115), self.account.total)
+
+    def test_rebuild_with_fractional_values(self):
+        self.__transaction(1, Decimal('558007.14'))
+        for _ in range(12):
+            self.__transaction(1, Decimal('0.20'))
+        for _ in range(23):
+            self.__transaction(2, Decimal('0.10'), locked=True)
+
+        models.AccountBalanceSnapshot.objects.rebuild()
+
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+        snapshot = models.AccountBalanceSnapshot.objects.get(date=datetime.date(2020, 1, 2))
+        self.assertEqual(Decimal('558009.54'), snapshot.unlocked_total)
+        self.assertEqual(Decimal('2.30'), snapshot.locked_total)
+
+    def test_rebuild_invalidates_cached_totals(self):
+        self.__transaction(1, Decimal(1))
+        self.assertEqual(Decimal(101), self.account.total)
+        models.Transaction.objects.bulk_create([
+            models.Transaction(partner="Test", date=datetime.date(2020, 1, 2), value=Decimal(5),
+                               category=self.category, account=self.account)
+        ])
+
+        models.AccountBalanceSnapshot.objects.rebuild([self.account.pk])
+        self.assertEqual(Decimal(106), self.account.total)
+
+        models.Transaction.objects.filter(date__day=2).update(value=Decimal(7))
+        models.AccountBalanceSnapshot.objects.rebuild()
+        self.assertEqual(Decimal(108), self.account.total)
+
+    def test_rebuild_command(self):
+        self.__transaction(1, Decimal(1))
+        models.AccountBalanceSnapshot.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuildbalances', '--check', stdout=StringIO())
+        call_command('rebuildbalances', stdout=StringIO())
+        call_command('rebuildbalances', '--check', stdout=StringIO())
+
+    def __transaction(self, day, value, locked=False):
+        transaction = models.Transaction(partner="Test", date=datetime.date(2020, 1, day),
+                                         value=value, category=self.category,
+                                         account=self.account, locked=locked)
+        transaction.save()
+        return transaction
+
+class CategoryMonthActivityTest(TestCase):
+
+    def setUp(self):
+        self.category = _create_category()
+        self.account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        self.account.save()
+
+    def test_activity_after_changes(self):
+        transactions = [self.__transaction(self.category, 1, Decimal(day)) for day in range(1, 5)]
+        self.assertEqual(Decimal(10), self.__activity(self.category, 1))
+
+        transactions[0].value = Decimal(-5)
+        transactions[0].save()
+        self.assertEqual(Decimal(4), self.__activity(self.category, 1))
+
+        transactions[1].delete()
+        self.assertEqual(Decimal(2), self.__activity(self.category, 1))
+
+    def test_move_between_categories_and_months(self):
+        other_category = _create_category()
+        transaction = self.__transaction(self.category, 1, Decimal(7))
+        self.__transaction(self.category, 1, Decimal(1))
+
+        transaction.category = other_category
+        transaction.date = datetime.date(2020, 2, 10)
+        transaction.save()
+
+        self.assertEqual(Decimal(1), self.__activity(self.category, 1))
+        self.assertEqual(Decimal(0), self.__activity(other_category, 1))
+        self.assertEqual(Decimal(7), self.__activity(other_category, 2))
+
+    def test_sheet_entry_activity_and_remaining(self):
+        sheet = models.Sheet(month=1, year=2020)
+        sheet.save()
+        models.SheetEntry.objects.filter(category=self.category).update(value=Decimal(50))
+        self.__transaction(self.category, 1, Decimal(-20))
+        self.__transaction(self.category, 2, Decimal(-5))
+
+        entry = models.SheetEntry.objects.get(sheet=sheet, category=self.category)
+        self.assertEqual(Decimal(-20), entry.activity)
+
+        entries = list(models.SheetEntry.objects.with_activity().filter(sheet=sheet))
+        with self.assertNumQueries(0):
+            self.assertListEqual([Decimal(-20)], [entry.activity for entry in entries])
+            self.assertListEqual([Decimal(30)], [entry.remaining for entry in entries])
+
+    def test_rebuild_command(self):
+        for month in range(1, 4):
+            self.__transaction(self.category, month, Decimal(month))
+            self.__transaction(_create_category(), month, Decimal(1))
+        expected = set(models.CategoryMonthActivity.objects.values_list(
+            'category', 'year', 'month', 'activity'))
+        models.CategoryMonthActivity.objects.all().delete()
+
+        output = StringIO()
+        call_command('backfillactivity', '--batch-size=2', stdout=output)
+
+        self.assertIn("Rebuilt 6 monthly category activities", output.getvalue())
+        self.assertSetEqual(expected, set(models.CategoryMonthActivity.objects.values_list(
+            'category', 'year', 'month', 'activity')))
+
+    def __transaction(self, category, month, value):
+        transaction = models.Transaction(partner="Test", date=datetime.date(2020, month, 10),
+                                         value=value, category=category, account=self.account)
+        transaction.save()
+        return transaction
+
+    @staticmethod
+    def __activity(category, month):
+        activity = models.CategoryMonthActivity.objects.filter(category=category, year=2020,
+                                                               month=month).first()
+        return activity.activity if activity is not None else Decimal(0)
+
+class RecurringTransactionTest(TestCase):
+
+    def setUp(self):
+        self.category = _create_category()
+        self.account = models.Account(name=_get_random_name(), balance=Decimal(100))
+        self.account.save()
+
+    def test_monthly_on_last_day(self):
+        recurring = self.__recurring(start=datetime.date(2020, 1, 31), count=4)
+
+        self.assertListEqual([datetime.date(2020, 1, 31), datetime.date(2020, 2, 29),
+                              datetime.date(2020, 3, 31), datetime.date(2020, 4, 30)],
+                             list(recurring.occurrences()))
+
+    @data_provider(lambda: (
+        (models.RecurringTransaction.DAILY, 3,
+         [datetime.date(2020, 1, 1), datetime.date(2020, 1, 4), datetime.date(2020, 1, 7)]),
+        (models.RecurringTransaction.WEEKLY, 2,
+         [datetime.date(2020, 1, 1), datetime.date(2020, 1, 15), datetime.date(2020, 1, 29)]),
+        (models.RecurringTransaction.YEARLY, 1,
+         [datetime.date(2020, 1, 1), datetime.date(2021, 1, 1), datetime.date(2022, 1, 1)]),
+    ))
+    def test_frequencies(self, frequency, interval, expected):
+        recurring = self.__recurring(start=datetime.date(2020, 1, 1), frequency=frequency,
+                                     interval=interval)
+
+        self.assertListEqual(expected, list(islice(recurring.occurrences(), 3)))
+
+    def test_window(self):
+        recurring = self.__recurring(start=datetime.date(2000, 1, 15),
+                                     until=datetime.date(2020, 4, 1))
+
+        self.assertListEqual([datetime.date(2020, 2, 15), datetime.date(2020, 3, 15)],
+                             list(recurring.occurrences(datetime.date(2020, 2, 1),
+                                                        datetime.date(2020, 12, 31))))
+
+    def test_project_skips_materialized(self):
+        first = self.__recurring(start=datetime.date(2020, 1, 10))
+        second = self.__recurring(start=datetime.date(2020, 1, 5),
+                                  frequency=models.RecurringTransaction.WEEKLY, interval=2)
+        first.transaction(datetime.date(2020, 2, 10)).save()
+
+        projected = list(models.RecurringTransaction.objects.all()
+                         .project(datetime.date(2020, 2, 1), datetime.date(2020, 2, 29)))
+
+        self.assertListEqual([(second.pk, datetime.date(2020, 2, 2)),
+                              (second.pk, datetime.date(2020, 2, 16))],
+                             [(t.recurring_id, t.date) for t in projected])
+        self.assertTrue(all(t.pk is None for t in projected))
+
+    def test_project_lazily(self):
+        self.__recurring(start=datetime.date(2020, 1, 1),
+                         frequency=models.RecurringTransaction.DAILY)
+
+        projected = models.RecurringTransaction.objects.all().project()
+
+        self.assertEqual(datetime.date(2020, 1, 3), list(islice(projected, 3))[-1].date)
+
+    def test_occurrence_key_unique(self):
+        recurring = self.__recurring(start=datetime.date(2020, 1, 1))
+        recurring.transaction(datetime.date(2020, 1, 1)).save()
+
+        with self.assertRaises(IntegrityError):
+            recurring.transaction(datetime.date(2020, 1, 1)).save()
+
+    def test_forecast(self):
+        recurring = self.__recurring(start=datetime.date(2020, 1, 1), value=Decimal(-10))
+        recurring.transaction(datetime.date(2020, 1, 1)).save()
+
+        self.assertEqual(Decimal(90), self.account.forecast(datetime.date(2020, 1, 31)))
+        self.assertEqual(Decimal(70), self.account.forecast(datetime.date(2020, 3, 1)))
+
+    def __recurring(self, **kwargs):
+        kwargs.setdefault('value', Decimal(1))
+        recurring = models.RecurringTransaction(partner="Test", category=self.category,
+                                                account=self.account, **kwargs)
+        recurring.save()
+        return recurring
+
+class BudgetTargetTest(TestCase):
+
+    def setUp(self):
+        self.category = _create_category()
+        self.account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        self.account.save()
+        self.sheets = [models.Sheet(month=month, year=2020) for month in range(1, 4)]
+        for sheet in self.sheets:
+            sheet.save()
+
+    def test_counters_start_with_existing_values(self):
+        self.__budget(0, Decimal(30))
+        self.__transaction(1, Decimal(-10))
+
+        target = self.__target(models.BudgetTarget.MONTHLY, Decimal(50))
+
+        self.assertEqual(Decimal(30), target.budgeted)
+        self.assertEqual(Decimal(-10), target.activity)
+        self.assertEqual(Decimal(20), target.progress)
+
+    def test_counters_follow_changes(self):
+        target = self.__target(models.BudgetTarget.MONTHLY, Decimal(50))
+
+        entry = self.__budget(0, Decimal(30))
+        self.__budget(1, Decimal(5))
+        transaction = self.__transaction(1, Decimal(-10))
+        self.assertEqual((Decimal(35), Decimal(-10)), self.__counters(target))
+
+        entry.value = Decimal(20)
+        entry.save()
+        transaction.value = Decimal(-4)
+        transaction.save()
+        self.assertEqual((Decimal(25), Decimal(-4)), self.__counters(target))
+
+        entry.category = _create_category()
+        entry.save()
+        transaction.delete()
+        self.assertEqual((Decimal(5), Decimal(0)), self.__counters(target))
+
+    def test_counters_follow_concurrent_edits(self):
+        target = self.__target(models.BudgetTarget.MONTHLY, Decimal(50))
+        entry = self.__budget(0, Decimal(0))
+        first = models.SheetEntry.objects.get(pk=entry.pk)
+        second = models.SheetEntry.objects.get(pk=entry.pk)
+
+        first.value = Decimal(10)
+        first.save()
+        second.value = Decimal(3)
+        second.save()
+
+        self.assertEqual(Decimal(3), self.__counters(target)[0])
+
+    def test_counters_follow_bulk_changes(self):
+        target = self.__target(models.BudgetTarget.MONTHLY, Decimal(50))
+        other = _create_category()
+        other_target = models.BudgetTarget(category=other, amount=Decimal(1))
+        other_target.save()
+
+        models.CategoryMonthActivity.objects.apply({
+            (self.category.pk, 2020, 1): Decimal(-3),
+            (self.category.pk, 2020, 2): Decimal(-4),
+            (other.pk, 2020, 1): Decimal(8),
+        })
+
+        self.assertEqual(Decimal(-7), self.__counters(target)[1])
+        self.assertEqual(Decimal(8), self.__counters(other_target)[1])
+
+    def test_rebuild(self):
+        target = self.__target(models.BudgetTarget.MONTHLY, Decimal(50))
+        self.__budget(0, Decimal(30))
+        self.__transaction(1, Decimal(-10))
+        models.BudgetTarget.objects.update(budgeted=Decimal(0), activity=Decimal(0))
+
+        models.CategoryMonthActivity.objects.rebuild()
+
+        self.assertEqual((Decimal(30), Decimal(-10)), self.__counters(target))
+
+    @data_provider(lambda: (
+        (models.BudgetTarget.MONTHLY, None, Decimal(50), Decimal(20), Decimal(30)),
+        (models.BudgetTarget.MONTHLY, None, Decimal(50), Decimal(60), Decimal(0)),
+        (models.BudgetTarget.MINIMUM_BALANCE, None, Decimal(100), Decimal(20), Decimal(50)),
+        (models.BudgetTarget.BY_DATE, datetime.date(2020, 4, 30), Decimal(300), Decimal(20),
+         Decimal(70)),
+        (models.BudgetTarget.BY_DATE, datetime.date(2019, 12, 31), Decimal(300), Decimal(20),
+         Decimal(250)),
+    ))
+    def test_underfunded(self, kind, date, amount, budgeted, expected):
+        self.category = _create_category()
+        self.__budget(0, Decimal(30))
+        entry = self.__budget(1, budgeted)
+        self.__target(kind, amount, date)
+
+        entry = models.SheetEntry.objects.get(pk=entry.pk)
+
+        self.assertEqual(expected, entry.underfunded)
+
+    def test_underfunded_ignores_later_months(self):
+        self.__budget(0, Decimal(30))
+        self.__budget(1, Decimal(40))
+        self.__transaction(2, Decimal(-10))
+        self.__transaction(3, Decimal(-5))
+        self.__target(models.BudgetTarget.MINIMUM_BALANCE, Decimal(100))
+
+        entry = models.SheetEntry.objects.get(sheet=self.sheets[0], category=self.category)
+        sheet = models.Sheet.objects.load_overview(2020, 1)
+
+        self.assertEqual(Decimal(70), entry.underfunded)
+        self.assertEqual(Decimal(70), sheet.underfunded_total)
+
+    def test_no_underfunding_without_target(self):
+        entry = self.__budget(0, Decimal(0))
+        self.assertEqual(Decimal(0), models.SheetEntry.objects.get(pk=entry.pk).underfunded)
+
+    def test_by_date_needs_date(self):
+        target = models.BudgetTarget(category=self.category, kind=models.BudgetTarget.BY_DATE,
+                                     amount=Decimal(10))
+        with self.assertRaises(ValidationError):
+            target.full_clean()
+
+    def __target(self, kind, amount, date=None):
+        target = models.BudgetTarget(category=self.category, kind=kind, amount=amount, date=date)
+        target.save()
+        return target
+
+    def __budget(self, sheet, value):
+        entry = models.SheetEntry.objects.get(sheet=self.sheets[sheet], category=self.category)
+        entry.value = value
+        entry.save()
+        return entry
+
+    def __transaction(self, month, value):
+        transaction = models.Transaction(partner="Test", date=datetime.date(2020, month, 1),
+                                         value=value, category=self.category,
+                                         account=self.account)
+        transaction.save()
+        return transaction
+
+    @staticmethod
+    def __counters(target):
+        target.refresh_from_db()
+        return target.budgeted, target.activity
+
+class BudgetTest(TestCase):
+
+    def setUp(self):
+        self.food = _create_category()
+        self.tools = _create_category()
+        self.account = models.Account(name=_get_random_name(), balance=Decimal(0))
+        self.account.save()
+        self.project = self.__budget("House")
+        self.kitchen = self.__budget("Kitchen", self.project)
+        self.oven = self.__budget("Oven", self.kitchen, models.Budget.PURCHASE, self.tools)
+
+    def test_paths(self):
+        self.assertEqual(f"{self.project.pk}/{self.kitchen.pk}/{self.oven.pk}/", self.oven.path)
+        self.assertEqual(2, self.oven.depth)
+        self.assertListEqual([self.project, self.kitchen], list(self.oven.ancestors()))
+        self.assertListEqual([self.kitchen, self.oven], list(self.project.descendants()))
+
+    def test_rollup_across_categories(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+        self.__transaction(Decimal(-20), self.kitchen, self.food)
+        self.__transaction(Decimal(-5), None, self.food)
+
+        self.assertListEqual([Decimal(-520), Decimal(-520), Decimal(-500)], self.__totals())
+
+    def test_rollup_follows_changes(self):
+        transaction = self.__transaction(Decimal(-500), self.oven, self.tools)
+
+        transaction.value = Decimal(-450)
+        transaction.budget = self.kitchen
+        transaction.save()
+        self.assertListEqual([Decimal(-450), Decimal(-450), Decimal(0)], self.__totals())
+
+        transaction.delete()
+        self.assertListEqual([Decimal(0)] * 3, self.__totals())
+
+    def test_read_is_single_query(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Decimal(-500),
+                             models.Budget.objects.values_list('total', flat=True)
+                             .get(pk=self.project.pk))
+
+    def test_update_query_count_independent_of_depth(self):
+        budget = self.oven
+        for i in range(5):
+            budget = self.__budget(f"Level {i}", budget)
+        transaction = self.__transaction(Decimal(-1), None, self.food)
+        transaction.budget = budget
+
+        with self.assertNumQueries(7):
+            transaction.save()
+        self.assertListEqual([Decimal(-1)] * 3, self.__totals())
+
+    def test_move(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+        other = self.__budget("Garden")
+
+        self.kitchen.parent = other
+        self.kitchen.save()
+
+        self.oven.refresh_from_db()
+        self.assertEqual(f"{other.pk}/{self.kitchen.pk}/{self.oven.pk}/", self.oven.path)
+        self.assertListEqual([Decimal(0), Decimal(-500), Decimal(-500)], self.__totals())
+        other.refresh_from_db()
+        self.assertEqual(Decimal(-500), other.total)
+
+    def test_move_below_itself(self):
+        self.project.parent = self.oven
+        with self.assertRaises(ValidationError):
+            self.project.full_clean()
+        with self.assertRaises(ValidationError):
+            self.project.save()
+
+    def test_delete(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+        self.__transaction(Decimal(-20), self.kitchen, self.food)
+
+        self.oven.delete()
+
+        self.project.refresh_from_db()
+        self.assertEqual(Decimal(-20), self.project.total)
+        self.assertEqual(2, models.Transaction.objects.count())
+
+    def test_queryset_delete(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+        self.__transaction(Decimal(-20), self.kitchen, self.food)
+        self.__transaction(Decimal(-7), self.project, self.food)
+
+        models.Budget.objects.filter(pk=self.kitchen.pk).delete()
+
+        self.project.refresh_from_db()
+        self.assertEqual(Decimal(-7), self.project.total)
+
+    def test_delete_outdated_instance(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+        oven = models.Budget.objects.get(pk=self.oven.pk)
+        other = self.__budget("Garden")
+        self.kitchen.parent = other
+        self.kitchen.save()
+
+        oven.delete()
+
+        self.project.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((Decimal(0), Decimal(0)), (self.project.total, other.total))
+
+    def test_purchase_needs_category(self):
+        budget = models.Budget(name="Bike", kind=models.Budget.PURCHASE)
+        with self.assertRaises(ValidationError):
+            budget.full_clean()
+
+    def test_rebuild(self):
+        self.__transaction(Decimal(-500), self.oven, self.tools)
+        self.__transaction(Decimal(-20), self.kitchen, self.food)
+        models.Budget.objects.update(total=Decimal(0))
+
+        self.assertEqual(3, models.Budget.objects.rebuild())
+
+        self.assertListEqual([Decimal(-520), Decimal(-520), Decimal(-500)], self.__totals())
+
+    def __budget(self, name, parent=None, kind=models.Budget.PROJECT, category=None):
+        budget = models.Budget(name=name, parent=parent, kind=kind, category=category)
+        budget.save()
+        return budget
+
+    def __transaction(self, value, budget, category):
+        transaction = models.Transaction(partner="Test", date=datetime.date(2020, 1, 1),
+                                         value=value, category=category, account=self.account,
+                                         budget=budget)
+        transaction.save()
+        return transaction
+
+    def __totals(self):
+        totals = dict(models.Budget.objects.values_list('pk', 'total'))
+        return [totals[budget.pk] for budget in [self.project, self.kitchen, self.oven]]
+
 def _create_transaction(month, year, account=None, locked=False) -> models.Transaction:
     category = models.Category(name=_get_random_name())
     category.save()
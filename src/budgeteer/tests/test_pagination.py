@@ -0,0 +1,51 @@
+"""
+Unit tests for the keyset pagination of transactions.
+"""
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.pagination import decode_cursor, encode_cursor, keyset_page
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class KeysetPageTest(TestCase):
+
+    def setUp(self):
+        category = models.Category(name="Test")
+        category.save()
+        account = models.Account(name="Test", balance=Decimal(0))
+        account.save()
+        for day in (1, 2, 2, 2, 3):
+            models.Transaction(partner="Test", date=datetime.date(2020, 1, day), value=Decimal(1),
+                               category=category, account=account).save()
+
+    def test_pages_cover_all_transactions_once(self):
+        expected = list(models.Transaction.objects.order_by('-date', '-pk'))
+
+        actual = []
+        cursor = None
+        while True:
+            page, cursor = keyset_page(models.Transaction.objects.all(), cursor, size=2)
+            actual += page
+            if cursor is None:
+                break
+
+        self.assertListEqual(expected, actual)
+
+    def test_no_cursor_on_last_page(self):
+        page, cursor = keyset_page(models.Transaction.objects.all(), size=5)
+        self.assertEqual(5, len(page))
+        self.assertIsNone(cursor)
+
+    def test_cursor_roundtrip(self):
+        transaction = models.Transaction.objects.first()
+        self.assertEqual((transaction.date, transaction.pk),
+                         decode_cursor(encode_cursor(transaction)))
+
+    def test_malformed_cursor(self):
+        with self.assertRaises(ValueError):
+            keyset_page(models.Transaction.objects.all(), "2020-01-01")
@@ -0,0 +1,74 @@
+"""
+Unit tests for the materialization of recurring transactions.
+"""
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.recurring import materialize
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class MaterializeTest(TestCase):
+
+    def setUp(self):
+        self.category = models.Category(name="Test")
+        self.category.save()
+        self.account = models.Account(name="Test", balance=Decimal(0))
+        self.account.save()
+        self.recurring = models.RecurringTransaction(partner="Rent", value=Decimal(-500),
+                                                     category=self.category,
+                                                     account=self.account,
+                                                     start=datetime.date(2020, 1, 1))
+        self.recurring.save()
+
+    def test_materialize(self):
+        created = materialize(datetime.date(2020, 3, 31))
+
+        self.assertEqual(3, created)
+        self.assertListEqual([datetime.date(2020, month, 1) for month in range(1, 4)],
+                             list(models.Transaction.objects
+                                  .order_by('date')
+                                  .values_list('date', flat=True)))
+        self.assertEqual(Decimal(-1500), models.Account.objects.get(pk=self.account.pk).total)
+        self.assertListEqual([], models.AccountBalanceSnapshot.objects.verify())
+        self.assertEqual(Decimal(-500), models.CategoryMonthActivity.objects
+                         .get(category=self.category, year=2020, month=2).activity)
+
+    def test_idempotent(self):
+        materialize(datetime.date(2020, 3, 31))
+
+        self.assertEqual(0, materialize(datetime.date(2020, 3, 31)))
+        self.assertEqual(1, materialize(datetime.date(2020, 4, 30)))
+        self.assertEqual(4, models.Transaction.objects.count())
+
+    def test_keeps_edited_occurrences(self):
+        materialize(datetime.date(2020, 1, 31))
+        transaction = models.Transaction.objects.get()
+        transaction.date = datetime.date(2020, 1, 3)
+        transaction.save()
+
+        self.assertEqual(0, materialize(datetime.date(2020, 1, 31)))
+
+    def test_single_insert(self):
+        other = models.RecurringTransaction(partner="Salary", value=Decimal(2000),
+                                            category=self.category, account=self.account,
+                                            start=datetime.date(2020, 1, 25))
+        other.save()
+
+        with self.assertNumQueries(13):
+            self.assertEqual(24, materialize(datetime.date(2020, 12, 31)))
+
+    def test_command(self):
+        output = StringIO()
+
+        call_command('materializerecurring', '--until=2020-02-29', stdout=output)
+
+        self.assertIn("Created 2 recurring transactions", output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('materializerecurring', '--until=someday', stdout=StringIO())
@@ -0,0 +1,110 @@
+"""
+Unit tests for the transaction statistics.
+"""
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+import budgeteer.models as models
+from budgeteer.caching import get_cache
+from budgeteer.statistics import statistics
+
+#pylint: disable=missing-function-docstring
+#pylint: disable=missing-class-docstring
+
+class StatisticsTest(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.food = models.Category(name="Food")
+        self.food.save()
+        self.rent = models.Category(name="Rent")
+        self.rent.save()
+        self.account = models.Account(name="Checking", balance=Decimal(0))
+        self.account.save()
+        self.wallet = models.Account(name="Wallet", balance=Decimal(0))
+        self.wallet.save()
+        self.today = datetime.date(2020, 3, 15)
+
+    def test_spending_per_category_and_month(self):
+        self.__transaction(datetime.date(2020, 1, 3), "-10.50", self.food)
+        self.__transaction(datetime.date(2020, 1, 20), "-4.50", self.food)
+        self.__transaction(datetime.date(2020, 3, 1), "-500", self.rent)
+        self.__transaction(datetime.date(2020, 3, 2), "100", self.food)
+
+        result = statistics(3, today=self.today)
+
+        self.assertListEqual([(2020, 1), (2020, 2), (2020, 3)], result.months)
+        self.assertListEqual([1500, 0, 0], list(result.category_spending(self.food.pk)))
+        self.assertListEqual([0, 0, 50000], list(result.category_spending(self.rent.pk)))
+
+    def test_ignores_transactions_outside(self):
+        self.__transaction(datetime.date(2019, 12, 31), "-10", self.food)
+        self.__transaction(datetime.date(2020, 4, 1), "-10", self.food)
+
+        result = statistics(3, today=self.today)
+
+        self.assertListEqual([], result.categories)
+        self.assertListEqual([0, 0, 0], list(result.expenses))
+
+    def test_rolling_average(self):
+        for month, value in [(1, "-30"), (2, "-60"), (3, "-90"), (4, "0")]:
+            self.__transaction(datetime.date(2020, month, 1), value, self.food)
+
+        result = statistics(4, today=datetime.date(2020, 4, 1), window=2)
+
+        self.assertListEqual([3000, 4500, 7500, 4500],
+                             list(result.category_rolling(self.food.pk)))
+
+    def test_top_partners(self):
+        self.__transaction(datetime.date(2020, 1, 1), "-10", self.food, partner="Bakery")
+        self.__transaction(datetime.date(2020, 2, 1), "-30", self.food, partner="Market")
+        self.__transaction(datetime.date(2020, 3, 1), "-25", self.food, partner="Bakery")
+        self.__transaction(datetime.date(2020, 3, 1), "-5", self.food, partner="Kiosk")
+        self.__transaction(datetime.date(2020, 3, 1), "1000", self.food, partner="Employer")
+
+        result = statistics(3, today=self.today, partners=2)
+
+        self.assertListEqual([("Bakery", 3500), ("Market", 3000)], result.partners)
+
+    def test_income_expense_ratios(self):
+        self.__transaction(datetime.date(2020, 1, 1), "1000", self.food)
+        self.__transaction(datetime.date(2020, 1, 2), "-400", self.rent)
+        self.__transaction(datetime.date(2020, 2, 1), "500", self.food, account=self.wallet)
+
+        result = statistics(3, today=self.today)
+
+        self.assertListEqual([100000, 50000, 0], list(result.income))
+        self.assertListEqual([40000, 0, 0], list(result.expenses))
+        self.assertListEqual([Decimal('2.50'), None, None], result.ratios())
+        self.assertListEqual([self.account.pk, self.wallet.pk], result.accounts)
+        self.assertListEqual([Decimal('2.50'), None], result.account_ratios())
+
+    def test_cached_until_transactions_change(self):
+        self.__transaction(datetime.date(2020, 1, 1), "-10", self.food)
+        statistics(3, today=self.today)
+
+        with self.assertNumQueries(1):
+            result = statistics(3, today=self.today)
+        self.assertListEqual([1000, 0, 0], list(result.expenses))
+
+        transaction = self.__transaction(datetime.date(2020, 2, 1), "-20", self.food)
+        self.assertListEqual([1000, 2000, 0], list(statistics(3, today=self.today).expenses))
+
+        transaction.delete()
+        self.assertListEqual([1000, 0, 0], list(statistics(3, today=self.today).expenses))
+
+    def test_single_query_for_transactions(self):
+        for day in range(1, 29):
+            self.__transaction(datetime.date(2020, 2, day), "-1", self.food,
+                               partner=f"Partner {day}")
+
+        with self.assertNumQueries(2):
+            statistics(3, today=self.today)
+
+    def __transaction(self, date, value, category, account=None, partner="Test"):
+        transaction = models.Transaction(partner=partner, date=date, value=Decimal(value),
+                                         category=category, account=account or self.account)
+        transaction.save()
+        return transaction
@@ -2,11 +2,18 @@
 Unit tests for the budgeteer main app views.
 """
 
+import datetime
+import json
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 
 import budgeteer.models as models
+from budgeteer.caching import get_cache
 
 #pylint: disable=missing-function-docstring
 #pylint: disable=missing-class-docstring
@@ -36,7 +43,7 @@ class AccountOverviewTest(TestCase):
         self.__login()
         response = self.client.get(reverse('account-view', args=[1]))
         self.assertListEqual(
-            list(models.Transaction.objects.filter(account__pk=1).order_by('-date')),
+            list(models.Transaction.objects.filter(account__pk=1).order_by('-date', '-pk')),
             list(response.context['object_list'])
         )
 
@@ -45,6 +52,91 @@ class AccountOverviewTest(TestCase):
         response = self.client.get(reverse('account-view', args=[1234]))
         self.assertEqual(response.status_code, 404)
 
+    def test_paginated_transactions(self):
+        self.__login()
+        _create_transactions(250)
+        expected_transactions = list(models.Transaction.objects
+                                     .filter(account__pk=1).order_by('-date', '-pk'))
+
+        actual_transactions = []
+        response = self.client.get(reverse('account-view', args=[1]))
+        actual_transactions += response.context['object_list']
+        while response.context['next_cursor'] is not None:
+            response = self.client.get(reverse('account-transactions', args=[1]),
+                                       {'after': response.context['next_cursor']})
+            self.assertEqual(response.status_code, 200)
+            actual_transactions += response.context['object_list']
+
+        self.assertListEqual(expected_transactions, actual_transactions)
+
+    def test_running_balance(self):
+        self.__login()
+        response = self.client.get(reverse('account-view', args=[1]))
+        self.assertListEqual([Decimal(7000), Decimal(7010)],
+                             [t.running_balance for t in response.context['object_list']])
+
+    def test_fetches_account_once(self):
+        self.__login()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('account-view', args=[1]))
+
+        self.assertEqual(1, len([query for query in queries.captured_queries
+                                 if 'FROM "budgeteer_account"' in query['sql']]))
+
+    def test_concurrent(self):
+        self.__login()
+        sequential = self.client.get(reverse('account-view', args=[1]))
+        concurrent = self.client.get(reverse('account-view-concurrent', args=[1]))
+
+        self.assertEqual(200, concurrent.status_code)
+        self.assertEqual(sequential.context['account'], concurrent.context['account'])
+        self.assertEqual(sequential.context['account'].total,
+                         concurrent.context['account'].total)
+        self.assertListEqual(list(sequential.context['object_list']),
+                             list(concurrent.context['object_list']))
+
+    def test_404_on_invalid_cursor(self):
+        self.__login()
+        response = self.client.get(reverse('account-view', args=[1]), {'after': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
+
+class AccountExportTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_csv(self):
+        self.__login()
+        response = self.client.get(reverse('account-export', args=[1, 'csv']))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual("date,partner,value,category,locked", lines[0])
+        self.assertEqual(models.Transaction.objects.filter(account__pk=1).count() + 1,
+                         len(lines))
+
+    def test_json(self):
+        self.__login()
+        response = self.client.get(reverse('account-export', args=[1, 'json']))
+        rows = json.loads(b"".join(response.streaming_content))
+        self.assertListEqual(
+            [str(t.value) for t in
+             models.Transaction.objects.filter(account__pk=1).order_by('-date', '-pk')],
+            [row['value'] for row in rows]
+        )
+
+    def test_404_on_unknown_format(self):
+        self.__login()
+        response = self.client.get(reverse('account-export', args=[1, 'xml']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_prevents_not_logged_in_user(self):
+        response = self.client.get(reverse('account-export', args=[1, 'csv']))
+        self.assertEqual(response.status_code, 302)
+
     def __login(self):
         self.client.login(username='test', password='testpassword')
 
@@ -72,5 +164,160 @@ class AccountListTest(TestCase):
             list(response.context['object_list'])
         )
 
+    def test_query_count_independent_of_accounts(self):
+        self.__login()
+        with self.assertNumQueries(3):
+            self.client.get(reverse('account-list'))
+
+        for account in models.Account.objects.all():
+            models.Account(name=account.name, balance=account.balance).save()
+
+        with self.assertNumQueries(3):
+            self.client.get(reverse('account-list'))
+
     def __login(self):
         self.client.login(username='test', password='testpassword')
+
+class SheetOverviewTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_reachable(self):
+        self.__login()
+        response = self.client.get(reverse('sheet-view', args=[2020, 6]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_prevents_not_logged_in_user(self):
+        response = self.client.get(reverse('sheet-view', args=[2020, 6]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_404_on_unknown_sheet(self):
+        self.__login()
+        response = self.client.get(reverse('sheet-view', args=[2020, 7]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_current_shows_latest_sheet(self):
+        models.Sheet(month=7, year=2020).save()
+        self.__login()
+        response = self.client.get(reverse('sheet-current'))
+        self.assertEqual((2020, 7), (response.context['sheet'].year,
+                                     response.context['sheet'].month))
+
+    def test_amounts(self):
+        models.Sheet(month=7, year=2020).save()
+        models.SheetEntry.objects.filter(category=1).update(value=Decimal(20))
+        models.Transaction(partner="Test partner", date=datetime.date(2020, 7, 1),
+                           value=Decimal(-5), category_id=1, account_id=1).save()
+        self.__login()
+
+        response = self.client.get(reverse('sheet-view', args=[2020, 7]))
+
+        entries = {entry.category_id: entry for entry in response.context['sheet'].entries}
+        self.assertEqual(Decimal(20), entries[1].value)
+        self.assertEqual(Decimal(-5), entries[1].activity)
+        self.assertEqual(Decimal(25), entries[1].available)
+        self.assertEqual(Decimal(0), entries[2].available)
+        self.assertEqual(models.Sheet.objects.get(month=7, year=2020).available,
+                         response.context['sheet'].available)
+        for entry in entries.values():
+            self.assertEqual(models.SheetEntry.objects.get(pk=entry.pk).available, entry.available)
+
+    def test_underfunded(self):
+        models.BudgetTarget(category_id=2, amount=Decimal(50)).save()
+        models.SheetEntry.objects.filter(pk=1).update(value=Decimal(3))
+        self.__login()
+
+        response = self.client.get(reverse('sheet-view', args=[2020, 6]))
+
+        entry, = response.context['sheet'].entries
+        self.assertEqual(Decimal(47), entry.underfunded)
+        self.assertEqual(Decimal(47), response.context['sheet'].underfunded_total)
+        self.assertContains(response, "47.00")
+
+    def test_query_count_independent_of_categories_and_transactions(self):
+        models.BudgetTarget(category_id=2, amount=Decimal(50)).save()
+        self.__login()
+        get_cache().clear()
+        with self.assertNumQueries(11):
+            self.client.get(reverse('sheet-view', args=[2020, 6]))
+
+        for i in range(10):
+            category = models.Category(name=f"Category {i}")
+            category.save()
+            models.BudgetTarget(category=category, amount=Decimal(i)).save()
+        _create_transactions(50)
+        models.CategoryMonthActivity.objects.rebuild()
+
+        with self.assertNumQueries(11):
+            response = self.client.get(reverse('sheet-view', args=[2020, 6]))
+        self.assertEqual(11, len(response.context['sheet'].entries))
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
+
+class ForecastViewTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_reachable(self):
+        self.__login()
+        response = self.client.get(reverse('account-forecast'), {'months': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, len(response.context['chart']['lines']))
+        self.assertContains(response, "<polyline", count=2)
+
+    def test_prevents_not_logged_in_user(self):
+        response = self.client.get(reverse('account-forecast'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_404_on_invalid_months(self):
+        self.__login()
+        for months in ['0', '61', 'many']:
+            response = self.client.get(reverse('account-forecast'), {'months': months})
+            self.assertEqual(response.status_code, 404)
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
+
+class StatisticsViewTest(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.user = User.objects.create_user('test', 'test@test.zz', 'testpassword')
+
+    def test_reachable(self):
+        models.Transaction(partner="Test partner", date=datetime.date.today(),
+                           value=Decimal(-5), category_id=1, account_id=1).save()
+        self.__login()
+
+        response = self.client.get(reverse('statistics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(12, len(response.context['months']))
+        self.assertEqual(Decimal(5), response.context['categories'][0]['spending'][-1])
+        self.assertListEqual([("Test partner", Decimal(5))], response.context['partners'])
+
+    def test_prevents_not_logged_in_user(self):
+        response = self.client.get(reverse('statistics'))
+        self.assertEqual(response.status_code, 302)
+
+    def __login(self):
+        self.client.login(username='test', password='testpassword')
+
+def _create_transactions(count, account_pk=1):
+    start = datetime.date(2020, 1, 1)
+    models.Transaction.objects.bulk_create(
+        models.Transaction(partner="Test partner", date=start + datetime.timedelta(days=i % 40),
+                           value=Decimal(i), category_id=1, account_id=account_pk)
+        for i in range(count)
+    )
+    models.AccountBalanceSnapshot.objects.rebuild([account_pk])
+    models.Sheet.objects.invalidate_from(start.year, start.month)
@@ -4,11 +4,33 @@ Budgeteer main app URL configuration
 from django.contrib import admin
 from django.urls import path
 
+import budgeteer.api as api
 import budgeteer.views as views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
     path('account/view/<int:id>', views.AccountOverview.as_view(), name="account-view"),
-    path('account/list', views.AccountList.as_view(), name="account-list")
+    path('account/view/<int:id>/transactions', views.AccountTransactions.as_view(),
+         name="account-transactions"),
+    path('account/view/<int:id>/concurrent', views.AccountOverview.as_view(concurrent=True),
+         name="account-view-concurrent"),
+    path('account/view/<int:id>/transactions/concurrent',
+         views.AccountTransactions.as_view(concurrent=True),
+         name="account-transactions-concurrent"),
+    path('account/export/<int:id>.<str:format>', views.AccountExport.as_view(),
+         name="account-export"),
+    path('account/list', views.AccountList.as_view(), name="account-list"),
+    path('account/forecast', views.ForecastView.as_view(), name="account-forecast"),
+
+    path('sheet/view', views.SheetOverview.as_view(), name="sheet-current"),
+    path('sheet/view/<int:year>/<int:month>', views.SheetOverview.as_view(), name="sheet-view"),
+
+    path('stats', views.StatisticsView.as_view(), name="statistics"),
+    path('stats/timing', views.TimingStatisticsView.as_view(), name="timing-statistics"),
+
+    path('api/accounts', api.AccountListApi.as_view(), name="api-accounts"),
+    path('api/accounts/<int:id>/transactions', api.AccountTransactionsApi.as_view(),
+         name="api-account-transactions"),
+    path('api/sheets/<int:year>/<int:month>', api.SheetApi.as_view(), name="api-sheet"),
 ]
@@ -1,31 +1,285 @@
 """
 Budgeteer main app views
 """
-from django.contrib.auth.mixins import LoginRequiredMixin
+import csv
+import datetime
+import json
+from decimal import Decimal
+
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.generic.base import TemplateView, View
 from django.views.generic.list import ListView
 
-from budgeteer.models import Account, Transaction
+from budgeteer.concurrency import run_concurrently
+from budgeteer.forecasting import forecast
+from budgeteer import identity
+from budgeteer.middleware import STATISTICS
+from budgeteer.models import Account, AccountBalanceSnapshot, Category, Sheet, Transaction
+from budgeteer.pagination import keyset_page
+from budgeteer.statistics import as_decimal, statistics
 
 
 class AccountOverview(LoginRequiredMixin, ListView):
     """
     Shows all transactions and account information for a single account.
+
+    Transactions are shown in pages that are selected with the cursor in the "after" parameter.
+
+    With concurrent enabled the account header and the transaction page are loaded at the same
+    time in the thread pool of budgeteer.concurrency. It is chosen per URL with
+    as_view(concurrent=True).
     """
     template_name = "pages/account/overview.html"
+    next_cursor = None
+    concurrent = False
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['account'] = Account.objects.get(pk=self.kwargs['id'])
+        context['account'] = self.get_account()
+        context['next_cursor'] = self.next_cursor
         return context
 
+    def get_account(self):
+        """
+        Returns the account of the overview from the identity map of the request.
+        """
+        account = identity.lookup(Account, pk=self.kwargs['id'])
+        if account is None:
+            raise Http404("Unknown account")
+        return account
+
     def get_queryset(self):
-        account = get_object_or_404(Account, pk=self.kwargs['id'])
-        return Transaction.objects.filter(account=account).order_by("-date")
+        if self.concurrent:
+            account, page = run_concurrently(self.__load_header, self.__load_page)
+        else:
+            account, page = self.__load_header(), self.__load_page()
+        if account is None:
+            raise Http404("Unknown account")
+        if page is None:
+            raise Http404("Invalid cursor")
+        page, self.next_cursor = page
+
+        balances = AccountBalanceSnapshot.objects.running_balances(account, page)
+        for transaction, balance in zip(page, balances):
+            transaction.running_balance = balance
+        return page
+
+    def __load_header(self):
+        account = Account.objects.with_totals().filter(pk=self.kwargs['id']).first()
+        active = identity.current()
+        if account is not None and active is not None:
+            active.remember(account)
+        return account
+
+    def __load_page(self):
+        try:
+            return keyset_page(Transaction.objects.filter(account_id=self.kwargs['id']),
+                               self.request.GET.get('after'))
+        except ValueError:
+            return None
+
+class AccountTransactions(AccountOverview):
+    """
+    Renders a single page of transactions of an account for loading more rows into the overview.
+    """
+    template_name = "pages/account/transactions.html"
+
+class AccountExport(LoginRequiredMixin, View):
+    """
+    Streams all transactions of an account as CSV or JSON.
+    """
+    FIELDS = ['date', 'partner', 'value', 'category__name', 'locked']
+
+    def get(self, request, *args, **kwargs):
+        #pylint: disable=unused-argument
+        account = get_object_or_404(Account, pk=kwargs['id'])
+        rows = (Transaction.objects
+                .filter(account=account)
+                .order_by('-date', '-pk')
+                .values_list(*AccountExport.FIELDS)
+                .iterator())
+
+        if kwargs['format'] == 'csv':
+            response = StreamingHttpResponse(_stream_csv(rows), content_type='text/csv')
+        elif kwargs['format'] == 'json':
+            response = StreamingHttpResponse(_stream_json(rows), content_type='application/json')
+        else:
+            raise Http404("Unknown export format")
+
+        response['Content-Disposition'] = (
+            f'attachment; filename="account-{account.pk}.{kwargs["format"]}"'
+        )
+        return response
 
 class AccountList(LoginRequiredMixin, ListView):
     """
     Shows a list of all accounts.
     """
-    model = Account
+    queryset = Account.objects.with_totals()
     template_name = "pages/account/list.html"
+
+class SheetOverview(LoginRequiredMixin, TemplateView):
+    """
+    Shows the budgeted, activity and available amounts of all categories on a sheet.
+
+    Without year and month the latest sheet is shown.
+    """
+    template_name = "pages/sheet/overview.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if 'year' in self.kwargs:
+            year, month = self.kwargs['year'], self.kwargs['month']
+        else:
+            latest = Sheet.objects.order_by('-year', '-month').values_list('year', 'month').first()
+            if latest is None:
+                raise Http404("No sheet exists yet")
+            year, month = latest
+        try:
+            context['sheet'] = Sheet.objects.load_overview(year, month)
+        except Sheet.DoesNotExist:
+            raise Http404("Unknown sheet") from None
+        return context
+
+class ForecastView(LoginRequiredMixin, TemplateView):
+    """
+    Charts the projected daily balance of every account for the next months.
+
+    The number of months is taken from the "months" parameter and limited to MAX_MONTHS.
+    """
+    template_name = "pages/account/forecast.html"
+    MAX_MONTHS = 60
+    CHART_WIDTH = 800
+    CHART_HEIGHT = 300
+    COLORS = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#17a2b8', '#6f42c1', '#fd7e14']
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        months = self.request.GET.get('months')
+        if months is not None:
+            try:
+                months = int(months)
+            except ValueError:
+                raise Http404("Invalid number of months") from None
+            if not 1 <= months <= ForecastView.MAX_MONTHS:
+                raise Http404("Invalid number of months")
+        context['forecast'] = forecast(months)
+        context['chart'] = _forecast_chart(context['forecast'], ForecastView.CHART_WIDTH,
+                                           ForecastView.CHART_HEIGHT, ForecastView.COLORS)
+        return context
+
+class StatisticsView(LoginRequiredMixin, TemplateView):
+    """
+    Shows the spending per category and month, cash flow, accounts and top partners of the latest
+    months.
+    """
+    template_name = "pages/stats/overview.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        result = statistics()
+        categories = dict(Category.objects
+                          .filter(pk__in=result.categories)
+                          .values_list('pk', 'name'))
+        accounts = dict(Account.objects
+                        .filter(pk__in=result.accounts)
+                        .values_list('pk', 'name'))
+
+        context['months'] = [datetime.date(year, month, 1) for year, month in result.months]
+        context['categories'] = [{
+            'name': categories[pk],
+            'spending': [as_decimal(cents) for cents in result.category_spending(pk)],
+            'average': as_decimal(result.category_rolling(pk)[-1]),
+        } for pk in result.categories]
+        context['cash_flow'] = [{
+            'month': month,
+            'income': as_decimal(income),
+            'expenses': as_decimal(expenses),
+            'ratio': ratio,
+        } for month, income, expenses, ratio in zip(context['months'], result.income,
+                                                     result.expenses, result.ratios())]
+        context['accounts'] = [{
+            'name': accounts[pk],
+            'income': as_decimal(income),
+            'expenses': as_decimal(expenses),
+            'ratio': ratio,
+        } for pk, income, expenses, ratio in zip(result.accounts, result.account_income,
+                                                  result.account_expenses,
+                                                  result.account_ratios())]
+        context['partners'] = [(partner, as_decimal(cents)) for partner, cents in result.partners]
+        context['window'] = result.window
+        return context
+
+class TimingStatisticsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Shows the request timing percentiles per URL name recorded by the timing middleware.
+
+    Only available to staff users.
+    """
+    template_name = "pages/stats/timing.html"
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['statistics'] = STATISTICS.summary()
+        return context
+
+class _Echo:
+    """
+    File-like object that returns what is written to it instead of buffering it.
+    """
+    def write(self, value):
+        #pylint: disable=no-self-use
+        return value
+
+def _forecast_chart(projection, width, height, colors):
+    """
+    Returns the lines of an SVG chart of all accounts of the forecast scaled to the given size.
+    """
+    chart = {'width': width, 'height': height, 'lines': [], 'zero': None}
+    if not projection.balances:
+        return chart
+
+    low, high = min(min(projection.balances), 0), max(max(projection.balances), 0)
+    span = (high - low) or 1
+    step = width / max(projection.days - 1, 1)
+
+    def y_position(cents):
+        return round(height - (cents - low) * height / span, 1)
+
+    chart['zero'] = y_position(0)
+    for index, (pk, name) in enumerate(projection.accounts):
+        series = projection.series(pk)
+        chart['lines'].append({
+            'name': name,
+            'color': colors[index % len(colors)],
+            'points': " ".join(f"{round(day * step, 1)},{y_position(cents)}"
+                               for day, cents in enumerate(series)),
+            'lowest': Decimal(min(series)).scaleb(-2),
+            'end': Decimal(series[-1]).scaleb(-2),
+        })
+    return chart
+
+def _stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['date', 'partner', 'value', 'category', 'locked'])
+    for date, partner, value, category, locked in rows:
+        yield writer.writerow([f"{date:%Y-%m-%d}", partner, value, category, locked])
+
+def _stream_json(rows):
+    yield '['
+    separator = ''
+    for date, partner, value, category, locked in rows:
+        yield separator + json.dumps({
+            'date': f"{date:%Y-%m-%d}",
+            'partner': partner,
+            'value': str(value),
+            'category': category,
+            'locked': locked,
+        })
+        separator = ','
+    yield ']'